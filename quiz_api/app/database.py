@@ -1,23 +1,131 @@
 """
 Configuración de la base de datos SQLAlchemy con SQLite
 """
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from typing import Generator
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Callable, Generator, List
 import os
 
 # Obtener la ruta de la base de datos
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./quiz_api.db")
+ES_SQLITE = DATABASE_URL.startswith("sqlite")
+ES_SQLITE_MEMORIA = ES_SQLITE and (":memory:" in DATABASE_URL or DATABASE_URL.rstrip("/") == "sqlite:")
+
+# Perfiles de ajuste de SQLite. "produccion" activa WAL para que los lectores
+# no bloqueen a los escritores y un busy_timeout para esperar al cerrojo de
+# escritura en lugar de fallar con "database is locked". "ninguno" deja los
+# valores por defecto de SQLite. Cada PRAGMA se puede sobrescribir con su
+# variable de entorno SQLITE_<PRAGMA>.
+PERFILES_SQLITE = {
+    "produccion": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "cache_size": -20000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+    "ninguno": {},
+}
+
+# Valores admitidos para los PRAGMA de texto
+_VALORES_PRAGMA = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+}
+
+
+def _perfil_sqlite() -> dict:
+    """Construye los PRAGMA a aplicar a partir del perfil y las variables de entorno."""
+    nombre = os.getenv("SQLITE_PROFILE", "produccion").lower()
+    if nombre not in PERFILES_SQLITE:
+        raise ValueError(f"SQLITE_PROFILE debe ser uno de: {list(PERFILES_SQLITE)}")
+
+    pragmas = dict(PERFILES_SQLITE[nombre])
+    for pragma in ("journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size", "temp_store"):
+        valor = os.getenv(f"SQLITE_{pragma.upper()}")
+        if valor is not None:
+            pragmas[pragma] = valor
+
+    for pragma, valor in pragmas.items():
+        if pragma in _VALORES_PRAGMA:
+            valor = str(valor).upper()
+            if valor not in _VALORES_PRAGMA[pragma]:
+                raise ValueError(f"SQLITE_{pragma.upper()} debe ser uno de: {sorted(_VALORES_PRAGMA[pragma])}")
+        else:
+            valor = int(valor)
+        pragmas[pragma] = valor
+
+    # WAL y mmap no tienen sentido en una base de datos en memoria
+    if ES_SQLITE_MEMORIA:
+        pragmas.pop("journal_mode", None)
+        pragmas.pop("mmap_size", None)
+    return pragmas
+
+
+SQLITE_PRAGMAS = _perfil_sqlite() if ES_SQLITE else {}
+
+
+def _opciones_engine() -> dict:
+    """Argumentos de create_engine: conexión de SQLite y tamaño del pool."""
+    opciones = {}
+    if ES_SQLITE:
+        opciones["connect_args"] = {"check_same_thread": False}
+        if "busy_timeout" in SQLITE_PRAGMAS:
+            # El driver también espera al cerrojo, en segundos
+            opciones["connect_args"]["timeout"] = SQLITE_PRAGMAS["busy_timeout"] / 1000
+
+    # Las bases de datos en memoria usan un pool de conexión única
+    if not ES_SQLITE_MEMORIA:
+        opciones["pool_size"] = int(os.getenv("DB_POOL_SIZE", "5"))
+        opciones["max_overflow"] = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+        opciones["pool_timeout"] = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    return opciones
+
 
 # Crear el engine de SQLAlchemy
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
+engine = create_engine(DATABASE_URL, **_opciones_engine())
+
+
+def aplicar_pragmas_sqlite(dbapi_connection, connection_record=None):
+    """Aplica el perfil de ajuste a cada conexión nueva de SQLite."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, valor in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma} = {valor}")
+    finally:
+        cursor.close()
+
+
+if SQLITE_PRAGMAS:
+    event.listen(engine, "connect", aplicar_pragmas_sqlite)
 
 # Crear la sesión
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Motor asíncrono opcional (DATABASE_ASYNC=1). Requiere sqlalchemy[asyncio] y
+# un driver asíncrono como aiosqlite; la URL se deriva de DATABASE_URL salvo
+# que se indique ASYNC_DATABASE_URL.
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "0").lower() in ("1", "true", "si", "sí")
+async_engine = None
+AsyncSessionLocal = None
+
+if DATABASE_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    ASYNC_DATABASE_URL = os.getenv(
+        "ASYNC_DATABASE_URL",
+        DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    )
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **_opciones_engine())
+    if SQLITE_PRAGMAS:
+        event.listen(async_engine.sync_engine, "connect", aplicar_pragmas_sqlite)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
+
 # Base para los modelos
 Base = declarative_base()
 
@@ -34,8 +142,201 @@ def get_db() -> Generator:
         db.close()
 
 
-def init_db():
+class SesionEnHilo:
+    """
+    Adaptador con la misma interfaz `run_sync` que AsyncSession para cuando
+    el motor asíncrono está desactivado: ejecuta la función con una sesión
+    síncrona en el threadpool.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    async def run_sync(self, funcion: Callable, *args, **kwargs):
+        return await run_in_threadpool(funcion, self.db, *args, **kwargs)
+
+
+@asynccontextmanager
+async def sesion_asincrona() -> AsyncGenerator:
+    """
+    Abre una sesión con `await db.run_sync(funcion, *args)`, que llama a
+    `funcion(sesion_sincrona, *args)`. Con DATABASE_ASYNC=1 es una AsyncSession
+    y las consultas no ocupan hilos del threadpool; si no, es una sesión
+    síncrona ejecutada en el threadpool.
+    """
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+
+    db = SessionLocal()
+    try:
+        yield SesionEnHilo(db)
+    finally:
+        db.close()
+
+
+async def get_async_db() -> AsyncGenerator:
+    """
+    Dependencia para endpoints `async def`.
+
+    Entrega la sesión de `sesion_asincrona`. Fuera de una petición (por
+    ejemplo en tareas en segundo plano) se usa directamente
+    `async with sesion_asincrona() as db`.
+    """
+    async with sesion_asincrona() as db:
+        yield db
+
+
+def init_db() -> List[str]:
     """
     Inicializa la base de datos creando todas las tablas.
+
+    Returns:
+        Lista de columnas ("tabla.columna") añadidas a tablas existentes
     """
     Base.metadata.create_all(bind=engine)
+    columnas_agregadas = crear_columnas_faltantes()
+    crear_indices_faltantes()
+    crear_busqueda_texto()
+    return columnas_agregadas
+
+
+def crear_columnas_faltantes() -> List[str]:
+    """
+    Añade a las tablas existentes las columnas nuevas de los modelos.
+
+    Solo sirve para columnas que admiten ALTER TABLE ADD COLUMN, es decir,
+    nulables o con `server_default`.
+    """
+    inspector = inspect(engine)
+    agregadas = []
+    with engine.begin() as conexion:
+        for tabla in Base.metadata.sorted_tables:
+            existentes = {columna["name"] for columna in inspector.get_columns(tabla.name)}
+            for columna in tabla.columns:
+                if columna.name in existentes:
+                    continue
+                tipo = columna.type.compile(dialect=engine.dialect)
+                ddl = f"ALTER TABLE {tabla.name} ADD COLUMN {columna.name} {tipo}"
+                if columna.server_default is not None:
+                    ddl += f" DEFAULT {columna.server_default.arg}"
+                    if not columna.nullable:
+                        ddl += " NOT NULL"
+                conexion.execute(text(ddl))
+                agregadas.append(f"{tabla.name}.{columna.name}")
+    return agregadas
+
+
+def crear_indices_faltantes():
+    """
+    Crea los índices declarados en los modelos que no existen todavía.
+
+    `create_all` solo crea índices junto con tablas nuevas, así que una base
+    de datos creada con una versión anterior no los tendría.
+    """
+    inspector = inspect(engine)
+    for tabla in Base.metadata.sorted_tables:
+        existentes = {indice["name"] for indice in inspector.get_indexes(tabla.name)}
+        for indice in tabla.indexes:
+            if indice.name in existentes:
+                continue
+            try:
+                indice.create(bind=engine)
+            except IntegrityError as e:
+                # Un índice único no se puede crear si ya hay filas repetidas
+                print(f"No se pudo crear el índice {indice.name}: {e.orig}")
+
+
+# Texto de las opciones para el índice de búsqueda: los valores del array JSON
+# ya decodificados (el JSON guardado escapa las tildes como \uXXXX)
+_OPCIONES_FTS = "(SELECT group_concat(value, ' ') FROM json_each({fila}.opciones))"
+
+_TRIGGERS_FTS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS questions_fts_ai AFTER INSERT ON questions BEGIN
+        INSERT INTO questions_fts(rowid, pregunta, explicacion, opciones)
+        VALUES (new.id, new.pregunta, new.explicacion, {_OPCIONES_FTS.format(fila="new")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS questions_fts_ad AFTER DELETE ON questions BEGIN
+        INSERT INTO questions_fts(questions_fts, rowid, pregunta, explicacion, opciones)
+        VALUES ('delete', old.id, old.pregunta, old.explicacion, {_OPCIONES_FTS.format(fila="old")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS questions_fts_au AFTER UPDATE OF pregunta, explicacion, opciones
+    ON questions BEGIN
+        INSERT INTO questions_fts(questions_fts, rowid, pregunta, explicacion, opciones)
+        VALUES ('delete', old.id, old.pregunta, old.explicacion, {_OPCIONES_FTS.format(fila="old")});
+        INSERT INTO questions_fts(rowid, pregunta, explicacion, opciones)
+        VALUES (new.id, new.pregunta, new.explicacion, {_OPCIONES_FTS.format(fila="new")});
+    END
+    """,
+]
+
+
+def crear_busqueda_texto() -> bool:
+    """
+    Crea la tabla FTS5 `questions_fts` sobre el texto, la explicación y las
+    opciones de las preguntas, y los triggers que la mantienen sincronizada.
+
+    La tabla no guarda contenido (`content=''`), solo el índice: las opciones
+    se indexan ya decodificadas y no coinciden con la columna JSON, así que no
+    puede usar `questions` como contenido externo. Si se crea sobre una base
+    de datos con preguntas, se indexan en ese momento. El ranking (bm25) da
+    más peso al texto de la pregunta que a las opciones, y a estas más que a
+    la explicación.
+
+    Returns:
+        True si la búsqueda de texto completo está disponible (SQLite con FTS5)
+    """
+    if not ES_SQLITE:
+        return False
+    with engine.begin() as conexion:
+        existe = conexion.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'questions_fts'")
+        ).first()
+        if existe is None:
+            try:
+                conexion.execute(text(
+                    "CREATE VIRTUAL TABLE questions_fts USING fts5("
+                    "pregunta, explicacion, opciones, content='', "
+                    "tokenize='unicode61 remove_diacritics 2')"
+                ))
+            except OperationalError as e:
+                print(f"Búsqueda de texto completo no disponible: {e.orig}")
+                return False
+            conexion.execute(text(
+                "INSERT INTO questions_fts(questions_fts, rank) VALUES ('rank', 'bm25(10.0, 2.0, 5.0)')"
+            ))
+            conexion.execute(text(
+                "INSERT INTO questions_fts(rowid, pregunta, explicacion, opciones) "
+                f"SELECT id, pregunta, explicacion, {_OPCIONES_FTS.format(fila='questions')} FROM questions"
+            ))
+        for trigger in _TRIGGERS_FTS:
+            conexion.execute(text(trigger))
+    return True
+
+
+def estado_base_datos() -> dict:
+    """
+    Informa del perfil de ajuste configurado y de los valores reales de la conexión.
+
+    Returns:
+        Dict con el motor, el pool y los PRAGMA efectivos de SQLite
+    """
+    estado = {
+        "motor": engine.dialect.name,
+        "pool": engine.pool.status(),
+        "asincrono": async_engine is not None
+    }
+    if ES_SQLITE:
+        with engine.connect() as conexion:
+            estado["pragmas"] = {
+                pragma: conexion.exec_driver_sql(f"PRAGMA {pragma}").scalar()
+                for pragma in ("journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size", "temp_store")
+            }
+        estado["perfil"] = os.getenv("SQLITE_PROFILE", "produccion").lower()
+    return estado
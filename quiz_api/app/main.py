@@ -1,12 +1,17 @@
 """
 Aplicación FastAPI principal para Quiz API
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import PlainTextResponse
 from pathlib import Path
-from app.database import init_db
+from app.database import async_engine, engine, estado_base_datos
+from app.services import compresion
+from app.services import consultas_lentas as registro_consultas
+from app.services.compresion import CompresionMiddleware
+from app.services.consultas_lentas import ConsultasLentasMiddleware, consultas_lentas
+from app.services.estaticos import RecursosEstaticos
+from app.services.metricas import MetricasMiddleware, instrumentar_motor, metricas
 from init_db import seed_db_if_empty
 from app.routers import questions, quiz_sessions, answers, statistics
 
@@ -24,8 +29,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing", "ETag"],
 )
 
+# Compresión negociada de las respuestas (COMPRESION=0 para desactivarla)
+if compresion.ACTIVA:
+    app.add_middleware(CompresionMiddleware)
+
+# Métricas de rendimiento por ruta (METRICAS_MUESTREO > 0 para activarlas)
+app.add_middleware(MetricasMiddleware)
+instrumentar_motor(engine)
+if async_engine is not None:
+    instrumentar_motor(async_engine.sync_engine)
+
+# Registro de consultas lentas (CONSULTAS_LENTAS_MS para activarlo)
+if consultas_lentas.activo:
+    app.add_middleware(ConsultasLentasMiddleware)
+    registro_consultas.instrumentar_motor(engine)
+    if async_engine is not None:
+        registro_consultas.instrumentar_motor(async_engine.sync_engine)
+
 # Evento de startup
 @app.on_event("startup")
 def startup_event():
@@ -41,21 +64,31 @@ app.include_router(quiz_sessions.router)
 app.include_router(answers.router)
 app.include_router(statistics.router)
 
-# Servir archivos estáticos del frontend
+# Archivos estáticos del frontend, cargados y precomprimidos al arrancar
 frontend_path = Path(__file__).parent.parent / "frontend"
-if frontend_path.exists():
-    app.mount("/static", StaticFiles(directory=str(frontend_path)), name="static")
+estaticos = RecursosEstaticos(frontend_path)
+
+
+@app.api_route("/static/{ruta:path}", methods=["GET", "HEAD"], include_in_schema=False)
+def servir_estatico(ruta: str, request: Request):
+    """
+    Sirve un archivo del frontend por su nombre original o con huella de contenido.
+    """
+    respuesta = estaticos.respuesta(request, ruta)
+    if respuesta is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return respuesta
 
 
 # Ruta para servir el HTML principal
 @app.get("/", tags=["root"], include_in_schema=False)
-async def root():
+def root(request: Request):
     """
     Sirve la página principal del frontend.
     """
-    html_file = frontend_path / "index.html"
-    if html_file.exists():
-        return FileResponse(html_file)
+    respuesta = estaticos.respuesta(request, "index.html")
+    if respuesta is not None:
+        return respuesta
     return {
         "mensaje": "Bienvenido a Quiz API",
         "version": "1.0.0",
@@ -72,9 +105,38 @@ async def root():
 @app.get("/health", tags=["root"])
 def health_check():
     """
-    Verificar el estado de la API.
+    Verificar el estado de la API y la configuración efectiva de la base de datos.
+    """
+    return {"status": "ok", "database": estado_base_datos()}
+
+
+@app.get("/metrics", tags=["root"], response_class=PlainTextResponse)
+def exportar_metricas():
+    """
+    Métricas de las peticiones medidas, por ruta, en formato de texto de Prometheus.
+    """
+    return PlainTextResponse(metricas.exportar(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/admin/slow-queries", tags=["admin"])
+def listar_consultas_lentas(limit: int = Query(50, ge=1, le=1000)):
+    """
+    Consultas lentas y recorridos completos de tabla registrados, de la más
+    reciente a la más antigua, con sus parámetros, la ruta que las lanzó y
+    su plan de ejecución.
+    """
+    return {
+        "configuracion": consultas_lentas.estado(),
+        "consultas": consultas_lentas.entradas(limit)
+    }
+
+
+@app.delete("/admin/slow-queries", status_code=204, tags=["admin"])
+def vaciar_consultas_lentas():
+    """
+    Vacía el registro de consultas lentas y la caché de planes.
     """
-    return {"status": "ok"}
+    consultas_lentas.reiniciar()
 
 
 if __name__ == "__main__":
@@ -1,5 +1,8 @@
 from .question import Question
 from .quiz_session import QuizSession
 from .answer import Answer
+from .estadistica import EstadisticaCategoria, EstadisticaGlobal
+from .cache_version import CacheVersion
+from .question_banda import QuestionBanda
 
-__all__ = ["Question", "QuizSession", "Answer"]
+__all__ = ["Question", "QuizSession", "Answer", "EstadisticaCategoria", "EstadisticaGlobal", "CacheVersion", "QuestionBanda"]
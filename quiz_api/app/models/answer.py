@@ -1,7 +1,7 @@
 """
 Modelo SQLAlchemy para respuestas de usuarios
 """
-from sqlalchemy import Column, Integer, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -19,8 +19,16 @@ class Answer(Base):
     - es_correcta: Si la respuesta es correcta
     - tiempo_respuesta_segundos: Tiempo que tardó en responder
     - created_at: Fecha de creación del registro
+
+    Una pregunta solo puede responderse una vez por sesión; la restricción
+    única (quiz_session_id, question_id) lo garantiza en la base de datos.
     """
     __tablename__ = "answers"
+    __table_args__ = (
+        Index("uq_answers_sesion_pregunta", "quiz_session_id", "question_id", unique=True),
+        # Índice cubriente para agregar aciertos por pregunta sin leer la tabla
+        Index("ix_answers_pregunta_correcta", "question_id", "es_correcta"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     quiz_session_id = Column(Integer, ForeignKey("quiz_sessions.id"), nullable=False, index=True)
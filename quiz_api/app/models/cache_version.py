@@ -0,0 +1,26 @@
+"""
+Modelo SQLAlchemy para los contadores de versión de las cachés en memoria
+"""
+from sqlalchemy import Column, Integer, String
+from app.database import Base
+
+
+class CacheVersion(Base):
+    """
+    Versión de un conjunto de datos cacheado en memoria por los workers.
+
+    Cada escritura sobre esos datos incrementa la versión en su misma
+    transacción; los workers comparan la versión con la última que vieron
+    para saber si deben invalidar sus cachés.
+
+    Campos:
+    - nombre: Conjunto de datos (por ejemplo "preguntas")
+    - version: Contador que crece con cada escritura confirmada
+    """
+    __tablename__ = "cache_versiones"
+
+    nombre = Column(String(50), primary_key=True)
+    version = Column(Integer, default=0, server_default="0", nullable=False)
+
+    def __repr__(self):
+        return f"<CacheVersion(nombre={self.nombre}, version={self.version})>"
@@ -0,0 +1,49 @@
+"""
+Modelos SQLAlchemy para los agregados materializados de estadísticas
+"""
+from sqlalchemy import Column, Integer, String
+from app.database import Base
+
+
+class EstadisticaCategoria(Base):
+    """
+    Totales de respuestas por categoría de pregunta.
+
+    Campos:
+    - categoria: Categoría de la pregunta (clave primaria)
+    - total_respuestas: Respuestas registradas a preguntas de la categoría
+    - respuestas_correctas: Cuántas de ellas fueron correctas
+    """
+    __tablename__ = "estadisticas_categoria"
+
+    categoria = Column(String(50), primary_key=True)
+    total_respuestas = Column(Integer, default=0, server_default="0", nullable=False)
+    respuestas_correctas = Column(Integer, default=0, server_default="0", nullable=False)
+
+    def __repr__(self):
+        return f"<EstadisticaCategoria(categoria={self.categoria}, total={self.total_respuestas})>"
+
+
+class EstadisticaGlobal(Base):
+    """
+    Totales globales del sistema. Solo existe la fila con id = 1.
+
+    Campos:
+    - id: Siempre 1
+    - total_respuestas: Respuestas registradas en todas las sesiones
+    - respuestas_correctas: Cuántas de ellas fueron correctas
+    - sesiones_completadas: Sesiones en estado completado
+    - respondidas_completadas: Preguntas respondidas en sesiones completadas
+    - correctas_completadas: Respuestas correctas en sesiones completadas
+    """
+    __tablename__ = "estadisticas_global"
+
+    id = Column(Integer, primary_key=True)
+    total_respuestas = Column(Integer, default=0, server_default="0", nullable=False)
+    respuestas_correctas = Column(Integer, default=0, server_default="0", nullable=False)
+    sesiones_completadas = Column(Integer, default=0, server_default="0", nullable=False)
+    respondidas_completadas = Column(Integer, default=0, server_default="0", nullable=False)
+    correctas_completadas = Column(Integer, default=0, server_default="0", nullable=False)
+
+    def __repr__(self):
+        return f"<EstadisticaGlobal(respuestas={self.total_respuestas}, sesiones={self.sesiones_completadas})>"
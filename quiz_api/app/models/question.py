@@ -1,7 +1,7 @@
 """
 Modelo SQLAlchemy para preguntas de quiz
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, Index, ForeignKey
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -21,8 +21,17 @@ class Question(Base):
     - dificultad: Nivel de dificultad (fácil, medio, difícil)
     - created_at: Fecha de creación
     - is_active: Si la pregunta está activa
+    - huella: Hash del texto normalizado y las opciones sin orden (duplicados exactos)
+    - duplicado_de: Pregunta original si se importó marcada como duplicada
     """
     __tablename__ = "questions"
+    __table_args__ = (
+        # Paginación por cursor filtrando por categoría o dificultad: igualdades
+        # seguidas del id para saltar al cursor y recorrer en orden. Sin filtros
+        # basta el índice de is_active, que en SQLite ya termina en el rowid
+        Index("ix_questions_activa_categoria_id", "is_active", "categoria", "id"),
+        Index("ix_questions_activa_dificultad_id", "is_active", "dificultad", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     pregunta = Column(String(500), nullable=False, index=True)
@@ -33,6 +42,8 @@ class Question(Base):
     dificultad = Column(String(20), nullable=False, index=True)  # fácil, medio, difícil
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
     is_active = Column(Boolean, default=True, index=True)
+    huella = Column(String(40), nullable=True, index=True)
+    duplicado_de = Column(Integer, ForeignKey("questions.id"), nullable=True)
 
     # Relaciones
     answers = relationship("Answer", back_populates="question", cascade="all, delete-orphan")
@@ -0,0 +1,32 @@
+"""
+Modelo SQLAlchemy para las bandas LSH de las firmas MinHash de las preguntas
+"""
+from sqlalchemy import Column, ForeignKey, Index, Integer
+from app.database import Base
+
+
+class QuestionBanda(Base):
+    """
+    Banda de la firma MinHash de una pregunta.
+
+    Dos preguntas parecidas comparten con alta probabilidad al menos una
+    banda, así que los candidatos a duplicado de una pregunta se obtienen con
+    una búsqueda por índice en lugar de comparar con todo el banco.
+
+    Campos:
+    - question_id: Pregunta a la que pertenece la banda
+    - banda: Número de banda (0-based)
+    - clave: Hash de los valores MinHash de la banda
+    """
+    __tablename__ = "question_bandas"
+    __table_args__ = (
+        # Termina en question_id para leer las cubetas en orden sin ordenar aparte
+        Index("ix_question_bandas_banda_clave", "banda", "clave", "question_id"),
+    )
+
+    question_id = Column(Integer, ForeignKey("questions.id", ondelete="CASCADE"), primary_key=True)
+    banda = Column(Integer, primary_key=True)
+    clave = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<QuestionBanda(question_id={self.question_id}, banda={self.banda})>"
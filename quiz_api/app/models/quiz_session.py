@@ -1,7 +1,7 @@
 """
 Modelo SQLAlchemy para sesiones de quiz
 """
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, JSON
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -21,7 +21,14 @@ class QuizSession(Base):
     - preguntas_correctas: Número de respuestas correctas
     - estado: Estado de la sesión (en_progreso, completado, abandonado)
     - tiempo_total_segundos: Tiempo total en segundos
+    - tiempo_respuestas_total: Suma de los tiempos de respuesta registrados
+    - respuestas_con_tiempo: Número de respuestas con tiempo registrado
     - created_at: Fecha de creación del registro
+    - preguntas_asignadas: IDs de las preguntas repartidas al iniciarla con
+      POST /quiz-sessions/start (None si se creó sin preguntas)
+
+    Los contadores de respuestas se actualizan en la misma transacción que
+    inserta o modifica cada respuesta (ver QuizService.acumular_en_sesion).
     """
     __tablename__ = "quiz_sessions"
 
@@ -34,7 +41,10 @@ class QuizSession(Base):
     preguntas_correctas = Column(Integer, default=0)
     estado = Column(String(20), default="en_progreso", index=True)  # en_progreso, completado, abandonado
     tiempo_total_segundos = Column(Integer, nullable=True)
+    tiempo_respuestas_total = Column(Integer, default=0, server_default="0", nullable=False)
+    respuestas_con_tiempo = Column(Integer, default=0, server_default="0", nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    preguntas_asignadas = Column(JSON, nullable=True)  # Array de IDs de preguntas
 
     # Relaciones
     answers = relationship("Answer", back_populates="quiz_session", cascade="all, delete-orphan")
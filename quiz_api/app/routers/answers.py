@@ -2,25 +2,160 @@
 Router para gestionar respuestas
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from datetime import datetime
 from typing import List
 
-from app.database import get_db
+from app.database import get_async_db, get_db
 from app.models.answer import Answer
 from app.models.question import Question
 from app.models.quiz_session import QuizSession
 from app.schemas.answer import (
-    AnswerCreate, AnswerResponse, AnswerUpdate, AnswerDetailResponse
+    AnswerCreate, AnswerResponse, AnswerUpdate, AnswerDetailResponse,
+    AnswerBatchCreate, AnswerBatchResponse
 )
+from app.services.question_cache import question_cache
 from app.services.quiz_service import QuizService
+from app.services.serializacion import RESPUESTAS_RAPIDAS, respuesta_json
 
 router = APIRouter(prefix="/answers", tags=["answers"])
 
+# Error al responder en una sesión iniciada con /quiz-sessions/start una
+# pregunta que no se le repartió
+PREGUNTA_NO_ASIGNADA = "La pregunta no se asignó a esta sesión"
+
+
+def _asignada(preguntas_asignadas, question_id: int) -> bool:
+    """Si la pregunta se puede responder en una sesión (sin preguntas asignadas, todas)."""
+    return preguntas_asignadas is None or question_id in preguntas_asignadas
+
+
+def _es_respuesta_repetida(error: IntegrityError) -> bool:
+    """
+    Si el error lo causa el índice único (quiz_session_id, question_id) y no
+    otra restricción. PostgreSQL nombra el índice en el mensaje; SQLite, sus
+    columnas.
+    """
+    mensaje = str(error.orig)
+    return (
+        "uq_answers_sesion_pregunta" in mensaje
+        or "answers.quiz_session_id, answers.question_id" in mensaje
+    )
+
+
+def _consulta_detalle():
+    """
+    Consulta que une cada respuesta con su pregunta y proyecta solo las
+    columnas que necesita AnswerDetailResponse.
+    """
+    return select(
+        Answer.id,
+        Answer.quiz_session_id,
+        Answer.question_id,
+        Answer.respuesta_seleccionada,
+        Answer.es_correcta,
+        Answer.tiempo_respuesta_segundos,
+        Answer.created_at,
+        Question.pregunta,
+        Question.opciones,
+        Question.respuesta_correcta
+    ).outerjoin(Question, Question.id == Answer.question_id)
+
+
+def _detalle_desde_fila(fila) -> dict:
+    """Convierte una fila de `_consulta_detalle` en el diccionario de AnswerDetailResponse."""
+    opciones = fila.opciones
+    # Mismo orden de claves que los campos del esquema, para que la
+    # serialización rápida produzca el mismo JSON que Pydantic
+    return {
+        "quiz_session_id": fila.quiz_session_id,
+        "question_id": fila.question_id,
+        "respuesta_seleccionada": fila.respuesta_seleccionada,
+        "tiempo_respuesta_segundos": fila.tiempo_respuesta_segundos,
+        "id": fila.id,
+        "es_correcta": fila.es_correcta,
+        "created_at": fila.created_at,
+        "pregunta_texto": fila.pregunta,
+        "opciones": opciones,
+        "respuesta_correcta_indice": fila.respuesta_correcta,
+        "respuesta_seleccionada_texto": (
+            opciones[fila.respuesta_seleccionada]
+            if opciones is not None and fila.respuesta_seleccionada < len(opciones) else None
+        )
+    }
+
+
+def _registrar_respuesta(db: Session, respuesta: AnswerCreate):
+    """Valida e inserta una respuesta con el mínimo de sentencias."""
+    # Con la caché caliente la pregunta no se consulta: la existencia de la
+    # sesión la confirma el UPDATE de sus contadores
+    pregunta = question_cache.obtener(db, respuesta.question_id)
+    if pregunta is None:
+        # Distinguir qué falta solo en el camino de error
+        if db.get(QuizSession, respuesta.quiz_session_id) is None:
+            raise HTTPException(status_code=404, detail="Sesión no encontrada")
+        raise HTTPException(status_code=404, detail="Pregunta no encontrada")
+    
+    # Validar que la respuesta no está fuera de rango
+    if respuesta.respuesta_seleccionada < 0 or respuesta.respuesta_seleccionada >= len(pregunta.opciones):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Respuesta debe estar entre 0 y {len(pregunta.opciones) - 1}"
+        )
+    
+    valores = {
+        "quiz_session_id": respuesta.quiz_session_id,
+        "question_id": respuesta.question_id,
+        "respuesta_seleccionada": respuesta.respuesta_seleccionada,
+        "es_correcta": respuesta.respuesta_seleccionada == pregunta.respuesta_correcta,
+        "tiempo_respuesta_segundos": respuesta.tiempo_respuesta_segundos,
+        "created_at": datetime.utcnow()
+    }
+    
+    # Los contadores de la sesión se actualizan en la misma transacción y los
+    # duplicados los rechaza el índice único (quiz_session_id, question_id)
+    tiempo = respuesta.tiempo_respuesta_segundos or 0
+    correctas = int(valores["es_correcta"])
+    try:
+        sesion = QuizService.acumular_en_sesion(
+            db,
+            respuesta.quiz_session_id,
+            respondidas=1,
+            correctas=correctas,
+            tiempo=tiempo,
+            con_tiempo=int(tiempo > 0)
+        )
+        if sesion is None:
+            db.rollback()
+            raise HTTPException(status_code=404, detail="Sesión no encontrada")
+        # Las preguntas repartidas vuelven en el mismo UPDATE, sin otra consulta
+        if not _asignada(sesion.preguntas_asignadas, respuesta.question_id):
+            db.rollback()
+            raise HTTPException(status_code=400, detail=PREGUNTA_NO_ASIGNADA)
+        resultado = db.execute(insert(Answer).values(**valores))
+        QuizService.acumular_estadisticas(
+            db, {pregunta.categoria: (1, correctas)}, sesion_completada=sesion.estado == "completado"
+        )
+        db.commit()
+    except IntegrityError as error:
+        db.rollback()
+        if not _es_respuesta_repetida(error):
+            raise
+        raise HTTPException(
+            status_code=400,
+            detail="Ya has respondido esta pregunta en esta sesión"
+        )
+    
+    # El ID sale del propio INSERT, sin refrescar la fila
+    return {"id": resultado.inserted_primary_key[0], **valores}
+
 
 @router.post("/", response_model=AnswerResponse, status_code=201)
-def registrar_respuesta(
+async def registrar_respuesta(
     respuesta: AnswerCreate,
-    db: Session = Depends(get_db)
+    db=Depends(get_async_db)
 ):
     """
     Registrar una respuesta del usuario.
@@ -35,50 +170,132 @@ def registrar_respuesta(
     Raises:
         HTTPException: Si hay errores de validación
     """
-    # Validar que la sesión existe
-    sesion = db.query(QuizSession).filter(QuizSession.id == respuesta.quiz_session_id).first()
+    return await db.run_sync(_registrar_respuesta, respuesta)
+
+
+def _registrar_respuestas_lote(db: Session, lote: AnswerBatchCreate):
+    """Valida e inserta un lote de respuestas en una sola transacción."""
+    sesion = db.query(QuizSession).filter(QuizSession.id == lote.quiz_session_id).first()
     if not sesion:
         raise HTTPException(status_code=404, detail="Sesión no encontrada")
     
-    # Validar que la pregunta existe
-    pregunta = db.query(Question).filter(Question.id == respuesta.question_id).first()
-    if not pregunta:
-        raise HTTPException(status_code=404, detail="Pregunta no encontrada")
-    
-    # Validar que la respuesta no está fuera de rango
-    if respuesta.respuesta_seleccionada < 0 or respuesta.respuesta_seleccionada >= len(pregunta.opciones):
-        raise HTTPException(
-            status_code=400,
-            detail=f"Respuesta debe estar entre 0 y {len(pregunta.opciones) - 1}"
+    ids_preguntas = {item.question_id for item in lote.respuestas}
+    preguntas = question_cache.obtener_varios(db, ids_preguntas) if ids_preguntas else {}
+    ya_respondidas = set(db.scalars(
+        select(Answer.question_id).where(
+            Answer.quiz_session_id == lote.quiz_session_id,
+            Answer.question_id.in_(ids_preguntas)
         )
+    )) if ids_preguntas else set()
+    
+    filas = []
+    errores = []
+    por_categoria = {}
+    creado = datetime.utcnow()
+    for indice, item in enumerate(lote.respuestas):
+        pregunta = preguntas.get(item.question_id)
+        if pregunta is None:
+            detalle = "Pregunta no encontrada"
+        elif not _asignada(sesion.preguntas_asignadas, item.question_id):
+            detalle = PREGUNTA_NO_ASIGNADA
+        elif item.question_id in ya_respondidas:
+            detalle = "Ya has respondido esta pregunta en esta sesión"
+        elif item.respuesta_seleccionada >= len(pregunta.opciones):
+            detalle = f"Respuesta debe estar entre 0 y {len(pregunta.opciones) - 1}"
+        else:
+            detalle = None
+        
+        if detalle:
+            errores.append({"indice": indice, "question_id": item.question_id, "detalle": detalle})
+            continue
+        
+        ya_respondidas.add(item.question_id)
+        es_correcta = item.respuesta_seleccionada == pregunta.respuesta_correcta
+        total, correctas = por_categoria.get(pregunta.categoria, (0, 0))
+        por_categoria[pregunta.categoria] = (total + 1, correctas + int(es_correcta))
+        filas.append({
+            "quiz_session_id": lote.quiz_session_id,
+            "question_id": item.question_id,
+            "respuesta_seleccionada": item.respuesta_seleccionada,
+            "es_correcta": es_correcta,
+            "tiempo_respuesta_segundos": item.tiempo_respuesta_segundos,
+            "created_at": creado
+        })
     
-    # Validar que no hay respuesta duplicada
-    if QuizService.verificar_respuesta_duplicada(db, respuesta.quiz_session_id, respuesta.question_id):
+    try:
+        if filas:
+            ids = db.scalars(
+                insert(Answer).returning(Answer.id, sort_by_parameter_order=True),
+                filas
+            ).all()
+            for fila, answer_id in zip(filas, ids):
+                fila["id"] = answer_id
+        
+        if filas:
+            tiempos = [fila["tiempo_respuesta_segundos"] or 0 for fila in filas]
+            # Primero la sesión: si hay que reconstruir los agregados, sus
+            # contadores ya deben incluir el lote
+            QuizService.acumular_en_sesion(
+                db,
+                lote.quiz_session_id,
+                respondidas=len(filas),
+                correctas=sum(1 for fila in filas if fila["es_correcta"]),
+                tiempo=sum(tiempos),
+                con_tiempo=sum(1 for t in tiempos if t > 0)
+            )
+            QuizService.acumular_estadisticas(
+                db, por_categoria, sesion_completada=sesion.estado == "completado"
+            )
+        
+        if lote.completar:
+            QuizService.marcar_completada(db, sesion, lote.tiempo_total_segundos)
+        
+        db.commit()
+    except IntegrityError as error:
+        db.rollback()
+        if not _es_respuesta_repetida(error):
+            raise
         raise HTTPException(
             status_code=400,
-            detail="Ya has respondido esta pregunta en esta sesión"
+            detail="Alguna de las preguntas ya fue respondida en esta sesión"
         )
     
-    # Validar si la respuesta es correcta
-    try:
-        es_correcta = QuizService.validar_respuesta(db, respuesta.question_id, respuesta.respuesta_seleccionada)
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    
-    # Crear respuesta
-    db_respuesta = Answer(
-        quiz_session_id=respuesta.quiz_session_id,
-        question_id=respuesta.question_id,
-        respuesta_seleccionada=respuesta.respuesta_seleccionada,
-        es_correcta=es_correcta,
-        tiempo_respuesta_segundos=respuesta.tiempo_respuesta_segundos
-    )
+    if lote.completar:
+        # Recargar dentro de la sesión: la respuesta se serializa fuera de ella
+        db.refresh(sesion)
     
-    db.add(db_respuesta)
-    db.commit()
-    db.refresh(db_respuesta)
+    return {
+        "quiz_session_id": lote.quiz_session_id,
+        "registradas": filas,
+        "errores": errores,
+        "sesion": sesion if lote.completar else None
+    }
+
+
+@router.post("/batch", response_model=AnswerBatchResponse, status_code=201)
+async def registrar_respuestas_lote(
+    lote: AnswerBatchCreate,
+    db=Depends(get_async_db)
+):
+    """
+    Registrar todas las respuestas de una sesión en una sola petición.
+    
+    Las preguntas referenciadas se cargan con una única consulta, las
+    respuestas válidas se insertan de una vez y todo se confirma en una sola
+    transacción. Las respuestas inválidas no detienen el lote: se informan
+    una a una en `errores`.
     
-    return db_respuesta
+    Args:
+        lote: Sesión, respuestas y si se debe completar la sesión
+        db: Sesión de base de datos
+        
+    Returns:
+        AnswerBatchResponse: Respuestas registradas, errores y la sesión si se completó
+        
+    Raises:
+        HTTPException: Si la sesión no existe o alguna respuesta se registró en paralelo
+    """
+    return await db.run_sync(_registrar_respuestas_lote, lote)
 
 
 @router.get("/session/{session_id}", response_model=List[AnswerDetailResponse])
@@ -99,33 +316,18 @@ def obtener_respuestas_sesion(
     Raises:
         HTTPException: Si la sesión no existe
     """
-    # Validar que la sesión existe
-    sesion = db.query(QuizSession).filter(QuizSession.id == session_id).first()
-    if not sesion:
-        raise HTTPException(status_code=404, detail="Sesión no encontrada")
+    filas = db.execute(
+        _consulta_detalle().where(Answer.quiz_session_id == session_id).order_by(Answer.id)
+    )
+    resultado = [_detalle_desde_fila(fila) for fila in filas]
     
-    respuestas = db.query(Answer).filter(Answer.quiz_session_id == session_id).all()
-    
-    # Mapear a AnswerDetailResponse
-    resultado = []
-    for respuesta in respuestas:
-        pregunta = db.query(Question).filter(Question.id == respuesta.question_id).first()
-        
-        detalle = AnswerDetailResponse(
-            id=respuesta.id,
-            quiz_session_id=respuesta.quiz_session_id,
-            question_id=respuesta.question_id,
-            respuesta_seleccionada=respuesta.respuesta_seleccionada,
-            es_correcta=respuesta.es_correcta,
-            tiempo_respuesta_segundos=respuesta.tiempo_respuesta_segundos,
-            created_at=respuesta.created_at,
-            pregunta_texto=pregunta.pregunta if pregunta else None,
-            opciones=pregunta.opciones if pregunta else None,
-            respuesta_correcta_indice=pregunta.respuesta_correcta if pregunta else None,
-            respuesta_seleccionada_texto=pregunta.opciones[respuesta.respuesta_seleccionada] if pregunta else None
-        )
-        resultado.append(detalle)
+    # Una sesión sin respuestas es indistinguible de una inexistente en el
+    # join, así que solo en ese caso se comprueba la sesión
+    if not resultado and db.get(QuizSession, session_id) is None:
+        raise HTTPException(status_code=404, detail="Sesión no encontrada")
     
+    if RESPUESTAS_RAPIDAS:
+        return respuesta_json(resultado)
     return resultado
 
 
@@ -147,28 +349,12 @@ def obtener_respuesta(
     Raises:
         HTTPException: Si la respuesta no existe
     """
-    respuesta = db.query(Answer).filter(Answer.id == answer_id).first()
+    fila = db.execute(_consulta_detalle().where(Answer.id == answer_id)).first()
     
-    if not respuesta:
+    if not fila:
         raise HTTPException(status_code=404, detail="Respuesta no encontrada")
     
-    pregunta = db.query(Question).filter(Question.id == respuesta.question_id).first()
-    
-    detalle = AnswerDetailResponse(
-        id=respuesta.id,
-        quiz_session_id=respuesta.quiz_session_id,
-        question_id=respuesta.question_id,
-        respuesta_seleccionada=respuesta.respuesta_seleccionada,
-        es_correcta=respuesta.es_correcta,
-        tiempo_respuesta_segundos=respuesta.tiempo_respuesta_segundos,
-        created_at=respuesta.created_at,
-        pregunta_texto=pregunta.pregunta if pregunta else None,
-        opciones=pregunta.opciones if pregunta else None,
-        respuesta_correcta_indice=pregunta.respuesta_correcta if pregunta else None,
-        respuesta_seleccionada_texto=pregunta.opciones[respuesta.respuesta_seleccionada] if pregunta else None
-    )
-    
-    return detalle
+    return _detalle_desde_fila(fila)
 
 
 @router.put("/{answer_id}", response_model=AnswerResponse)
@@ -196,7 +382,10 @@ def actualizar_respuesta(
     if not respuesta:
         raise HTTPException(status_code=404, detail="Respuesta no encontrada")
     
-    pregunta = db.query(Question).filter(Question.id == respuesta.question_id).first()
+    pregunta = question_cache.obtener(db, respuesta.question_id)
+    
+    era_correcta = respuesta.es_correcta
+    tiempo_anterior = respuesta.tiempo_respuesta_segundos or 0
     
     # Si se actualiza la respuesta seleccionada, validar el rango y recalcular si es correcta
     if respuesta_update.respuesta_seleccionada is not None:
@@ -212,6 +401,22 @@ def actualizar_respuesta(
     if respuesta_update.tiempo_respuesta_segundos is not None:
         respuesta.tiempo_respuesta_segundos = respuesta_update.tiempo_respuesta_segundos
     
+    # Trasladar a la sesión solo la diferencia con la respuesta anterior
+    tiempo_nuevo = respuesta.tiempo_respuesta_segundos or 0
+    diferencia_correctas = int(respuesta.es_correcta) - int(era_correcta)
+    sesion = QuizService.acumular_en_sesion(
+        db,
+        respuesta.quiz_session_id,
+        correctas=diferencia_correctas,
+        tiempo=tiempo_nuevo - tiempo_anterior,
+        con_tiempo=int(tiempo_nuevo > 0) - int(tiempo_anterior > 0)
+    )
+    QuizService.acumular_estadisticas(
+        db,
+        {pregunta.categoria: (0, diferencia_correctas)},
+        sesion_completada=sesion.estado == "completado"
+    )
+    
     db.commit()
     db.refresh(respuesta)
     
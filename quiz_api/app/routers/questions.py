@@ -1,72 +1,170 @@
 """
 Router para gestionar preguntas (CRUD)
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+import tempfile
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-import random
-from typing import List
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Dict, List
 
-from app.database import get_db
+from app.database import get_async_db, get_db
 from app.models.question import Question
 from app.schemas.question import (
-    QuestionCreate, QuestionResponse, QuestionUpdate, QuestionBulkCreate
+    QuestionCreate, QuestionResponse, QuestionUpdate, QuestionBulkCreate,
+    QuestionImportResponse, QuestionDuplicateCluster
+)
+from app.services.busqueda import buscar_preguntas
+from app.services.coherencia import coherencia
+from app.services.duplicados import (
+    UMBRAL_SIMILITUD, InsercionPreguntas, actualizar_firma, agrupar_duplicados,
+    buscar_duplicado, calcular_firma, fusionar_pregunta, guardar_bandas
+)
+from app.services.etags import coincide, etiqueta, no_modificado
+from app.services.paginacion import (
+    codificar_cursor, codificar_cursor_busqueda, decodificar_cursor, decodificar_cursor_busqueda
 )
+from app.services.question_cache import question_cache
+from app.services.question_importer import importar_preguntas
+from app.services.question_sampler import question_sampler
+from app.services.quiz_service import QuizService
+from app.services.serializacion import RESPUESTAS_RAPIDAS, columnas, filas_a_dicts, respuesta_json
 
 router = APIRouter(prefix="/questions", tags=["questions"])
 
+# Valores aceptados por el parámetro `duplicados` (ver services.duplicados)
+POLITICA_DUPLICADOS = "^(permitir|rechazar|marcar|fusionar)$"
+# Preguntas devueltas por cada grupo de duplicados
+MAX_PREGUNTAS_POR_GRUPO = 50
+# Columnas de QuestionResponse para la serialización rápida (RESPUESTAS_RAPIDAS)
+_COLUMNAS_RESPUESTA = columnas(QuestionResponse, Question)
+_CAMPOS_RESPUESTA = tuple(QuestionResponse.model_fields)
+
+
+def _entidad_listado():
+    """Lo que consultan los listados: la entidad, o sus columnas con RESPUESTAS_RAPIDAS."""
+    return _COLUMNAS_RESPUESTA if RESPUESTAS_RAPIDAS else [Question]
+
+
+def _etag_preguntas(db: Session) -> str:
+    """ETag del banco de preguntas según la versión vista tras revalidar."""
+    coherencia.revalidar(db, "preguntas")
+    return etiqueta("preguntas", coherencia.version("preguntas"))
+
+
+def _rechazar_duplicados(duplicados: List[Dict[str, Any]]):
+    """Lanza un 409 con las preguntas duplicadas encontradas."""
+    raise HTTPException(
+        status_code=409,
+        detail={"mensaje": "Preguntas duplicadas de otras existentes", "duplicados": duplicados}
+    )
+
 
 @router.post("/", response_model=QuestionResponse, status_code=201)
 def crear_pregunta(
     pregunta: QuestionCreate,
+    duplicados: str = Query(
+        "permitir", pattern=POLITICA_DUPLICADOS,
+        description="Política si ya existe una pregunta parecida: permitir, rechazar, marcar o fusionar"
+    ),
     db: Session = Depends(get_db)
 ):
     """
     Crear una nueva pregunta.
     
+    Con `duplicados=fusionar` y una pregunta parecida ya existente no se crea
+    ninguna y se devuelve la original.
+    
     Args:
         pregunta: Datos de la pregunta a crear
+        duplicados: Política ante preguntas parecidas a otras del banco
         db: Sesión de base de datos
         
     Returns:
-        QuestionResponse: La pregunta creada
+        QuestionResponse: La pregunta creada (o la original, al fusionar)
+        
+    Raises:
+        HTTPException: Si la pregunta es duplicada y la política es rechazar
     """
+    firma = calcular_firma(pregunta.pregunta, pregunta.opciones)
+    duplicado = None
+    if duplicados != "permitir":
+        duplicado = buscar_duplicado(db, firma)
+    if duplicado is not None and duplicados == "rechazar":
+        _rechazar_duplicados([
+            {"indice": 0, "duplicado_de": duplicado.question_id, "similitud": round(duplicado.similitud, 4)}
+        ])
+    if duplicado is not None and duplicados == "fusionar":
+        if fusionar_pregunta(db, duplicado.question_id, pregunta.model_dump()):
+            coherencia.incrementar(db, "preguntas")
+            db.commit()
+        return db.query(Question).filter(Question.id == duplicado.question_id).first()
+    
     db_pregunta = Question(
         pregunta=pregunta.pregunta,
         opciones=pregunta.opciones,
         respuesta_correcta=pregunta.respuesta_correcta,
         explicacion=pregunta.explicacion,
         categoria=pregunta.categoria,
-        dificultad=pregunta.dificultad
+        dificultad=pregunta.dificultad,
+        huella=firma.huella,
+        duplicado_de=duplicado.question_id if duplicado else None
     )
     db.add(db_pregunta)
+    db.flush()
+    guardar_bandas(db, [(db_pregunta.id, firma)])
+    coherencia.incrementar(db, "preguntas")
     db.commit()
     db.refresh(db_pregunta)
+    question_sampler.registrar(db_pregunta)
+    question_cache.registrar(db_pregunta)
     return db_pregunta
 
 
 @router.get("/", response_model=List[QuestionResponse])
 def listar_preguntas(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0, description="Número de registros a saltar"),
     limit: int = Query(10, ge=1, le=100, description="Límite de registros"),
     categoria: str = Query(None, description="Filtrar por categoría"),
     dificultad: str = Query(None, description="Filtrar por dificultad (fácil, medio, difícil)"),
+    cursor: str = Query(None, description="Cursor de la cabecera X-Next-Cursor de la página anterior"),
     db: Session = Depends(get_db)
 ):
     """
     Listar preguntas con paginación y filtros opcionales.
     
+    Admite dos modos de paginación: `skip`/`limit` y por cursor. Si hay más
+    resultados, la respuesta incluye la cabecera `X-Next-Cursor`; pasarla como
+    `cursor` devuelve la página siguiente sin recorrer las anteriores y sin
+    saltos aunque se inserten preguntas entre medias.
+    
+    La respuesta lleva un ETag que cambia con cualquier escritura de
+    preguntas; con If-None-Match se responde 304 sin consultar las preguntas.
+    
     Args:
+        request: Petición HTTP (para If-None-Match)
+        response: Respuesta HTTP, para añadir las cabeceras X-Next-Cursor y ETag
         skip: Número de registros a saltar
         limit: Límite de registros a retornar
         categoria: Filtrar por categoría (opcional)
         dificultad: Filtrar por dificultad (opcional)
+        cursor: Cursor de la página anterior (opcional, no combinable con skip)
         db: Sesión de base de datos
         
     Returns:
         List[QuestionResponse]: Lista de preguntas
+        
+    Raises:
+        HTTPException: Si el cursor no es válido o se combina con skip
     """
-    query = db.query(Question).filter(Question.is_active == True)
+    etag = _etag_preguntas(db)
+    if coincide(request, etag):
+        return no_modificado(etag)
+    response.headers["ETag"] = etag
+    
+    query = db.query(*_entidad_listado()).filter(Question.is_active == True)
     
     if categoria:
         query = query.filter(Question.categoria == categoria)
@@ -74,16 +172,43 @@ def listar_preguntas(
     if dificultad:
         query = query.filter(Question.dificultad == dificultad.lower())
     
-    preguntas = query.offset(skip).limit(limit).all()
+    if cursor is not None:
+        if skip:
+            raise HTTPException(status_code=400, detail="skip y cursor no se pueden combinar")
+        try:
+            query = query.filter(Question.id > decodificar_cursor(cursor))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    # Pedir una fila de más para saber si existe una página siguiente
+    preguntas = query.order_by(Question.id).offset(skip).limit(limit + 1).all()
+    if len(preguntas) > limit:
+        preguntas = preguntas[:limit]
+        response.headers["X-Next-Cursor"] = codificar_cursor(preguntas[-1].id)
+    if RESPUESTAS_RAPIDAS:
+        return respuesta_json(filas_a_dicts(preguntas, _CAMPOS_RESPUESTA), response)
+    return preguntas
+
+
+def _obtener_preguntas_aleatorias(db: Session, limit: int, categoria: str, dificultad: str):
+    """Elige las preguntas con el índice en memoria y las carga con una sola consulta."""
+    try:
+        preguntas = QuizService.obtener_preguntas_aleatorias(
+            db, limit, categoria, dificultad, entidades=_entidad_listado()
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if RESPUESTAS_RAPIDAS:
+        return respuesta_json(filas_a_dicts(preguntas, _CAMPOS_RESPUESTA))
     return preguntas
 
 
 @router.get("/random", response_model=List[QuestionResponse])
-def obtener_preguntas_aleatorias(
+async def obtener_preguntas_aleatorias(
     limit: int = Query(10, ge=1, le=50, description="Número de preguntas aleatorias"),
     categoria: str = Query(None, description="Filtrar por categoría"),
     dificultad: str = Query(None, description="Filtrar por dificultad"),
-    db: Session = Depends(get_db)
+    db=Depends(get_async_db)
 ):
     """
     Obtener preguntas aleatorias para un quiz.
@@ -100,36 +225,123 @@ def obtener_preguntas_aleatorias(
     Raises:
         HTTPException: Si no hay suficientes preguntas disponibles
     """
-    query = db.query(Question).filter(Question.is_active == True)
+    return await db.run_sync(_obtener_preguntas_aleatorias, limit, categoria, dificultad)
+
+
+@router.get("/search", response_model=List[QuestionResponse])
+def buscar(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200, description="Texto a buscar"),
+    limit: int = Query(20, ge=1, le=100, description="Límite de resultados"),
+    categoria: str = Query(None, description="Filtrar por categoría"),
+    dificultad: str = Query(None, description="Filtrar por dificultad"),
+    cursor: str = Query(None, description="Cursor de la cabecera X-Next-Cursor de la página anterior"),
+    db: Session = Depends(get_db)
+):
+    """
+    Buscar preguntas por texto, explicación u opciones.
     
-    if categoria:
-        query = query.filter(Question.categoria == categoria)
+    Los resultados se ordenan por relevancia. Cada palabra se busca como
+    prefijo, sin distinguir mayúsculas ni tildes, y deben aparecer todas. Si
+    hay más resultados la respuesta incluye la cabecera `X-Next-Cursor`.
     
-    if dificultad:
-        query = query.filter(Question.dificultad == dificultad.lower())
+    Args:
+        response: Respuesta HTTP, para añadir la cabecera X-Next-Cursor
+        q: Texto a buscar
+        limit: Límite de resultados
+        categoria: Filtrar por categoría (opcional)
+        dificultad: Filtrar por dificultad (opcional)
+        cursor: Cursor de la página anterior (opcional)
+        db: Sesión de base de datos
+        
+    Returns:
+        List[QuestionResponse]: Preguntas encontradas
+        
+    Raises:
+        HTTPException: Si el cursor no es válido
+    """
+    posicion = None
+    if cursor is not None:
+        try:
+            posicion = decodificar_cursor_busqueda(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     
-    preguntas = query.all()
+    preguntas, siguiente = buscar_preguntas(db, q, limit, categoria, dificultad, posicion)
+    if siguiente is not None:
+        response.headers["X-Next-Cursor"] = codificar_cursor_busqueda(*siguiente)
+    return preguntas
+
+
+@router.get("/duplicates", response_model=List[QuestionDuplicateCluster])
+def listar_duplicados(
+    umbral: float = Query(UMBRAL_SIMILITUD, gt=0, le=1, description="Similitud mínima (0-1)"),
+    limit: int = Query(50, ge=1, le=200, description="Máximo de grupos"),
+    db: Session = Depends(get_db)
+):
+    """
+    Agrupar las preguntas activas del banco que son duplicadas entre sí.
     
-    if len(preguntas) < limit:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Solo hay {len(preguntas)} preguntas disponibles, se requieren {limit}"
-        )
+    Solo se comparan las preguntas que comparten alguna banda LSH, así que no
+    hace falta comparar cada pregunta con todas las demás. De cada grupo se
+    devuelven como mucho sus primeras 50 preguntas; `total` indica su tamaño.
     
-    preguntas_seleccionadas = random.sample(preguntas, limit)
-    return preguntas_seleccionadas
+    Args:
+        umbral: Similitud mínima para considerar duplicadas dos preguntas
+        limit: Máximo de grupos devueltos
+        db: Sesión de base de datos
+        
+    Returns:
+        List[QuestionDuplicateCluster]: Grupos ordenados por su primer ID
+    """
+    grupos = [
+        (miembros[:MAX_PREGUNTAS_POR_GRUPO], len(miembros), minima)
+        for miembros, minima in agrupar_duplicados(db, umbral)[:limit]
+    ]
+    ids = [question_id for miembros, _, _ in grupos for question_id in miembros]
+    preguntas = {
+        pregunta.id: pregunta
+        for pregunta in db.query(Question).filter(Question.id.in_(ids))
+    } if ids else {}
+    return [
+        {
+            "total": total,
+            "similitud_minima": minima,
+            "preguntas": [preguntas[question_id] for question_id in miembros]
+        }
+        for miembros, total, minima in grupos
+    ]
+
+
+@router.get("/cache/stats", response_model=Dict[str, Any])
+def estadisticas_cache():
+    """
+    Obtener los contadores de la caché de preguntas.
+    
+    Returns:
+        Dict con capacidad, tamaño, aciertos, fallos, expulsiones, tasa de
+        aciertos y el estado del canal de invalidación entre procesos
+    """
+    return {**question_cache.estadisticas(), "coherencia": coherencia.estado()}
 
 
 @router.get("/{question_id}", response_model=QuestionResponse)
 def obtener_pregunta(
     question_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """
     Obtener una pregunta específica por ID.
     
+    Admite GET condicional con If-None-Match, como el listado. El ETag
+    incluye el ID y solo se responde 304 si la pregunta existe.
+    
     Args:
         question_id: ID de la pregunta
+        request: Petición HTTP (para If-None-Match)
+        response: Respuesta HTTP, para añadir la cabecera ETag
         db: Sesión de base de datos
         
     Returns:
@@ -138,6 +350,14 @@ def obtener_pregunta(
     Raises:
         HTTPException: Si la pregunta no existe
     """
+    # La caché revalida las versiones, así que el ETag ya es el vigente
+    if question_cache.obtener(db, question_id) is None:
+        raise HTTPException(status_code=404, detail="Pregunta no encontrada")
+    etag = etiqueta("preguntas", coherencia.version("preguntas"), question_id)
+    if coincide(request, etag):
+        return no_modificado(etag)
+    response.headers["ETag"] = etag
+    
     pregunta = db.query(Question).filter(Question.id == question_id).first()
     
     if not pregunta:
@@ -173,11 +393,24 @@ def actualizar_pregunta(
     
     # Actualizar solo los campos proporcionados
     update_data = pregunta_update.model_dump(exclude_unset=True)
+    
+    # Las estadísticas por categoría siguen a la pregunta si cambia de categoría
+    nueva_categoria = update_data.get("categoria")
+    if nueva_categoria is not None and nueva_categoria != pregunta.categoria:
+        QuizService.mover_respuestas_de_categoria(
+            db, question_id, pregunta.categoria, nueva_categoria
+        )
+    
     for campo, valor in update_data.items():
         setattr(pregunta, campo, valor)
+    if "pregunta" in update_data or "opciones" in update_data:
+        actualizar_firma(db, pregunta)
     
+    coherencia.incrementar(db, "preguntas")
     db.commit()
     db.refresh(pregunta)
+    question_sampler.registrar(pregunta)
+    question_cache.registrar(pregunta)
     
     return pregunta
 
@@ -204,42 +437,121 @@ def eliminar_pregunta(
     
     # Soft delete
     pregunta.is_active = False
+    coherencia.incrementar(db, "preguntas")
     db.commit()
+    question_sampler.descartar(question_id)
+    question_cache.registrar(pregunta)
 
 
 @router.post("/bulk", response_model=List[QuestionResponse], status_code=201)
 def crear_preguntas_bulk(
     bulk_data: QuestionBulkCreate,
+    duplicados: str = Query(
+        "permitir", pattern=POLITICA_DUPLICADOS,
+        description="Política ante preguntas parecidas a otras del banco o de la lista"
+    ),
     db: Session = Depends(get_db)
 ):
     """
     Crear múltiples preguntas desde JSON.
     
+    Con `duplicados=rechazar` no se crea ninguna si alguna es duplicada. Con
+    `fusionar`, la posición de cada duplicada contiene la pregunta original.
+    
     Args:
         bulk_data: Objeto con lista de preguntas a crear
+        duplicados: Política ante preguntas parecidas (permitir, rechazar,
+            marcar o fusionar)
         db: Sesión de base de datos
         
     Returns:
-        List[QuestionResponse]: Lista de preguntas creadas
-    """
-    preguntas_creadas = []
-    
-    for pregunta_data in bulk_data.preguntas:
-        pregunta = Question(
-            pregunta=pregunta_data.pregunta,
-            opciones=pregunta_data.opciones,
-            respuesta_correcta=pregunta_data.respuesta_correcta,
-            explicacion=pregunta_data.explicacion,
-            categoria=pregunta_data.categoria,
-            dificultad=pregunta_data.dificultad
-        )
-        db.add(pregunta)
-        preguntas_creadas.append(pregunta)
+        List[QuestionResponse]: Lista de preguntas creadas, en el orden recibido
+        
+    Raises:
+        HTTPException: Si hay duplicadas y la política es rechazar
+    """
+    # Las preguntas se insertan con INSERT ... RETURNING, que devuelve las filas
+    # completas sin refrescar cada pregunta después del commit
+    insercion = InsercionPreguntas(db, duplicados, columnas=Question.__table__.columns)
+    encontrados = []
+    fusionadas = {}
+    for indice, pregunta_data in enumerate(bulk_data.preguntas):
+        duplicado = insercion.agregar(pregunta_data.model_dump())
+        if duplicado is not None:
+            encontrados.append({
+                "indice": indice,
+                "duplicado_de": duplicado.question_id,
+                "similitud": round(duplicado.similitud, 4)
+            })
+            if duplicados == "fusionar":
+                fusionadas[indice] = duplicado.question_id
+    
+    if encontrados and duplicados == "rechazar":
+        db.rollback()
+        _rechazar_duplicados(encontrados)
     
+    preguntas_creadas = insercion.vaciar()
+    coherencia.incrementar(db, "preguntas")
     db.commit()
     
-    # Refrescar todas las preguntas para obtener los IDs
     for pregunta in preguntas_creadas:
-        db.refresh(pregunta)
+        question_sampler.registrar(pregunta)
+    
+    if not fusionadas:
+        return preguntas_creadas
+    originales = {
+        pregunta.id: pregunta
+        for pregunta in db.query(Question).filter(Question.id.in_(set(fusionadas.values())))
+    }
+    creadas = iter(preguntas_creadas)
+    return [
+        originales[fusionadas[indice]] if indice in fusionadas else next(creadas)
+        for indice in range(len(bulk_data.preguntas))
+    ]
+
+
+@router.post("/import", response_model=QuestionImportResponse, status_code=201)
+async def importar_banco_preguntas(
+    request: Request,
+    tamano_lote: int = Query(1000, ge=1, le=10000, description="Preguntas por lote"),
+    duplicados: str = Query(
+        "permitir", pattern=POLITICA_DUPLICADOS,
+        description="Política ante preguntas parecidas a otras del banco o del archivo"
+    ),
+    db: Session = Depends(get_db)
+):
+    """
+    Importar un banco de preguntas en formato NDJSON o array JSON.
     
-    return preguntas_creadas
+    El cuerpo de la petición es el archivo tal cual (por ejemplo
+    `curl --data-binary @banco.ndjson`). Se procesa en streaming y por
+    lotes: cada lote se inserta con una sola sentencia y se confirma por
+    separado. Los elementos inválidos se informan en `errores` sin detener
+    la importación. Las preguntas duplicadas se informan en `duplicados` y
+    se tratan según la política indicada.
+    
+    Args:
+        request: Petición HTTP con el archivo en el cuerpo
+        tamano_lote: Preguntas por lote
+        duplicados: Política ante preguntas parecidas (permitir, rechazar,
+            marcar o fusionar)
+        db: Sesión de base de datos
+        
+    Returns:
+        QuestionImportResponse: Totales, primeros errores y resumen de cada lote
+        
+    Raises:
+        HTTPException: Si el array JSON está mal formado
+    """
+    # El cuerpo se vuelca a un archivo temporal (en memoria hasta 8 MB) y se
+    # importa en el threadpool para no bloquear el event loop
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as archivo:
+        async for bloque in request.stream():
+            archivo.write(bloque)
+        archivo.seek(0)
+        try:
+            return await run_in_threadpool(
+                importar_preguntas, db, archivo, tamano_lote, duplicados=duplicados
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
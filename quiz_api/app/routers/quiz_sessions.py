@@ -1,24 +1,38 @@
 """
 Router para gestionar sesiones de quiz
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from typing import List
 
-from app.database import get_db
+from app.database import get_async_db, get_db
 from app.models.quiz_session import QuizSession
 from app.schemas.quiz_session import (
-    QuizSessionCreate, QuizSessionResponse, QuizSessionUpdate, QuizSessionComplete
+    QuizSessionCreate, QuizSessionResponse, QuizSessionUpdate, QuizSessionComplete,
+    QuizSessionStart, QuizSessionStartResponse
 )
+from app.services.paginacion import codificar_cursor, decodificar_cursor
 from app.services.quiz_service import QuizService
 
 router = APIRouter(prefix="/quiz-sessions", tags=["quiz-sessions"])
 
 
+def _iniciar_sesion(db: Session, sesion: QuizSessionCreate):
+    """Crea la sesión y la devuelve ya refrescada."""
+    db_sesion = QuizSession(
+        usuario_nombre=sesion.usuario_nombre,
+        estado="en_progreso"
+    )
+    db.add(db_sesion)
+    db.commit()
+    db.refresh(db_sesion)
+    return db_sesion
+
+
 @router.post("/", response_model=QuizSessionResponse, status_code=201)
-def iniciar_sesion(
+async def iniciar_sesion(
     sesion: QuizSessionCreate,
-    db: Session = Depends(get_db)
+    db=Depends(get_async_db)
 ):
     """
     Iniciar una nueva sesión de quiz.
@@ -30,41 +44,105 @@ def iniciar_sesion(
     Returns:
         QuizSessionResponse: La sesión creada
     """
+    return await db.run_sync(_iniciar_sesion, sesion)
+
+
+def _iniciar_sesion_con_preguntas(db: Session, datos: QuizSessionStart):
+    """Elige las preguntas y crea la sesión que las tiene asignadas, en una transacción."""
+    try:
+        preguntas = QuizService.obtener_preguntas_aleatorias(
+            db, datos.limit, datos.categoria, datos.dificultad
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Separar las preguntas de la sesión: el commit las expiraría y se
+    # volverían a consultar al serializarlas
+    for pregunta in preguntas:
+        db.expunge(pregunta)
+    
     db_sesion = QuizSession(
-        usuario_nombre=sesion.usuario_nombre,
-        estado="en_progreso"
+        usuario_nombre=datos.usuario_nombre,
+        estado="en_progreso",
+        preguntas_asignadas=[pregunta.id for pregunta in preguntas]
     )
     db.add(db_sesion)
     db.commit()
     db.refresh(db_sesion)
-    return db_sesion
+    return {"sesion": db_sesion, "preguntas": preguntas}
+
+
+@router.post("/start", response_model=QuizSessionStartResponse, status_code=201)
+async def iniciar_sesion_con_preguntas(
+    datos: QuizSessionStart,
+    db=Depends(get_async_db)
+):
+    """
+    Iniciar una sesión de quiz y recibir sus preguntas en la misma petición.
+    
+    Equivale a `POST /quiz-sessions/` seguido de `GET /questions/random`, pero
+    con una sola petición y una sola transacción. La sesión recuerda qué
+    preguntas se le repartieron y solo admite respuestas a esas preguntas.
+    
+    Args:
+        datos: Usuario, número de preguntas y filtros opcionales
+        db: Sesión de base de datos
+        
+    Returns:
+        QuizSessionStartResponse: La sesión creada y sus preguntas
+        
+    Raises:
+        HTTPException: Si no hay suficientes preguntas disponibles
+    """
+    return await db.run_sync(_iniciar_sesion_con_preguntas, datos)
 
 
 @router.get("/", response_model=List[QuizSessionResponse])
 def listar_sesiones(
+    response: Response,
     skip: int = Query(0, ge=0, description="Número de registros a saltar"),
     limit: int = Query(10, ge=1, le=100, description="Límite de registros"),
     estado: str = Query(None, description="Filtrar por estado (en_progreso, completado, abandonado)"),
+    cursor: str = Query(None, description="Cursor de la cabecera X-Next-Cursor de la página anterior"),
     db: Session = Depends(get_db)
 ):
     """
     Listar sesiones de quiz con paginación.
     
+    Igual que el listado de preguntas, admite `skip`/`limit` o un cursor
+    tomado de la cabecera `X-Next-Cursor` de la página anterior.
+    
     Args:
+        response: Respuesta HTTP, para añadir la cabecera X-Next-Cursor
         skip: Número de registros a saltar
         limit: Límite de registros
         estado: Filtrar por estado (opcional)
+        cursor: Cursor de la página anterior (opcional, no combinable con skip)
         db: Sesión de base de datos
         
     Returns:
         List[QuizSessionResponse]: Lista de sesiones
+        
+    Raises:
+        HTTPException: Si el cursor no es válido o se combina con skip
     """
     query = db.query(QuizSession)
     
     if estado:
         query = query.filter(QuizSession.estado == estado)
     
-    sesiones = query.offset(skip).limit(limit).all()
+    if cursor is not None:
+        if skip:
+            raise HTTPException(status_code=400, detail="skip y cursor no se pueden combinar")
+        try:
+            query = query.filter(QuizSession.id > decodificar_cursor(cursor))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    # Pedir una fila de más para saber si existe una página siguiente
+    sesiones = query.order_by(QuizSession.id).offset(skip).limit(limit + 1).all()
+    if len(sesiones) > limit:
+        sesiones = sesiones[:limit]
+        response.headers["X-Next-Cursor"] = codificar_cursor(sesiones[-1].id)
     return sesiones
 
 
@@ -94,11 +172,24 @@ def obtener_sesion(
     return sesion
 
 
+def _completar_sesion(db: Session, session_id: int, complete_data: QuizSessionComplete):
+    """Completa la sesión traduciendo el ValueError del servicio a un 404."""
+    try:
+        sesion = QuizService.completar_sesion(
+            db,
+            session_id,
+            complete_data.tiempo_total_segundos
+        )
+        return sesion
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
 @router.put("/{session_id}/complete", response_model=QuizSessionResponse)
-def completar_sesion(
+async def completar_sesion(
     session_id: int,
     complete_data: QuizSessionComplete,
-    db: Session = Depends(get_db)
+    db=Depends(get_async_db)
 ):
     """
     Finalizar sesión y calcular puntuación final.
@@ -114,15 +205,7 @@ def completar_sesion(
     Raises:
         HTTPException: Si la sesión no existe
     """
-    try:
-        sesion = QuizService.completar_sesion(
-            db,
-            session_id,
-            complete_data.tiempo_total_segundos
-        )
-        return sesion
-    except ValueError as e:
-        raise HTTPException(status_code=404, detail=str(e))
+    return await db.run_sync(_completar_sesion, session_id, complete_data)
 
 
 @router.delete("/{session_id}", status_code=204)
@@ -145,5 +228,6 @@ def eliminar_sesion(
     if not sesion:
         raise HTTPException(status_code=404, detail="Sesión no encontrada")
     
+    QuizService.descontar_sesion(db, sesion)
     db.delete(sesion)
     db.commit()
@@ -1,19 +1,90 @@
 """
 Router para obtener estadísticas y reportes
 """
-from fastapi import APIRouter, Depends, HTTPException
+import hashlib
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, List, Optional
 
-from app.database import get_db
+from app.database import get_async_db, sesion_asincrona
 from app.models.quiz_session import QuizSession
+from app.services.cache_estadisticas import cache_estadisticas
+from app.services.coherencia import coherencia
+from app.services.etags import coincide, etiqueta, no_modificado
 from app.services.quiz_service import QuizService
 
 router = APIRouter(prefix="/statistics", tags=["statistics"])
 
 
+def _revalidar(db: Session, comprobar: Optional[Callable[[Session], None]] = None):
+    """
+    Invalida la caché si otro proceso escribió respuestas, sesiones o
+    preguntas, y comprueba que el recurso pedido existe.
+    """
+    try:
+        coherencia.revalidar(db, "estadisticas", "preguntas")
+        if comprobar is not None:
+            comprobar(db)
+    finally:
+        # Devolver la conexión al pool: la petición puede quedarse esperando a
+        # un cálculo que necesita la suya
+        db.rollback()
+
+
+def _recurso(ruta: str, parametros) -> str:
+    """Parte del ETag que distingue la ruta y los valores de sus parámetros."""
+    return f"{ruta}.{hashlib.sha1(repr(parametros).encode('utf-8')).hexdigest()[:10]}"
+
+
+async def _responder(
+    db,
+    request: Request,
+    response: Response,
+    ruta: str,
+    parametros,
+    calcular,
+    comprobar: Optional[Callable[[Session], None]] = None
+):
+    """
+    Sirve la respuesta de una ruta desde la caché con su ETag, o un 304 si
+    el cliente ya tiene la versión vigente.
+
+    El ETag se construye con la ruta, sus parámetros y las versiones de las
+    estadísticas y de las preguntas; si coincide con If-None-Match no se
+    calcula ni se serializa nada. `comprobar` se ejecuta antes de comparar el
+    ETag y lanza HTTPException si el recurso no existe, para no responder 304
+    por algo que daría 404.
+    """
+    await db.run_sync(_revalidar, comprobar)
+    recurso = _recurso(ruta, parametros)
+    version = (coherencia.version("estadisticas"), coherencia.version("preguntas"))
+    etag = etiqueta("estadisticas", recurso, *version)
+    if coincide(request, etag):
+        return no_modificado(etag)
+    valor, version = await cache_estadisticas.obtener(ruta, parametros, calcular, version)
+    # Una respuesta obsoleta lleva el ETag de los datos con que se calculó
+    etag = etiqueta("estadisticas", recurso, *version)
+    if coincide(request, etag):
+        return no_modificado(etag)
+    response.headers["ETag"] = etag
+    return valor
+
+
+def _calculo(funcion, *args, **kwargs):
+    """
+    Prepara el cálculo de una respuesta para la caché. Abre su propia sesión
+    porque un recálculo en segundo plano puede terminar después de la
+    petición que lo lanzó.
+    """
+    async def calcular():
+        async with sesion_asincrona() as db:
+            return await db.run_sync(funcion, *args, **kwargs)
+    return calcular
+
+
 @router.get("/global", response_model=Dict[str, Any])
-def estadisticas_globales(db: Session = Depends(get_db)):
+async def estadisticas_globales(request: Request, response: Response, db=Depends(get_async_db)):
     """
     Obtener estadísticas globales del sistema.
     
@@ -23,19 +94,76 @@ def estadisticas_globales(db: Session = Depends(get_db)):
     - Promedio de aciertos general
     - Categorías más difíciles
     
+    La respuesta se guarda en caché (ESTADISTICAS_TTL_GLOBAL segundos) y
+    lleva un ETag: con If-None-Match se responde 304 si no ha cambiado.
+    
     Args:
+        request: Petición HTTP (para If-None-Match)
+        response: Respuesta HTTP, para añadir la cabecera ETag
         db: Sesión de base de datos
         
     Returns:
         Dict con estadísticas globales
     """
-    return QuizService.obtener_estadisticas_globales(db)
+    return await _responder(
+        db, request, response, "global", (), _calculo(QuizService.obtener_estadisticas_globales)
+    )
+
+
+@router.post("/rebuild", response_model=Dict[str, Any])
+async def reconstruir_estadisticas(db=Depends(get_async_db)):
+    """
+    Reconstruir por completo los agregados de estadísticas.
+    
+    Los agregados se mantienen al día con cada respuesta y cada sesión
+    completada; esta operación solo hace falta tras cargas masivas hechas
+    fuera de la API o para reparar inconsistencias.
+    
+    Args:
+        db: Sesión de base de datos
+        
+    Returns:
+        Dict con las estadísticas globales ya reconstruidas
+    """
+    await db.run_sync(QuizService.reconstruir_estadisticas)
+    return await db.run_sync(QuizService.obtener_estadisticas_globales)
+
+
+def _comprobar_sesion(session_id: int):
+    """Comprobación de existencia de una sesión para `_responder`."""
+    def comprobar(db: Session):
+        if db.get(QuizSession, session_id) is None:
+            raise HTTPException(status_code=404, detail="Sesión no encontrada")
+    return comprobar
+
+
+def _estadisticas_sesion(db: Session, session_id: int):
+    """Arma el resumen de la sesión a partir de sus contadores."""
+    # Validar que la sesión existe (pudo borrarse después de comprobarlo)
+    sesion = db.query(QuizSession).filter(QuizSession.id == session_id).first()
+    if not sesion:
+        raise HTTPException(status_code=404, detail="Sesión no encontrada")
+    
+    # Los contadores de la sesión se mantienen al día con cada respuesta
+    estadisticas = QuizService.resumen_sesion(sesion)
+    
+    # Agregar información de la sesión
+    estadisticas["id_sesion"] = sesion.id
+    estadisticas["usuario_nombre"] = sesion.usuario_nombre
+    estadisticas["fecha_inicio"] = sesion.fecha_inicio
+    estadisticas["fecha_fin"] = sesion.fecha_fin
+    estadisticas["estado"] = sesion.estado
+    estadisticas["tiempo_total_segundos"] = sesion.tiempo_total_segundos
+    
+    return estadisticas
 
 
 @router.get("/session/{session_id}", response_model=Dict[str, Any])
-def estadisticas_sesion(
+async def estadisticas_sesion(
     session_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db=Depends(get_async_db)
 ):
     """
     Obtener estadísticas detalladas de una sesión específica.
@@ -48,6 +176,8 @@ def estadisticas_sesion(
     
     Args:
         session_id: ID de la sesión
+        request: Petición HTTP (para If-None-Match)
+        response: Respuesta HTTP, para añadir la cabecera ETag
         db: Sesión de base de datos
         
     Returns:
@@ -56,31 +186,26 @@ def estadisticas_sesion(
     Raises:
         HTTPException: Si la sesión no existe
     """
-    # Validar que la sesión existe
-    sesion = db.query(QuizSession).filter(QuizSession.id == session_id).first()
-    if not sesion:
-        raise HTTPException(status_code=404, detail="Sesión no encontrada")
-    
-    try:
-        estadisticas = QuizService.calcular_puntuacion_sesion(db, session_id)
-        
-        # Agregar información de la sesión
-        estadisticas["id_sesion"] = sesion.id
-        estadisticas["usuario_nombre"] = sesion.usuario_nombre
-        estadisticas["fecha_inicio"] = sesion.fecha_inicio
-        estadisticas["fecha_fin"] = sesion.fecha_fin
-        estadisticas["estado"] = sesion.estado
-        estadisticas["tiempo_total_segundos"] = sesion.tiempo_total_segundos
-        
-        return estadisticas
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    return await _responder(
+        db,
+        request,
+        response,
+        "sesion",
+        session_id,
+        _calculo(_estadisticas_sesion, session_id),
+        comprobar=_comprobar_sesion(session_id)
+    )
 
 
 @router.get("/questions/difficult", response_model=List[Dict[str, Any]])
-def preguntas_dificiles(
-    limit: int = 10,
-    db: Session = Depends(get_db)
+async def preguntas_dificiles(
+    request: Request,
+    response: Response,
+    limit: int = Query(10, ge=1, description="Número máximo de preguntas a retornar"),
+    min_respondidas: int = Query(1, ge=1, description="Mínimo de respuestas para considerar una pregunta"),
+    categoria: str = Query(None, description="Filtrar por categoría"),
+    dificultad: str = Query(None, description="Filtrar por dificultad"),
+    db=Depends(get_async_db)
 ):
     """
     Obtener preguntas con mayor tasa de error.
@@ -90,29 +215,69 @@ def preguntas_dificiles(
     - Incluye cuántas veces fue respondida y cuántas incorrectamente
     
     Args:
+        request: Petición HTTP (para If-None-Match)
+        response: Respuesta HTTP, para añadir la cabecera ETag
         limit: Número máximo de preguntas a retornar
+        min_respondidas: Excluir preguntas con menos respuestas (ruido de muestras pequeñas)
+        categoria: Filtrar por categoría (opcional)
+        dificultad: Filtrar por dificultad (opcional)
         db: Sesión de base de datos
         
     Returns:
         List[Dict]: Preguntas con mayor tasa de error
     """
-    return QuizService.obtener_preguntas_difíciles(db, limit)
+    return await _responder(
+        db,
+        request,
+        response,
+        "dificiles",
+        (limit, min_respondidas, categoria, dificultad),
+        _calculo(
+            QuizService.obtener_preguntas_difíciles,
+            limit,
+            min_respondidas=min_respondidas,
+            categoria=categoria,
+            dificultad=dificultad
+        )
+    )
 
 
 @router.get("/categories", response_model=List[Dict[str, Any]])
-def rendimiento_por_categoria(db: Session = Depends(get_db)):
+async def rendimiento_por_categoria(
+    request: Request,
+    response: Response,
+    por_dificultad: bool = Query(False, description="Desglosar cada categoría por dificultad"),
+    db=Depends(get_async_db)
+):
     """
     Obtener rendimiento promedio por categoría.
     
     Retorna:
-    - Rendimiento promedio por cada categoría
-    - Número de preguntas por categoría
+    - Rendimiento promedio por cada categoría (o por categoría y dificultad)
+    - Número de preguntas activas por categoría
     - Aciertos y errores por categoría
     
     Args:
+        request: Petición HTTP (para If-None-Match)
+        response: Respuesta HTTP, para añadir la cabecera ETag
+        por_dificultad: Desglosar cada categoría por dificultad
         db: Sesión de base de datos
         
     Returns:
         List[Dict]: Rendimiento por categoría
     """
-    return QuizService.obtener_rendimiento_por_categoria(db)
+    return await _responder(
+        db, request, response, "categorias", por_dificultad, _calculo(QuizService.obtener_rendimiento_por_categoria, por_dificultad)
+    )
+
+
+@router.get("/cache/stats", response_model=Dict[str, Any])
+def estadisticas_cache():
+    """
+    Obtener los contadores de la caché de estadísticas.
+    
+    Returns:
+        Dict con los TTL por ruta, tamaño, aciertos, respuestas obsoletas
+        servidas, fallos, recálculos, invalidaciones y tasa de aciertos
+    """
+    return cache_estadisticas.estadisticas()
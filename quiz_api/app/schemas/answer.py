@@ -1,10 +1,12 @@
 """
 Schemas Pydantic para respuestas
 """
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Optional
 from datetime import datetime
 
+from app.schemas.quiz_session import QuizSessionResponse
+
 
 class AnswerBase(BaseModel):
     """Schema base para respuestas"""
@@ -41,3 +43,42 @@ class AnswerDetailResponse(AnswerResponse):
     opciones: Optional[list] = None
     respuesta_correcta_indice: Optional[int] = None
     respuesta_seleccionada_texto: Optional[str] = None
+
+
+class AnswerBatchItem(BaseModel):
+    """Schema de cada respuesta dentro de un envío por lotes"""
+    question_id: int = Field(..., gt=0, description="ID de la pregunta")
+    respuesta_seleccionada: int = Field(..., ge=0, description="Índice de la respuesta seleccionada")
+    tiempo_respuesta_segundos: Optional[int] = Field(None, ge=0, description="Tiempo de respuesta en segundos")
+
+
+class AnswerBatchCreate(BaseModel):
+    """Schema para registrar todas las respuestas de una sesión de una vez"""
+    quiz_session_id: int = Field(..., gt=0, description="ID de la sesión de quiz")
+    respuestas: List[AnswerBatchItem] = Field(
+        ..., description="Respuestas a registrar (puede estar vacía si se completa la sesión)"
+    )
+    completar: bool = Field(False, description="Completar la sesión en la misma transacción")
+    tiempo_total_segundos: Optional[int] = Field(None, ge=0, description="Tiempo total si se completa la sesión")
+
+    @model_validator(mode="after")
+    def validar_lote_no_vacio(self):
+        """Un lote sin respuestas solo tiene sentido para completar la sesión"""
+        if not self.respuestas and not self.completar:
+            raise ValueError("respuestas no puede estar vacía si no se completa la sesión")
+        return self
+
+
+class AnswerBatchError(BaseModel):
+    """Error de una respuesta concreta dentro del lote"""
+    indice: int
+    question_id: int
+    detalle: str
+
+
+class AnswerBatchResponse(BaseModel):
+    """Resultado de un envío por lotes"""
+    quiz_session_id: int
+    registradas: List[AnswerResponse]
+    errores: List[AnswerBatchError]
+    sesion: Optional[QuizSessionResponse] = None
@@ -67,6 +67,7 @@ class QuestionResponse(QuestionBase):
     id: int
     created_at: datetime
     is_active: bool
+    duplicado_de: Optional[int] = Field(None, description="Pregunta original si se marcó como duplicada")
 
     class Config:
         from_attributes = True
@@ -75,3 +76,43 @@ class QuestionResponse(QuestionBase):
 class QuestionBulkCreate(BaseModel):
     """Schema para crear múltiples preguntas"""
     preguntas: List[QuestionCreate] = Field(..., min_items=1, description="Lista de preguntas a crear")
+
+
+class QuestionImportError(BaseModel):
+    """Schema para un elemento rechazado en una importación"""
+    indice: int = Field(..., description="Posición del elemento en el archivo (0-based)")
+    detalle: str
+
+
+class QuestionDuplicate(BaseModel):
+    """Schema para un elemento que duplica una pregunta existente"""
+    indice: int = Field(..., description="Posición del elemento en el archivo o en la lista (0-based)")
+    duplicado_de: int = Field(..., description="ID de la pregunta original")
+    similitud: float = Field(..., description="Similitud de Jaccard con la original (0-1)")
+
+
+class QuestionImportBatch(BaseModel):
+    """Schema para el resumen de un lote importado"""
+    lote: int
+    insertadas: int
+    errores: int
+    duplicados: int = 0
+    primer_id: Optional[int] = None
+    ultimo_id: Optional[int] = None
+
+
+class QuestionImportResponse(BaseModel):
+    """Schema para el resultado de una importación de preguntas"""
+    insertadas: int
+    total_errores: int
+    errores: List[QuestionImportError] = Field(..., description="Detalle de los primeros errores")
+    total_duplicados: int = 0
+    duplicados: List[QuestionDuplicate] = Field([], description="Detalle de los primeros duplicados")
+    lotes: List[QuestionImportBatch]
+
+
+class QuestionDuplicateCluster(BaseModel):
+    """Schema para un grupo de preguntas duplicadas entre sí"""
+    total: int = Field(..., description="Número de preguntas del grupo")
+    similitud_minima: float = Field(..., description="Menor similitud entre los pares confirmados del grupo")
+    preguntas: List[QuestionResponse]
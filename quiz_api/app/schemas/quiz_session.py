@@ -5,6 +5,8 @@ from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
 
+from app.schemas.question import QuestionResponse
+
 
 class QuizSessionBase(BaseModel):
     """Schema base para sesiones de quiz"""
@@ -16,6 +18,13 @@ class QuizSessionCreate(QuizSessionBase):
     pass
 
 
+class QuizSessionStart(QuizSessionBase):
+    """Schema para iniciar una sesión recibiendo ya sus preguntas"""
+    limit: int = Field(10, ge=1, le=50, description="Número de preguntas aleatorias")
+    categoria: Optional[str] = Field(None, description="Filtrar por categoría")
+    dificultad: Optional[str] = Field(None, description="Filtrar por dificultad")
+
+
 class QuizSessionUpdate(BaseModel):
     """Schema para actualizar sesiones de quiz"""
     usuario_nombre: Optional[str] = Field(None, max_length=100)
@@ -42,3 +51,9 @@ class QuizSessionResponse(QuizSessionBase):
 class QuizSessionComplete(BaseModel):
     """Schema para completar una sesión de quiz"""
     tiempo_total_segundos: Optional[int] = Field(None, ge=0, description="Tiempo total en segundos")
+
+
+class QuizSessionStartResponse(BaseModel):
+    """Schema de la sesión recién iniciada junto con sus preguntas"""
+    sesion: QuizSessionResponse
+    preguntas: List[QuestionResponse]
@@ -0,0 +1,112 @@
+"""
+Búsqueda de texto completo sobre las preguntas
+"""
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, column, literal_column, or_, select, table, text
+from sqlalchemy.orm import Session
+
+from app.models.question import Question
+
+_PALABRA = re.compile(r"\w+")
+
+# Tabla FTS5 creada por database.crear_busqueda_texto. `rank` es la columna
+# oculta con la puntuación bm25 configurada (menor es más relevante).
+_questions_fts = table("questions_fts", column("rowid"), column("rank"))
+_fts_disponible: Optional[bool] = None
+
+
+def consulta_fts(texto: str) -> Optional[str]:
+    """
+    Convierte el texto escrito por el usuario en una consulta FTS5.
+
+    Cada palabra se busca como prefijo y todas deben aparecer. Como solo se
+    conservan caracteres de palabra, la sintaxis de FTS5 (comillas,
+    operadores, columnas) no llega nunca a la consulta.
+
+    Args:
+        texto: Texto de búsqueda
+
+    Returns:
+        Consulta FTS5, o None si el texto no contiene ninguna palabra
+    """
+    palabras = _PALABRA.findall(texto)
+    if not palabras:
+        return None
+    return " ".join(f'"{palabra}"*' for palabra in palabras)
+
+
+def _fts_activo(db: Session) -> bool:
+    """Comprueba una sola vez si existe la tabla FTS5."""
+    global _fts_disponible
+    if _fts_disponible is None:
+        _fts_disponible = db.get_bind().dialect.name == "sqlite" and db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'questions_fts'")
+        ).first() is not None
+    return _fts_disponible
+
+
+def buscar_preguntas(
+    db: Session,
+    texto: str,
+    limit: int,
+    categoria: Optional[str] = None,
+    dificultad: Optional[str] = None,
+    cursor: Optional[Tuple[float, int]] = None
+) -> Tuple[List[Question], Optional[Tuple[float, int]]]:
+    """
+    Busca preguntas activas por su texto, explicación u opciones.
+
+    Con FTS5 los resultados se ordenan por relevancia (bm25) y después por ID.
+    Sin FTS5 (otra base de datos o SQLite compilado sin él) se recurre a una
+    búsqueda por subcadena en la pregunta y la explicación, ordenada por ID.
+
+    Args:
+        db: Sesión de base de datos
+        texto: Texto de búsqueda
+        limit: Número máximo de resultados
+        categoria: Filtrar por categoría (opcional)
+        dificultad: Filtrar por dificultad (opcional)
+        cursor: (puntuación, ID) de la última pregunta de la página anterior
+
+    Returns:
+        Tupla (preguntas, cursor de la página siguiente o None si no hay más)
+    """
+    if _fts_activo(db):
+        consulta = consulta_fts(texto)
+        if consulta is None:
+            return [], None
+        puntuacion = _questions_fts.c.rank
+        query = select(Question, puntuacion).join(
+            _questions_fts, _questions_fts.c.rowid == Question.id
+        ).where(literal_column("questions_fts").op("MATCH")(consulta))
+        if cursor is not None:
+            query = query.where(or_(
+                puntuacion > cursor[0],
+                and_(puntuacion == cursor[0], Question.id > cursor[1])
+            ))
+        query = query.order_by(puntuacion, Question.id)
+    else:
+        query = select(Question).where(or_(
+            Question.pregunta.contains(texto, autoescape=True),
+            Question.explicacion.contains(texto, autoescape=True)
+        ))
+        if cursor is not None:
+            query = query.where(Question.id > cursor[1])
+        query = query.order_by(Question.id)
+
+    query = query.where(Question.is_active == True)
+    if categoria:
+        query = query.filter(Question.categoria == categoria)
+    if dificultad:
+        query = query.filter(Question.dificultad == dificultad.lower())
+
+    # Una fila de más indica si existe una página siguiente
+    filas = db.execute(query.limit(limit + 1)).all()
+    siguiente = None
+    if len(filas) > limit:
+        filas = filas[:limit]
+        ultima = filas[-1]
+        siguiente = (ultima[1] if len(ultima) > 1 else 0.0, ultima[0].id)
+    return [fila[0] for fila in filas], siguiente
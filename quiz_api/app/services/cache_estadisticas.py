@@ -0,0 +1,194 @@
+"""
+Caché de respuestas de las estadísticas con TTL y revalidación en segundo plano
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from app.services.coherencia import coherencia
+
+# Segundos que una respuesta se considera fresca, por ruta (0 desactiva la caché)
+TTL_ESTADISTICAS = {
+    "global": float(os.getenv("ESTADISTICAS_TTL_GLOBAL", "5")),
+    "sesion": float(os.getenv("ESTADISTICAS_TTL_SESION", "30")),
+    "dificiles": float(os.getenv("ESTADISTICAS_TTL_DIFICILES", "30")),
+    "categorias": float(os.getenv("ESTADISTICAS_TTL_CATEGORIAS", "30")),
+}
+# Segundos durante los que, pasado el TTL, se sigue sirviendo la respuesta
+# anterior mientras se recalcula en segundo plano
+MARGEN_OBSOLETO = float(os.getenv("ESTADISTICAS_MARGEN_OBSOLETO", "30"))
+# Respuestas guardadas como máximo (las rutas con parámetros crean una por combinación)
+MAX_ENTRADAS = int(os.getenv("ESTADISTICAS_CACHE_MAX", "1000"))
+
+Clave = Tuple[str, Hashable]
+
+
+class _Entrada:
+    __slots__ = ("valor", "expira", "version")
+
+    def __init__(self, valor: Any, expira: float, version: Hashable):
+        self.valor = valor
+        self.expira = expira
+        self.version = version
+
+
+class CacheEstadisticas:
+    """
+    Caché en memoria de las respuestas de los endpoints de estadísticas.
+
+    - Cada ruta tiene su TTL. Dentro del TTL la respuesta se sirve sin tocar
+      la base de datos.
+    - Pasado el TTL, y durante MARGEN_OBSOLETO segundos más, se sirve la
+      respuesta anterior y se lanza un único recálculo en segundo plano.
+    - Si no hay respuesta utilizable, las peticiones concurrentes esperan a un
+      único cálculo (single-flight) en lugar de lanzar uno cada una.
+    - Las escrituras de respuestas, sesiones y preguntas, de este proceso o de
+      otros (a través de `coherencia`), descartan las respuestas guardadas:
+      solo se sirve una respuesta obsoleta cuando caduca por TTL, nunca
+      después de una escritura, porque quien acaba de responder o de terminar
+      un quiz espera verlo en las estadísticas.
+
+    Los cálculos reciben una función que abre su propia sesión de base de
+    datos, porque un recálculo en segundo plano sobrevive a la petición que lo
+    lanzó. Cada respuesta guarda la versión de los datos leída antes de
+    calcularla, para que el ETag nunca anuncie datos más nuevos que los
+    servidos. Los datos se protegen con un cerrojo de hilos porque las
+    invalidaciones llegan desde el threadpool; las tareas en curso solo se
+    tocan desde el event loop.
+    """
+
+    def __init__(self, ttl: Dict[str, float], margen_obsoleto: float, capacidad: int):
+        self.ttl = ttl
+        self.margen_obsoleto = margen_obsoleto
+        self.capacidad = capacidad
+        self._lock = threading.Lock()
+        self._entradas: Dict[Clave, _Entrada] = {}
+        self._en_curso: Dict[Clave, asyncio.Task] = {}
+        self._generacion = 0
+        self.aciertos = 0
+        self.obsoletos = 0
+        self.fallos = 0
+        self.recalculos = 0
+        self.invalidaciones = 0
+
+    async def obtener(
+        self,
+        ruta: str,
+        parametros: Hashable,
+        calcular: Callable[[], Awaitable[Any]],
+        version: Hashable = None
+    ) -> Tuple[Any, Hashable]:
+        """
+        Devuelve la respuesta de `ruta` con `parametros`, desde la caché o calculándola.
+
+        Args:
+            ruta: Nombre de la ruta en TTL_ESTADISTICAS
+            parametros: Parámetros de la petición (forman parte de la clave)
+            calcular: Función asíncrona sin argumentos que calcula la respuesta
+            version: Versión actual de los datos, leída antes de calcular
+
+        Returns:
+            Tupla (respuesta, versión de los datos con que se calculó)
+        """
+        ttl = self.ttl.get(ruta, 0)
+        if ttl <= 0:
+            return await calcular(), version
+
+        clave = (ruta, parametros)
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and ahora < entrada.expira:
+                self.aciertos += 1
+                return entrada.valor, entrada.version
+            obsoleta = entrada is not None and ahora < entrada.expira + self.margen_obsoleto
+            if obsoleta:
+                self.obsoletos += 1
+            else:
+                self.fallos += 1
+
+        tarea = self._en_curso.get(clave)
+        if tarea is None:
+            tarea = asyncio.ensure_future(self._calcular(clave, ttl, calcular, version))
+            self._en_curso[clave] = tarea
+            tarea.add_done_callback(self._terminada(clave))
+        if obsoleta:
+            return entrada.valor, entrada.version
+        # shield: si se cancela esta petición, el cálculo sigue para las demás
+        return await asyncio.shield(tarea)
+
+    async def _calcular(
+        self,
+        clave: Clave,
+        ttl: float,
+        calcular: Callable[[], Awaitable[Any]],
+        version: Hashable
+    ) -> Tuple[Any, Hashable]:
+        with self._lock:
+            generacion = self._generacion
+        valor = await calcular()
+        with self._lock:
+            self.recalculos += 1
+            # Si hubo una escritura durante el cálculo el resultado puede no
+            # reflejarla: no se guarda, y la próxima petición lanza otro cálculo
+            self._entradas.pop(clave, None)
+            if self._generacion == generacion:
+                self._entradas[clave] = _Entrada(valor, time.monotonic() + ttl, version)
+                while len(self._entradas) > self.capacidad:
+                    del self._entradas[next(iter(self._entradas))]
+        return valor, version
+
+    def _terminada(self, clave: Clave) -> Callable[[asyncio.Task], None]:
+        def terminada(tarea: asyncio.Task):
+            if self._en_curso.get(clave) is tarea:
+                del self._en_curso[clave]
+            # Un recálculo en segundo plano que falla conserva la respuesta anterior
+            if not tarea.cancelled():
+                tarea.exception()
+        return terminada
+
+    def invalidar(self):
+        """
+        Descarta todas las respuestas guardadas.
+
+        Las peticiones siguientes esperan a un cálculo nuevo en lugar de
+        recibir la respuesta anterior a la escritura.
+        """
+        with self._lock:
+            self._generacion += 1
+            self.invalidaciones += 1
+            self._entradas.clear()
+
+    def estadisticas(self) -> dict:
+        """
+        Contadores de uso de la caché.
+
+        Returns:
+            Dict con la configuración, el tamaño, aciertos, respuestas obsoletas
+            servidas, fallos, recálculos, invalidaciones y tasa de aciertos
+        """
+        with self._lock:
+            consultas = self.aciertos + self.obsoletos + self.fallos
+            return {
+                "ttl": dict(self.ttl),
+                "margen_obsoleto": self.margen_obsoleto,
+                "capacidad": self.capacidad,
+                "tamano": len(self._entradas),
+                "aciertos": self.aciertos,
+                "obsoletos": self.obsoletos,
+                "fallos": self.fallos,
+                "recalculos": self.recalculos,
+                "invalidaciones": self.invalidaciones,
+                "tasa_aciertos": round(
+                    (self.aciertos + self.obsoletos) / consultas * 100, 2
+                ) if consultas else 0.0
+            }
+
+
+# Instancia compartida por toda la aplicación
+cache_estadisticas = CacheEstadisticas(TTL_ESTADISTICAS, MARGEN_OBSOLETO, MAX_ENTRADAS)
+for _nombre in ("estadisticas", "preguntas"):
+    coherencia.suscribir(_nombre, cache_estadisticas.invalidar)
+    coherencia.al_confirmar(_nombre, cache_estadisticas.invalidar)
@@ -0,0 +1,186 @@
+"""
+Coherencia de las cachés en memoria entre varios procesos worker
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, List
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models.cache_version import CacheVersion
+
+
+class CoherenciaCaches:
+    """
+    Canal de invalidación basado en la tabla `cache_versiones`.
+
+    Las escrituras llaman a `incrementar` dentro de su transacción, de modo que
+    la versión y los datos se confirman juntos. Antes de usar una caché se
+    llama a `revalidar`, que lee la versión con una consulta por clave primaria
+    y, si otro proceso la cambió, ejecuta las funciones suscritas para vaciar
+    las cachés locales.
+
+    Las escrituras hechas por este mismo proceso ya actualizan sus cachés, así
+    que al confirmarse se da su versión por vista salvo que otro proceso haya
+    escrito entre medias. Las cachés que no se actualizan escritura a
+    escritura (como las de resultados calculados) se suscriben con
+    `al_confirmar` para enterarse de las escrituras locales.
+    """
+
+    def __init__(self, intervalo_ms: int = 500):
+        self.intervalo = intervalo_ms / 1000
+        self._lock = threading.Lock()
+        self._vistas: Dict[str, int] = {}
+        self._revisadas: Dict[str, float] = {}
+        self._suscriptores: Dict[str, List[Callable[[], None]]] = {}
+        self._locales: Dict[str, List[Callable[[], None]]] = {}
+        self.invalidaciones = 0
+        self.revalidaciones = 0
+
+    def suscribir(self, nombre: str, funcion: Callable[[], None]):
+        """
+        Registra una función que vacía una caché cuando cambian los datos `nombre`.
+
+        Args:
+            nombre: Conjunto de datos
+            funcion: Función sin argumentos que invalida la caché
+        """
+        self._suscriptores.setdefault(nombre, []).append(funcion)
+
+    def al_confirmar(self, nombre: str, funcion: Callable[[], None]):
+        """
+        Registra una función que se llama cuando este proceso confirma una
+        escritura sobre los datos `nombre`.
+
+        Args:
+            nombre: Conjunto de datos
+            funcion: Función sin argumentos que invalida la caché
+        """
+        self._locales.setdefault(nombre, []).append(funcion)
+
+    def incrementar(self, db: Session, nombre: str):
+        """
+        Incrementa la versión de `nombre` sin confirmar la transacción.
+
+        Basta con un incremento por transacción: las llamadas siguientes para
+        el mismo nombre no hacen nada.
+
+        Args:
+            db: Sesión de base de datos con la escritura en curso
+            nombre: Conjunto de datos modificado
+        """
+        if nombre in db.info.get("versiones_cache", ()):
+            return
+        version = db.execute(
+            update(CacheVersion)
+            .where(CacheVersion.nombre == nombre)
+            .values(version=CacheVersion.version + 1)
+            .returning(CacheVersion.version)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if version is None:
+            version = 1
+            db.execute(insert(CacheVersion).values(nombre=nombre, version=version))
+        db.info.setdefault("versiones_cache", {})[nombre] = version
+
+    def _confirmar(self, versiones: Dict[str, int]):
+        """Da por vistas las versiones escritas por este proceso si no hubo otras entre medias."""
+        with self._lock:
+            for nombre, version in versiones.items():
+                if self._vistas.get(nombre) == version - 1:
+                    self._vistas[nombre] = version
+        for nombre in versiones:
+            for funcion in self._locales.get(nombre, []):
+                funcion()
+
+    def revalidar(self, db: Session, *nombres: str):
+        """
+        Invalida las cachés de cada nombre si otro proceso cambió sus datos.
+
+        Las versiones de todos los nombres se leen con una sola consulta. Con
+        CACHE_REVALIDACION_MS > 0 (por defecto, 500) cada versión se consulta
+        como mucho una vez por intervalo, a cambio de servir datos de hasta
+        ese tiempo de antigüedad; con 0 se consulta en cada llamada.
+
+        Args:
+            db: Sesión de base de datos
+            nombres: Conjuntos de datos a revalidar
+        """
+        ahora = time.monotonic()
+        if self.intervalo:
+            nombres = [
+                nombre for nombre in nombres
+                if ahora - self._revisadas.get(nombre, float("-inf")) >= self.intervalo
+            ]
+            if not nombres:
+                return
+
+        if len(nombres) == 1:
+            versiones = {nombres[0]: db.execute(
+                select(CacheVersion.version).where(CacheVersion.nombre == nombres[0])
+            ).scalar()}
+        else:
+            versiones = dict(db.execute(
+                select(CacheVersion.nombre, CacheVersion.version).where(CacheVersion.nombre.in_(nombres))
+            ).all())
+
+        cambiados = []
+        with self._lock:
+            self.revalidaciones += 1
+            for nombre in nombres:
+                version = versiones.get(nombre) or 0
+                self._revisadas[nombre] = ahora
+                if self._vistas.get(nombre) == version:
+                    continue
+                self._vistas[nombre] = version
+                self.invalidaciones += 1
+                cambiados.append(nombre)
+        for nombre in cambiados:
+            for funcion in self._suscriptores.get(nombre, []):
+                funcion()
+
+    def version(self, nombre: str) -> int:
+        """
+        Última versión de `nombre` conocida por este proceso, tras `revalidar`
+        o tras sus propias escrituras. Sirve para construir ETags.
+
+        Args:
+            nombre: Conjunto de datos
+        """
+        with self._lock:
+            return self._vistas.get(nombre, 0)
+
+    def estado(self) -> dict:
+        """
+        Versiones vistas por este proceso, consultas de versión hechas e
+        invalidaciones.
+
+        Returns:
+            Dict con el intervalo de revalidación, las versiones, las consultas
+            de revalidación y las invalidaciones
+        """
+        with self._lock:
+            return {
+                "intervalo_ms": int(self.intervalo * 1000),
+                "versiones": dict(self._vistas),
+                "revalidaciones": self.revalidaciones,
+                "invalidaciones": self.invalidaciones
+            }
+
+
+# Instancia compartida por toda la aplicación
+coherencia = CoherenciaCaches(int(os.getenv("CACHE_REVALIDACION_MS", "500")))
+
+
+@event.listens_for(Session, "after_commit")
+def _versiones_confirmadas(db: Session):
+    versiones = db.info.pop("versiones_cache", None)
+    if versiones:
+        coherencia._confirmar(versiones)
+
+
+@event.listens_for(Session, "after_rollback")
+def _versiones_descartadas(db: Session):
+    db.info.pop("versiones_cache", None)
@@ -0,0 +1,180 @@
+"""
+Compresión negociada (brotli o gzip) de las respuestas
+"""
+import os
+import zlib
+from typing import Dict, Optional, Sequence
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# "0" desactiva la compresión de las respuestas de la API
+ACTIVA = os.getenv("COMPRESION", "1") == "1"
+# Cuerpos más pequeños se envían sin comprimir: no compensa el coste
+MIN_BYTES = int(os.getenv("COMPRESION_MIN_BYTES", "1024"))
+NIVEL_GZIP = int(os.getenv("COMPRESION_NIVEL_GZIP", "6"))
+CALIDAD_BROTLI = int(os.getenv("COMPRESION_CALIDAD_BROTLI", "4"))
+
+# Codificaciones disponibles, de la preferida a la menos preferida
+CODIFICACIONES = ("br", "gzip") if brotli is not None else ("gzip",)
+
+_TIPOS_COMPRIMIBLES = (
+    "text/", "application/json", "application/javascript", "application/xml", "image/svg+xml"
+)
+
+
+def negociar(accept_encoding: str, disponibles: Sequence[str] = CODIFICACIONES) -> Optional[str]:
+    """
+    Elige la codificación según la cabecera Accept-Encoding.
+
+    Se respetan los pesos `q` y el comodín `*`; a igual peso gana el orden de
+    `disponibles`.
+
+    Args:
+        accept_encoding: Valor de la cabecera (puede estar vacío)
+        disponibles: Codificaciones que se pueden producir
+
+    Returns:
+        La codificación elegida, o None si hay que enviar el cuerpo tal cual
+    """
+    pesos: Dict[str, float] = {}
+    for parte in accept_encoding.split(","):
+        nombre, _, parametros = parte.partition(";")
+        nombre = nombre.strip().lower()
+        if not nombre:
+            continue
+        peso = 1.0
+        parametro = parametros.strip().lower()
+        if parametro.startswith("q="):
+            try:
+                peso = float(parametro[2:])
+            except ValueError:
+                peso = 0.0
+        pesos[nombre] = peso
+
+    comodin = pesos.get("*", 0.0)
+    elegida, mejor = None, 0.0
+    for codificacion in disponibles:
+        peso = pesos.get(codificacion, comodin)
+        if peso > mejor:
+            elegida, mejor = codificacion, peso
+    return elegida
+
+
+def comprimible(media_type: str) -> bool:
+    """Si merece la pena comprimir un cuerpo de este tipo (texto, JSON, JS, SVG...)."""
+    media_type = media_type.lower()
+    return media_type.startswith(_TIPOS_COMPRIMIBLES) or "+json" in media_type
+
+
+def comprimir(datos: bytes, codificacion: str, nivel: Optional[int] = None) -> bytes:
+    """
+    Comprime un cuerpo completo.
+
+    Args:
+        datos: Cuerpo sin comprimir
+        codificacion: "br" o "gzip"
+        nivel: Calidad de brotli o nivel de gzip (por defecto los configurados)
+    """
+    compresor = _Compresor(codificacion, nivel)
+    return compresor.comprimir(datos) + compresor.terminar()
+
+
+class _Compresor:
+    """Compresor incremental con la misma interfaz para gzip y brotli."""
+
+    def __init__(self, codificacion: str, nivel: Optional[int] = None):
+        if codificacion == "br":
+            self._compresor = brotli.Compressor(quality=CALIDAD_BROTLI if nivel is None else nivel)
+            self.comprimir = self._compresor.process
+            self.terminar = self._compresor.finish
+        else:
+            # wbits=31: formato gzip (cabecera y CRC) en lugar de zlib
+            self._compresor = zlib.compressobj(NIVEL_GZIP if nivel is None else nivel, zlib.DEFLATED, 31)
+            self.comprimir = self._compresor.compress
+            self.terminar = self._compresor.flush
+
+
+class CompresionMiddleware:
+    """
+    Middleware ASGI que comprime las respuestas con brotli (si el paquete
+    `brotli` está instalado) o gzip, según lo que acepte el cliente.
+
+    Solo se comprimen los tipos de texto a partir de MIN_BYTES y las
+    respuestas que no traen ya su propia Content-Encoding (los estáticos
+    precomprimidos). Las respuestas por partes se comprimen según llegan.
+    Un ETag fuerte pasa a débil, porque identifica el cuerpo sin comprimir.
+    """
+
+    def __init__(self, app, minimo: int = MIN_BYTES):
+        self.app = app
+        self.minimo = minimo
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codificacion = negociar(Headers(scope=scope).get("accept-encoding", ""))
+        if codificacion is None:
+            await self.app(scope, receive, send)
+            return
+
+        inicio = None
+        compresor = None
+
+        async def enviar(mensaje):
+            nonlocal inicio, compresor
+            if mensaje["type"] == "http.response.start":
+                # Se espera al primer trozo del cuerpo para saber su tamaño
+                inicio = mensaje
+                return
+            if mensaje["type"] != "http.response.body":
+                await send(mensaje)
+                return
+            if inicio is None:
+                # Resto del cuerpo: comprimirlo si se decidió hacerlo con el primer trozo
+                if compresor is not None:
+                    mas = mensaje.get("more_body", False)
+                    datos = compresor.comprimir(mensaje.get("body", b""))
+                    if not mas:
+                        datos += compresor.terminar()
+                    mensaje = {"type": "http.response.body", "body": datos, "more_body": mas}
+                await send(mensaje)
+                return
+
+            cuerpo = mensaje.get("body", b"")
+            mas = mensaje.get("more_body", False)
+            cabeceras = MutableHeaders(raw=list(inicio["headers"]))
+            tipo = cabeceras.get("content-type", "")
+            if not comprimible(tipo) or "content-encoding" in cabeceras or inicio["status"] in (204, 304):
+                await send(inicio)
+                inicio = None
+                await send(mensaje)
+                return
+            cabeceras.add_vary_header("Accept-Encoding")
+            if not mas and len(cuerpo) < self.minimo:
+                await send({**inicio, "headers": cabeceras.raw})
+                inicio = None
+                await send(mensaje)
+                return
+
+            compresor = _Compresor(codificacion)
+            datos = compresor.comprimir(cuerpo)
+            if mas:
+                del cabeceras["content-length"]
+            else:
+                datos += compresor.terminar()
+                cabeceras["content-length"] = str(len(datos))
+            cabeceras["content-encoding"] = codificacion
+            etag = cabeceras.get("etag")
+            if etag and not etag.startswith("W/"):
+                cabeceras["etag"] = "W/" + etag
+            await send({**inicio, "headers": cabeceras.raw})
+            inicio = None
+            await send({"type": "http.response.body", "body": datos, "more_body": mas})
+
+        await self.app(scope, receive, enviar)
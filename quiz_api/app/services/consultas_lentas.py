@@ -0,0 +1,267 @@
+"""
+Registro de consultas lentas con su plan de ejecución
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Umbral en milisegundos; sin definir el registro está desactivado
+_UMBRAL = os.getenv("CONSULTAS_LENTAS_MS", "").strip()
+UMBRAL_MS: Optional[float] = float(_UMBRAL) if _UMBRAL else None
+# Registrar también, una vez por sentencia, las que recorren una tabla entera
+REGISTRAR_ESCANEOS = os.getenv("CONSULTAS_LENTAS_ESCANEOS", "1") == "1"
+# Entradas conservadas en memoria para GET /admin/slow-queries
+MAX_ENTRADAS = int(os.getenv("CONSULTAS_LENTAS_MAX", "200"))
+# Archivo rotativo (opcional) con una línea JSON por entrada
+ARCHIVO = os.getenv("CONSULTAS_LENTAS_ARCHIVO", "")
+ARCHIVO_BYTES = int(os.getenv("CONSULTAS_LENTAS_ARCHIVO_BYTES", str(5 * 1024 * 1024)))
+ARCHIVO_COPIAS = int(os.getenv("CONSULTAS_LENTAS_ARCHIVO_COPIAS", "3"))
+
+# Sentencias para las que SQLite acepta EXPLAIN QUERY PLAN
+_EXPLICABLE = re.compile(r"^\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+# "SCAN answers" o "SCAN questions USING INDEX ix_..." (recorrido completo)
+_ESCANEO = re.compile(r"^SCAN (\w+)")
+_MAX_PLANES = 512
+_MAX_PARAMETROS = 50
+_MAX_TEXTO = 200
+
+_peticion_actual: ContextVar[Optional[dict]] = ContextVar("peticion_consulta", default=None)
+
+
+def _parametros(parametros: Any) -> List[Any]:
+    """Copia los parámetros de la sentencia en una lista serializable y acotada."""
+    if isinstance(parametros, dict):
+        parametros = list(parametros.values())
+    resultado = []
+    for valor in list(parametros or ())[:_MAX_PARAMETROS]:
+        if isinstance(valor, (bytes, bytearray, memoryview)):
+            valor = f"<{len(valor)} bytes>"
+        elif isinstance(valor, str):
+            valor = valor if len(valor) <= _MAX_TEXTO else valor[:_MAX_TEXTO] + "…"
+        elif not isinstance(valor, (int, float, bool, type(None))):
+            valor = str(valor)
+        resultado.append(valor)
+    return resultado
+
+
+class RegistroConsultasLentas:
+    """
+    Guarda las consultas lentas en un buffer circular y, si se configura,
+    en un archivo rotativo.
+
+    El plan de cada sentencia se obtiene con EXPLAIN QUERY PLAN la primera
+    vez que se necesita y se reutiliza para las siguientes ejecuciones del
+    mismo texto SQL.
+    """
+
+    def __init__(
+        self,
+        umbral_ms: Optional[float] = UMBRAL_MS,
+        registrar_escaneos: bool = REGISTRAR_ESCANEOS,
+        max_entradas: int = MAX_ENTRADAS,
+        archivo: str = ARCHIVO
+    ):
+        self.umbral_ms = umbral_ms
+        self.registrar_escaneos = registrar_escaneos
+        self._lock = threading.Lock()
+        self._entradas: deque = deque(maxlen=max_entradas)
+        self._planes: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._logger = None
+        if archivo:
+            self._logger = logging.getLogger("quiz_api.consultas_lentas")
+            self._logger.setLevel(logging.INFO)
+            self._logger.propagate = False
+            manejador = RotatingFileHandler(
+                archivo, maxBytes=ARCHIVO_BYTES, backupCount=ARCHIVO_COPIAS, encoding="utf-8"
+            )
+            manejador.setFormatter(logging.Formatter("%(message)s"))
+            self._logger.addHandler(manejador)
+
+    @property
+    def activo(self) -> bool:
+        return self.umbral_ms is not None
+
+    def plan(self, conn, statement: str, parameters: Any, executemany: bool) -> Optional[List[str]]:
+        """
+        Obtiene (o recupera de la caché) el plan de ejecución de una sentencia.
+
+        Args:
+            conn: Conexión de SQLAlchemy en la que se ejecutó la sentencia
+            statement: Texto SQL enviado al driver
+            parameters: Parámetros de la sentencia
+            executemany: Si la sentencia se ejecutó con varios juegos de parámetros
+
+        Returns:
+            Líneas del plan, o None si no se puede explicar la sentencia
+        """
+        with self._lock:
+            plan = self._planes.get(statement)
+            if plan is not None:
+                self._planes.move_to_end(statement)
+                return plan
+        if conn.dialect.name != "sqlite" or not _EXPLICABLE.match(statement):
+            return None
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+        # Cursor del driver: la consulta auxiliar no vuelve a disparar los eventos
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            plan = [fila[3] for fila in cursor.fetchall()]
+        except Exception:
+            return None
+        finally:
+            cursor.close()
+        with self._lock:
+            self._planes[statement] = plan
+            if len(self._planes) > _MAX_PLANES:
+                self._planes.popitem(last=False)
+        return plan
+
+    def escaneos(self, plan: List[str]) -> List[str]:
+        """
+        Tablas del modelo que el plan recorre enteras.
+
+        Las subconsultas materializadas y las tablas virtuales (FTS5) no
+        cuentan: solo interesan los recorridos de tablas reales.
+        """
+        from app.database import Base
+
+        tablas = []
+        for linea in plan:
+            coincidencia = _ESCANEO.match(linea)
+            if coincidencia and coincidencia.group(1) in Base.metadata.tables:
+                tablas.append(coincidencia.group(1))
+        return tablas
+
+    def registrar(self, entrada: Dict[str, Any]):
+        """Añade una entrada al buffer y, si hay archivo configurado, al archivo."""
+        with self._lock:
+            self._entradas.append(entrada)
+        if self._logger is not None:
+            self._logger.info(json.dumps(entrada, ensure_ascii=False, default=str))
+
+    def entradas(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Entradas registradas, de la más reciente a la más antigua.
+
+        Args:
+            limit: Número máximo de entradas (opcional)
+        """
+        with self._lock:
+            entradas = list(reversed(self._entradas))
+        return entradas[:limit] if limit else entradas
+
+    def reiniciar(self):
+        """Vacía el buffer y la caché de planes."""
+        with self._lock:
+            self._entradas.clear()
+            self._planes.clear()
+
+    def estado(self) -> Dict[str, Any]:
+        return {
+            "activo": self.activo,
+            "umbral_ms": self.umbral_ms,
+            "registrar_escaneos": self.registrar_escaneos,
+            "capacidad": self._entradas.maxlen,
+            "archivo": ARCHIVO or None,
+        }
+
+
+consultas_lentas = RegistroConsultasLentas()
+
+
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("consultas_lentas_inicios", []).append(time.perf_counter())
+
+
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    inicios = conn.info.get("consultas_lentas_inicios")
+    if not inicios:
+        return
+    duracion_ms = (time.perf_counter() - inicios.pop()) * 1000
+    registro = consultas_lentas
+    lenta = duracion_ms >= registro.umbral_ms
+
+    if not lenta and not registro.registrar_escaneos:
+        return
+    # Solo las sentencias lentas o aún sin plan conocido pagan el EXPLAIN
+    nuevo = statement not in registro._planes
+    if not lenta and not nuevo:
+        return
+    plan = registro.plan(conn, statement, parameters, executemany)
+    escaneos = registro.escaneos(plan) if plan else []
+    if not lenta and not escaneos:
+        return
+
+    peticion = _peticion_actual.get()
+    ruta = metodo = None
+    if peticion is not None:
+        ruta = getattr(peticion.get("route"), "path", None) or peticion.get("path")
+        metodo = peticion.get("method")
+    registro.registrar({
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+        "motivo": "lenta" if lenta else "escaneo",
+        "duracion_ms": round(duracion_ms, 3),
+        "ruta": ruta,
+        "metodo": metodo,
+        "sentencia": statement,
+        "parametros": _parametros(parameters[0] if executemany and parameters else parameters),
+        "plan": plan,
+        "escaneos": escaneos,
+    })
+
+
+def _error_al_ejecutar(contexto_error):
+    conexion = contexto_error.connection
+    inicios = conexion.info.get("consultas_lentas_inicios") if conexion is not None else None
+    if inicios:
+        inicios.pop()
+
+
+def instrumentar_motor(motor: Engine):
+    """
+    Registra los eventos que miden cada sentencia si el registro está activo.
+
+    Args:
+        motor: Motor síncrono (para el asíncrono, su `sync_engine`)
+    """
+    if not consultas_lentas.activo:
+        return
+    event.listen(motor, "before_cursor_execute", _antes_de_ejecutar)
+    event.listen(motor, "after_cursor_execute", _despues_de_ejecutar)
+    event.listen(motor, "handle_error", _error_al_ejecutar)
+
+
+class ConsultasLentasMiddleware:
+    """
+    Middleware ASGI que expone la petición en curso a los eventos de SQL.
+
+    Se guarda el `scope` completo: cuando se ejecuta el SQL el router ya ha
+    añadido la ruta resuelta, así que la entrada recoge la plantilla de la
+    ruta y no la URL concreta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _peticion_actual.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _peticion_actual.reset(token)
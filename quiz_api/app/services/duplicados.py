@@ -0,0 +1,456 @@
+"""
+Detección de preguntas duplicadas o casi duplicadas con MinHash y LSH
+"""
+import hashlib
+import os
+import random
+import re
+import struct
+import unicodedata
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, delete, func, insert, or_, select, tuple_, union, update
+from sqlalchemy.orm import Session
+
+from app.models.question import Question
+from app.models.question_banda import QuestionBanda
+
+# Políticas ante una pregunta nueva que se parece a una existente:
+# - permitir: se inserta sin comprobar nada
+# - rechazar: no se inserta y se informa del duplicado
+# - marcar: se inserta con `duplicado_de` apuntando a la original
+# - fusionar: no se inserta; la original completa su explicación si no tenía
+POLITICAS_DUPLICADOS = ("permitir", "rechazar", "marcar", "fusionar")
+
+# Similitud de Jaccard mínima entre los términos de dos preguntas para
+# considerarlas duplicadas
+UMBRAL_SIMILITUD = float(os.getenv("DUPLICADOS_UMBRAL", "0.7"))
+
+# 10 bandas de 3 valores: dos preguntas con similitud 0.7 comparten alguna
+# banda con probabilidad ~0.98, y con similitud 0.3 solo ~0.24
+BANDAS = 10
+FILAS_POR_BANDA = 3
+# Preguntas de cada cubeta que se comparan con una nueva
+MAX_CANDIDATOS_POR_BANDA = 10
+
+# Máscaras fijas para derivar las funciones MinHash de un único hash por
+# término. Deben ser estables entre ejecuciones porque las bandas se guardan
+_MASCARAS = [random.Random(20240611 + i).getrandbits(64) for i in range(BANDAS * FILAS_POR_BANDA)]
+_PALABRA = re.compile(r"\w+")
+_DIACRITICO = re.compile(r"[\u0300-\u036f]")
+_BANDA = struct.Struct(f"<{FILAS_POR_BANDA + 1}Q")
+
+
+class Firma(NamedTuple):
+    """Firma de una pregunta para la detección de duplicados"""
+    huella: str
+    terminos: FrozenSet[str]
+    bandas: Tuple[int, ...]
+
+
+class Duplicado(NamedTuple):
+    """Pregunta existente con la que coincide una nueva"""
+    question_id: int
+    similitud: float
+
+
+def normalizar(texto: str) -> str:
+    """
+    Normaliza un texto para compararlo: minúsculas, sin tildes ni signos de
+    puntuación y con los espacios colapsados.
+    """
+    texto = texto.lower()
+    if not texto.isascii():
+        texto = _DIACRITICO.sub("", unicodedata.normalize("NFKD", texto))
+    return " ".join(_PALABRA.findall(texto))
+
+
+def terminos(pregunta: str, opciones: Sequence[str]) -> FrozenSet[str]:
+    """Palabras de la pregunta más cada opción normalizada como un término propio."""
+    return frozenset(normalizar(pregunta).split()) | frozenset(
+        "opcion:" + normalizar(opcion) for opcion in opciones
+    )
+
+
+def _hash64(valor: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(valor, digest_size=8).digest(), "little")
+
+
+def calcular_firma(pregunta: str, opciones: Sequence[str]) -> Firma:
+    """
+    Calcula la huella exacta y las bandas LSH de una pregunta.
+
+    La huella no depende del orden de las opciones, ni de mayúsculas, tildes o
+    puntuación. Las bandas agrupan los valores MinHash de los términos.
+
+    Args:
+        pregunta: Texto de la pregunta
+        opciones: Opciones de respuesta
+
+    Returns:
+        Firma: Huella, términos y claves de las bandas
+    """
+    normalizadas = sorted(normalizar(opcion) for opcion in opciones)
+    huella = hashlib.sha1(
+        "\x1f".join([normalizar(pregunta)] + normalizadas).encode()
+    ).hexdigest()
+
+    conjunto = terminos(pregunta, opciones)
+    hashes = [_hash64(termino.encode()) for termino in conjunto] or [0]
+    minimos = [min(map(mascara.__xor__, hashes)) for mascara in _MASCARAS]
+    bandas = tuple(
+        # 63 bits para que quepa en un INTEGER con signo
+        _hash64(_BANDA.pack(
+            banda, *minimos[banda * FILAS_POR_BANDA:(banda + 1) * FILAS_POR_BANDA]
+        )) >> 1
+        for banda in range(BANDAS)
+    )
+    return Firma(huella, conjunto, bandas)
+
+
+def similitud(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Similitud de Jaccard entre dos conjuntos de términos."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def guardar_bandas(db: Session, firmas: Iterable[Tuple[int, Firma]]):
+    """
+    Inserta las bandas de preguntas recién insertadas (sin confirmar).
+
+    Args:
+        db: Sesión de base de datos
+        firmas: Pares (ID de la pregunta, firma)
+    """
+    filas = [
+        {"question_id": question_id, "banda": banda, "clave": clave}
+        for question_id, firma in firmas
+        for banda, clave in enumerate(firma.bandas)
+    ]
+    if filas:
+        db.execute(insert(QuestionBanda), filas)
+
+
+def actualizar_firma(db: Session, pregunta: Question):
+    """
+    Recalcula la huella y las bandas de una pregunta cuyo texto u opciones
+    han cambiado (sin confirmar).
+    """
+    firma = calcular_firma(pregunta.pregunta, pregunta.opciones)
+    pregunta.huella = firma.huella
+    db.execute(delete(QuestionBanda).where(QuestionBanda.question_id == pregunta.id))
+    guardar_bandas(db, [(pregunta.id, firma)])
+
+
+# Consultas de buscar_duplicado, construidas una sola vez: se ejecutan por
+# cada pregunta importada y construirlas cuesta más que ejecutarlas.
+# La exacta no filtra por is_active en SQL: con dos igualdades SQLite puede
+# elegir el índice de is_active y recorrer todas las preguntas activas
+_CONSULTA_EXACTA = select(Question.id, Question.duplicado_de, Question.is_active).where(
+    Question.huella == bindparam("huella")
+)
+# Las primeras preguntas de cada cubeta; una cubeta enorme (muchas preguntas
+# casi iguales) no obliga a comparar con todas
+_CONSULTA_CANDIDATOS = select(
+    Question.id, Question.pregunta, Question.opciones, Question.duplicado_de
+).where(
+    Question.id.in_(union(*(
+        select(QuestionBanda.question_id)
+        .where(QuestionBanda.banda == banda, QuestionBanda.clave == bindparam(f"clave_{banda}"))
+        .order_by(QuestionBanda.question_id)
+        .limit(MAX_CANDIDATOS_POR_BANDA)
+        .subquery()
+        .select()
+        for banda in range(BANDAS)
+    ))),
+    Question.is_active == True
+).order_by(Question.id)
+
+
+def buscar_duplicado(
+    db: Session,
+    firma: Firma,
+    umbral: float = UMBRAL_SIMILITUD
+) -> Optional[Duplicado]:
+    """
+    Busca entre las preguntas activas la más parecida a una firma.
+
+    Primero se busca la huella exacta; si no aparece, se comparan solo las
+    preguntas que comparten alguna banda LSH, sin recorrer todo el banco.
+
+    Args:
+        db: Sesión de base de datos
+        firma: Firma de la pregunta nueva
+        umbral: Similitud mínima para considerarla duplicada
+
+    Returns:
+        Duplicado con la pregunta original, o None si no hay ninguna
+    """
+    exactas = [fila for fila in db.execute(_CONSULTA_EXACTA, {"huella": firma.huella}) if fila.is_active]
+    if exactas:
+        exacta = min(exactas, key=lambda fila: fila.id)
+        return Duplicado(exacta.duplicado_de or exacta.id, 1.0)
+
+    filas = db.execute(
+        _CONSULTA_CANDIDATOS,
+        {f"clave_{banda}": clave for banda, clave in enumerate(firma.bandas)}
+    ).all()
+
+    mejor = None
+    for fila in filas:
+        valor = similitud(firma.terminos, terminos(fila.pregunta, fila.opciones))
+        if valor >= umbral and (mejor is None or valor > mejor.similitud):
+            # Un duplicado marcado remite a su original
+            mejor = Duplicado(fila.duplicado_de or fila.id, valor)
+    return mejor
+
+
+class IndicePendientes:
+    """
+    Bandas de las preguntas de un lote que aún no se han insertado.
+
+    Sirve para detectar duplicados dentro del mismo lote: si una pregunta
+    comparte alguna banda con otra pendiente, hay que insertar el lote antes
+    de buscar en la base de datos.
+    """
+
+    def __init__(self):
+        self._claves = set()
+
+    def coincide(self, firma: Firma) -> bool:
+        return any((banda, clave) in self._claves for banda, clave in enumerate(firma.bandas))
+
+    def agregar(self, firma: Firma):
+        self._claves.update(enumerate(firma.bandas))
+
+    def vaciar(self):
+        self._claves.clear()
+
+
+def fusionar_pregunta(db: Session, question_id: int, datos: dict) -> bool:
+    """
+    Fusiona una pregunta nueva con su original (sin confirmar): la original
+    toma la explicación de la nueva si no tenía ninguna.
+
+    Returns:
+        True si la pregunta original se ha modificado
+    """
+    if not datos.get("explicacion"):
+        return False
+    resultado = db.execute(
+        update(Question)
+        .where(Question.id == question_id, or_(Question.explicacion.is_(None), Question.explicacion == ""))
+        .values(explicacion=datos["explicacion"])
+    )
+    return resultado.rowcount > 0
+
+
+class InsercionPreguntas:
+    """
+    Inserta preguntas nuevas por lotes aplicando una política de duplicados.
+
+    Las preguntas aceptadas se acumulan y se insertan juntas con un único
+    INSERT ... RETURNING, junto con sus bandas. Si una pregunta nueva puede
+    duplicar a otra todavía pendiente, las pendientes se insertan antes de
+    buscar, así que también se detectan duplicados dentro del mismo lote.
+    No confirma la transacción.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        politica: str = "permitir",
+        umbral: float = UMBRAL_SIMILITUD,
+        columnas: Sequence = (Question.id,)
+    ):
+        if politica not in POLITICAS_DUPLICADOS:
+            raise ValueError(f"Política de duplicados desconocida: {politica}")
+        self.db = db
+        self.politica = politica
+        self.umbral = umbral
+        self.columnas = columnas
+        # Preguntas originales modificadas al fusionar
+        self.modificadas = 0
+        self._filas: List[dict] = []
+        self._firmas: List[Firma] = []
+        self._pendientes = IndicePendientes()
+        self._insertadas = []
+
+    def agregar(self, datos: dict) -> Optional[Duplicado]:
+        """
+        Añade una pregunta validada (el `model_dump` de QuestionCreate).
+
+        Args:
+            datos: Campos de la pregunta
+
+        Returns:
+            El duplicado encontrado, o None. Con "rechazar" y "fusionar" la
+            pregunta no se inserta si es duplicada; con "marcar" se inserta
+            con `duplicado_de`.
+        """
+        firma = calcular_firma(datos["pregunta"], datos["opciones"])
+        duplicado = None
+        if self.politica != "permitir":
+            if self._pendientes.coincide(firma):
+                self._insertar_pendientes()
+            duplicado = buscar_duplicado(self.db, firma, self.umbral)
+
+        if duplicado is not None and self.politica == "fusionar":
+            if fusionar_pregunta(self.db, duplicado.question_id, datos):
+                self.modificadas += 1
+        elif duplicado is None or self.politica == "marcar":
+            self._filas.append({
+                **datos,
+                "huella": firma.huella,
+                "duplicado_de": duplicado.question_id if duplicado else None
+            })
+            self._firmas.append(firma)
+            self._pendientes.agregar(firma)
+        return duplicado
+
+    def _insertar_pendientes(self):
+        if self._filas:
+            filas = self.db.execute(
+                insert(Question).returning(*self.columnas, sort_by_parameter_order=True),
+                self._filas
+            ).all()
+            guardar_bandas(self.db, zip((fila.id for fila in filas), self._firmas))
+            self._insertadas.extend(filas)
+        self._filas, self._firmas = [], []
+        self._pendientes.vaciar()
+
+    def vaciar(self) -> list:
+        """
+        Inserta las preguntas pendientes.
+
+        Returns:
+            Filas (con `columnas`) de todas las preguntas insertadas desde la
+            última llamada, en el orden en que se agregaron
+        """
+        self._insertar_pendientes()
+        insertadas, self._insertadas = self._insertadas, []
+        return insertadas
+
+
+def indexar_preguntas_sin_firma(db: Session, tamano_lote: int = 1000) -> int:
+    """
+    Calcula la huella y las bandas de las preguntas que no las tienen, por
+    ejemplo las de una base de datos anterior a la detección de duplicados.
+
+    Args:
+        db: Sesión de base de datos
+        tamano_lote: Preguntas procesadas por transacción
+
+    Returns:
+        Número de preguntas indexadas
+    """
+    total = 0
+    while True:
+        filas = db.execute(
+            select(Question.id, Question.pregunta, Question.opciones)
+            .where(Question.huella.is_(None))
+            .order_by(Question.id)
+            .limit(tamano_lote)
+        ).all()
+        if not filas:
+            return total
+        firmas = [(fila.id, calcular_firma(fila.pregunta, fila.opciones)) for fila in filas]
+        db.execute(
+            update(Question),
+            [{"id": question_id, "huella": firma.huella} for question_id, firma in firmas]
+        )
+        db.execute(delete(QuestionBanda).where(
+            QuestionBanda.question_id.in_([question_id for question_id, _ in firmas])
+        ))
+        guardar_bandas(db, firmas)
+        db.commit()
+        total += len(firmas)
+
+
+def agrupar_duplicados(
+    db: Session,
+    umbral: float = UMBRAL_SIMILITUD
+) -> List[Tuple[List[int], float]]:
+    """
+    Agrupa las preguntas activas del banco que son duplicadas entre sí.
+
+    Los pares candidatos salen de las preguntas que comparten alguna banda;
+    cada par se verifica con la similitud real y los pares confirmados se
+    unen en grupos.
+
+    Args:
+        db: Sesión de base de datos
+        umbral: Similitud mínima para considerar duplicado un par
+
+    Returns:
+        Lista de grupos (IDs ordenados, similitud mínima entre los pares
+        confirmados), ordenada por el primer ID
+    """
+    # Cubetas (banda, clave) con más de una pregunta. Las preguntas inactivas
+    # se descartan en Python: filtrarlas en SQL hace que SQLite combine las
+    # listas de IN y la consulta pasa de milisegundos a segundos
+    compartidas = (
+        select(QuestionBanda.banda, QuestionBanda.clave)
+        .group_by(QuestionBanda.banda, QuestionBanda.clave)
+        .having(func.count() > 1)
+    )
+    en_compartidas = tuple_(QuestionBanda.banda, QuestionBanda.clave).in_(compartidas)
+    conjuntos = {
+        fila.id: terminos(fila.pregunta, fila.opciones)
+        for fila in db.execute(
+            select(Question.id, Question.pregunta, Question.opciones).where(
+                Question.id.in_(select(QuestionBanda.question_id).where(en_compartidas)),
+                Question.is_active == True
+            )
+        )
+    }
+
+    # Dentro de cada cubeta cada pregunta se compara con la primera y con la
+    # anterior, no con todas: el coste es lineal aunque una cubeta sea enorme
+    pares = set()
+    cubeta = primera = anterior = None
+    for fila in db.execute(
+        select(QuestionBanda.banda, QuestionBanda.clave, QuestionBanda.question_id)
+        .where(en_compartidas)
+        .order_by(QuestionBanda.banda, QuestionBanda.clave, QuestionBanda.question_id)
+    ):
+        if fila.question_id not in conjuntos:
+            continue
+        if (fila.banda, fila.clave) != cubeta:
+            cubeta = (fila.banda, fila.clave)
+            primera = anterior = fila.question_id
+            continue
+        pares.add((primera, fila.question_id))
+        pares.add((anterior, fila.question_id))
+        anterior = fila.question_id
+
+    # Unión-búsqueda sobre los pares que superan el umbral. La raíz de cada
+    # grupo es siempre su menor ID
+    padre: Dict[int, int] = {}
+
+    def raiz(x: int) -> int:
+        padre.setdefault(x, x)
+        while padre[x] != x:
+            padre[x] = padre[padre[x]]
+            x = padre[x]
+        return x
+
+    confirmados = []
+    for a, b in sorted(pares):
+        valor = similitud(conjuntos[a], conjuntos[b])
+        if valor < umbral:
+            continue
+        confirmados.append((a, valor))
+        ra, rb = raiz(a), raiz(b)
+        if ra != rb:
+            padre[max(ra, rb)] = min(ra, rb)
+
+    grupos: Dict[int, List[int]] = {}
+    for question_id in list(padre):
+        grupos.setdefault(raiz(question_id), []).append(question_id)
+    minima: Dict[int, float] = {}
+    for question_id, valor in confirmados:
+        r = raiz(question_id)
+        minima[r] = min(valor, minima.get(r, 1.0))
+    return [(sorted(miembros), round(minima[r], 4)) for r, miembros in sorted(grupos.items())]
@@ -0,0 +1,122 @@
+"""
+Archivos estáticos del frontend con huella de contenido y precomprimidos
+"""
+import hashlib
+import mimetypes
+import re
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+from app.services.compresion import CODIFICACIONES, comprimible, comprimir, negociar
+from app.services.etags import coincide
+
+# Los nombres con huella no cambian nunca de contenido: se cachean un año
+CACHE_INMUTABLE = "public, max-age=31536000, immutable"
+# Los nombres sin huella (index.html) se revalidan siempre con su ETag
+CACHE_REVALIDAR = "no-cache"
+
+_NIVEL_MAXIMO = {"br": 11, "gzip": 9}
+_REFERENCIA = re.compile(r"/static/([\w./-]+)")
+
+
+class _Recurso:
+    __slots__ = ("huella", "tipo", "variantes")
+
+    def __init__(self, contenido: bytes, tipo: str):
+        self.huella = hashlib.sha256(contenido).hexdigest()[:12]
+        self.tipo = tipo
+        # Cuerpo por codificación ("" es el original); solo se guardan las
+        # versiones comprimidas que ocupan menos
+        self.variantes: Dict[str, bytes] = {"": contenido}
+        if comprimible(tipo):
+            for codificacion in CODIFICACIONES:
+                comprimido = comprimir(contenido, codificacion, _NIVEL_MAXIMO[codificacion])
+                if len(comprimido) < len(contenido):
+                    self.variantes[codificacion] = comprimido
+
+
+def _con_huella(ruta: str, huella: str) -> str:
+    """`css/styles.css` -> `css/styles.<huella>.css`"""
+    carpeta, _, nombre = ruta.rpartition("/")
+    base, punto, extension = nombre.rpartition(".")
+    nombre = f"{base}.{huella}.{extension}" if punto else f"{nombre}.{huella}"
+    return f"{carpeta}/{nombre}" if carpeta else nombre
+
+
+class RecursosEstaticos:
+    """
+    Carga los archivos del frontend en memoria al arrancar, los comprime con
+    la máxima calidad y los sirve por su nombre con huella (cacheable sin
+    límite) o por su nombre original (revalidado con ETag).
+
+    Las referencias `/static/...` de los HTML se reescriben a los nombres
+    con huella, así que al cambiar un CSS o JS cambia su URL y la del HTML
+    que lo usa, y los navegadores nunca sirven una versión antigua.
+    """
+
+    def __init__(self, directorio: Path):
+        self.directorio = directorio
+        self._recursos: Dict[str, Tuple[_Recurso, bool]] = {}
+        self._urls: Dict[str, str] = {}
+        if directorio.exists():
+            self._cargar()
+
+    def _cargar(self):
+        archivos = sorted(
+            archivo for archivo in self.directorio.rglob("*")
+            if archivo.is_file() and not archivo.name.startswith(".")
+        )
+        # Los HTML al final: sus referencias necesitan las huellas del resto
+        archivos.sort(key=lambda archivo: archivo.suffix == ".html")
+        for archivo in archivos:
+            ruta = archivo.relative_to(self.directorio).as_posix()
+            tipo = mimetypes.guess_type(archivo.name)[0] or "application/octet-stream"
+            contenido = archivo.read_bytes()
+            if tipo == "text/html":
+                contenido = _REFERENCIA.sub(
+                    lambda m: "/static/" + self._urls.get(m.group(1), m.group(1)),
+                    contenido.decode("utf-8")
+                ).encode("utf-8")
+            if tipo.startswith("text/") or tipo == "application/javascript":
+                tipo += "; charset=utf-8"
+            recurso = _Recurso(contenido, tipo)
+            con_huella = _con_huella(ruta, recurso.huella)
+            self._urls[ruta] = con_huella
+            self._recursos[ruta] = (recurso, False)
+            self._recursos[con_huella] = (recurso, True)
+
+    def respuesta(self, request: Request, ruta: str) -> Optional[Response]:
+        """
+        Respuesta para un archivo, con la variante comprimida que acepte el
+        cliente, Cache-Control y ETag; 304 si If-None-Match coincide.
+
+        Args:
+            request: Petición HTTP (Accept-Encoding e If-None-Match)
+            ruta: Ruta relativa al directorio del frontend, con o sin huella
+
+        Returns:
+            La respuesta, o None si el archivo no existe
+        """
+        encontrado = self._recursos.get(ruta)
+        if encontrado is None:
+            return None
+        recurso, inmutable = encontrado
+        codificacion = negociar(
+            request.headers.get("accept-encoding", ""),
+            [codificacion for codificacion in recurso.variantes if codificacion]
+        ) or ""
+        # Cada codificación es un cuerpo distinto, así que lleva su propio ETag
+        etag = f'"{recurso.huella}-{codificacion}"' if codificacion else f'"{recurso.huella}"'
+        cabeceras = {
+            "Cache-Control": CACHE_INMUTABLE if inmutable else CACHE_REVALIDAR,
+            "ETag": etag,
+        }
+        if len(recurso.variantes) > 1:
+            cabeceras["Vary"] = "Accept-Encoding"
+        if coincide(request, etag):
+            return Response(status_code=304, headers=cabeceras)
+        if codificacion:
+            cabeceras["Content-Encoding"] = codificacion
+        return Response(recurso.variantes[codificacion], media_type=recurso.tipo, headers=cabeceras)
@@ -0,0 +1,50 @@
+"""
+ETags a partir de las versiones de `coherencia` y GET condicionales
+"""
+from fastapi import Request, Response
+
+
+def etiqueta(*versiones) -> str:
+    """
+    Construye un ETag fuerte a partir de versiones de datos.
+
+    Args:
+        versiones: Partes que identifican el estado de los datos, por ejemplo
+            ("preguntas", 42)
+
+    Returns:
+        ETag entre comillas
+    """
+    return '"' + "-".join(str(version) for version in versiones) + '"'
+
+
+def coincide(request: Request, etag: str) -> bool:
+    """
+    Comprueba si la cabecera If-None-Match de la petición incluye el ETag.
+
+    If-None-Match usa la comparación débil: se ignora el prefijo W/.
+
+    Args:
+        request: Petición HTTP
+        etag: ETag actual del recurso
+
+    Returns:
+        True si el cliente ya tiene esta versión
+    """
+    cabecera = request.headers.get("if-none-match")
+    if not cabecera:
+        return False
+    if cabecera.strip() == "*":
+        return True
+    for candidato in cabecera.split(","):
+        candidato = candidato.strip()
+        if candidato.startswith("W/"):
+            candidato = candidato[2:]
+        if candidato == etag:
+            return True
+    return False
+
+
+def no_modificado(etag: str) -> Response:
+    """Respuesta 304 sin cuerpo con el ETag vigente."""
+    return Response(status_code=304, headers={"ETag": etag})
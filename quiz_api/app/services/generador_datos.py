@@ -0,0 +1,312 @@
+"""
+Generación de datos sintéticos a gran escala (preguntas, sesiones y respuestas)
+"""
+import io
+import json
+import math
+import random
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from app.models.answer import Answer
+from app.models.question import Question
+from app.models.quiz_session import QuizSession
+from app.services.question_importer import importar_preguntas
+
+CATEGORIAS = (
+    "Tecnología", "Ciencia", "Historia", "Geografía", "Deportes",
+    "Arte", "Literatura", "Música", "Cine", "Gastronomía"
+)
+DIFICULTADES = ("fácil", "medio", "difícil")
+PESOS_DIFICULTAD = (0.4, 0.4, 0.2)
+
+# Estados finales de las sesiones y su probabilidad
+ESTADOS = ("completado", "abandonado", "en_progreso")
+PESOS_ESTADO = (0.85, 0.10, 0.05)
+# Tamaños de quiz habituales (el de 10 es el más frecuente)
+PREGUNTAS_POR_SESION = (5, 10, 10, 10, 15, 20)
+# Probabilidad de que una sesión se limite a una sola categoría
+PROBABILIDAD_CATEGORIA = 0.5
+# Variación de la probabilidad de acierto y mediana del tiempo de respuesta
+# (segundos) según la dificultad
+AJUSTE_DIFICULTAD = {"fácil": 0.15, "medio": 0.0, "difícil": -0.2}
+MEDIANA_TIEMPO = {"fácil": 10.0, "medio": 18.0, "difícil": 28.0}
+# Respuestas registradas sin tiempo
+PROBABILIDAD_SIN_TIEMPO = 0.03
+
+# Fecha de la última sesión generada; fija para que la semilla determine
+# también las fechas
+FECHA_FIN = datetime(2025, 1, 1)
+
+PALABRAS = (
+    "agua fuego tierra aire planeta río montaña ciudad reino guerra tratado autor novela "
+    "pintor cuadro ecuación átomo célula energía motor red protocolo algoritmo sinfonía ópera "
+    "equipo récord medalla océano desierto volcán imperio siglo teorema órbita molécula museo "
+    "puente catedral receta especia director guion estreno compositor partitura isla frontera "
+    "dinastía revolución satélite galaxia proteína bacteria compilador servidor base datos"
+).split()
+
+
+def _prefijo_usuarios(semilla: int) -> str:
+    return f"sintetico-{semilla}-"
+
+
+def _preguntas_sinteticas(desde: int, total: int, semilla: int) -> bytes:
+    """Banco NDJSON determinista de `total` preguntas a partir del número `desde`."""
+    lineas = []
+    for numero in range(desde, desde + total):
+        aleatorio = random.Random(semilla * 1_000_003 + numero)
+        opciones = aleatorio.choice((3, 4, 4, 4, 5))
+        lineas.append(json.dumps({
+            "pregunta": f"Pregunta {numero}: {' '.join(aleatorio.choices(PALABRAS, k=9))}?",
+            "opciones": [" ".join(aleatorio.choices(PALABRAS, k=3)) for _ in range(opciones)],
+            "respuesta_correcta": aleatorio.randrange(opciones),
+            "explicacion": " ".join(aleatorio.choices(PALABRAS, k=14)),
+            "categoria": aleatorio.choices(CATEGORIAS, weights=range(len(CATEGORIAS), 0, -1))[0],
+            "dificultad": aleatorio.choices(DIFICULTADES, weights=PESOS_DIFICULTAD)[0]
+        }, ensure_ascii=False))
+    return ("\n".join(lineas) + "\n").encode()
+
+
+def completar_banco(
+    db: Session,
+    preguntas: int,
+    semilla: int,
+    tamano_lote: int = 5000,
+    al_progresar: Optional[Callable[[dict], None]] = None
+) -> int:
+    """
+    Añade preguntas sintéticas hasta que el banco tenga `preguntas` activas.
+
+    Las preguntas se importan con importar_preguntas, así que reciben su
+    firma de duplicados y su entrada en la búsqueda de texto como cualquier
+    otra.
+
+    Args:
+        db: Sesión de base de datos
+        preguntas: Número de preguntas activas deseado
+        semilla: Semilla del generador
+        tamano_lote: Preguntas por lote
+        al_progresar: Función opcional llamada con el resumen de cada lote
+
+    Returns:
+        Número de preguntas añadidas
+    """
+    activas = db.scalar(select(func.count()).select_from(Question).where(Question.is_active == True))
+    faltan = preguntas - activas
+    if faltan <= 0:
+        return 0
+    resumen = importar_preguntas(
+        db, io.BytesIO(_preguntas_sinteticas(activas, faltan, semilla)), tamano_lote,
+        al_progresar=al_progresar
+    )
+    return resumen["insertadas"]
+
+
+class _Banco:
+    """Preguntas activas agrupadas por categoría para repartirlas entre sesiones."""
+
+    def __init__(self, db: Session):
+        filas = db.execute(
+            select(Question.id, Question.categoria, Question.dificultad, Question.opciones, Question.respuesta_correcta)
+            .where(Question.is_active == True)
+            .order_by(Question.id)
+        ).all()
+        self.preguntas = [
+            (fila.id, fila.dificultad, len(fila.opciones), fila.respuesta_correcta) for fila in filas
+        ]
+        por_categoria: Dict[str, List[int]] = {}
+        for indice, fila in enumerate(filas):
+            por_categoria.setdefault(fila.categoria, []).append(indice)
+        # Las categorías con más preguntas son también las más jugadas
+        self.categorias = sorted(por_categoria, key=lambda c: (-len(por_categoria[c]), c))
+        self.por_categoria = por_categoria
+        self.pesos_categoria = [1 / (rango + 1) for rango in range(len(self.categorias))]
+
+
+def _habilidad(usuario: int) -> float:
+    """Probabilidad base de acierto de un usuario, fija para cada usuario."""
+    return 0.35 + 0.5 * (((usuario * 2654435761) & 0xFFFFFFFF) / 2 ** 32)
+
+
+def _sesion(
+    numero: int,
+    semilla: int,
+    sesiones: int,
+    usuarios: int,
+    dias: int,
+    banco: _Banco
+):
+    """
+    Genera una sesión y sus respuestas.
+
+    Cada sesión usa su propio generador derivado de la semilla y de su
+    número, así que el resultado no depende del tamaño del lote ni de si la
+    generación se reanudó.
+    """
+    aleatorio = random.Random(semilla * 1_000_000_007 + numero)
+    # Unos pocos usuarios juegan mucho y la mayoría juega poco
+    usuario = int(usuarios * aleatorio.random() ** 3)
+    estado = aleatorio.choices(ESTADOS, weights=PESOS_ESTADO)[0]
+    # Las sesiones se reparten en el tiempo en el orden en que se numeran
+    fecha_inicio = FECHA_FIN - timedelta(
+        seconds=dias * 86400 * (1 - (numero + aleatorio.random()) / sesiones)
+    )
+
+    tamano = aleatorio.choice(PREGUNTAS_POR_SESION)
+    candidatas = range(len(banco.preguntas))
+    if banco.categorias and aleatorio.random() < PROBABILIDAD_CATEGORIA:
+        categoria = aleatorio.choices(banco.categorias, weights=banco.pesos_categoria)[0]
+        candidatas = banco.por_categoria[categoria]
+    tamano = min(tamano, len(candidatas))
+    if estado == "abandonado":
+        respondidas = aleatorio.randint(1, max(1, tamano - 1))
+    elif estado == "en_progreso":
+        respondidas = aleatorio.randint(0, max(0, tamano - 1))
+    else:
+        respondidas = tamano
+
+    habilidad = _habilidad(usuario)
+    respuestas = []
+    correctas = tiempo_total = con_tiempo = 0
+    momento = fecha_inicio
+    for indice in aleatorio.sample(candidatas, respondidas):
+        question_id, dificultad, opciones, respuesta_correcta = banco.preguntas[indice]
+        probabilidad = min(0.97, max(0.05, habilidad + AJUSTE_DIFICULTAD.get(dificultad, 0.0)))
+        es_correcta = aleatorio.random() < probabilidad
+        if es_correcta:
+            seleccionada = respuesta_correcta
+            correctas += 1
+        else:
+            seleccionada = aleatorio.randrange(opciones - 1)
+            seleccionada += seleccionada >= respuesta_correcta
+        # Tiempos con distribución log-normal; los fallos tardan algo más
+        mediana = MEDIANA_TIEMPO.get(dificultad, 18.0) * (1.0 if es_correcta else 1.25)
+        segundos = min(300, max(1, round(aleatorio.lognormvariate(math.log(mediana), 0.6))))
+        momento += timedelta(seconds=segundos)
+        tiempo = None
+        if aleatorio.random() >= PROBABILIDAD_SIN_TIEMPO:
+            tiempo = segundos
+            tiempo_total += segundos
+            con_tiempo += 1
+        respuestas.append({
+            "question_id": question_id,
+            "respuesta_seleccionada": seleccionada,
+            "es_correcta": es_correcta,
+            "tiempo_respuesta_segundos": tiempo,
+            "created_at": momento
+        })
+
+    completada = estado == "completado"
+    duracion = int((momento - fecha_inicio).total_seconds()) + aleatorio.randint(0, 5 * tamano)
+    sesion = {
+        "usuario_nombre": f"{_prefijo_usuarios(semilla)}{usuario:07d}",
+        "fecha_inicio": fecha_inicio,
+        "fecha_fin": fecha_inicio + timedelta(seconds=duracion) if estado != "en_progreso" else None,
+        "puntuacion_total": correctas * 10,
+        "preguntas_respondidas": respondidas,
+        "preguntas_correctas": correctas,
+        "estado": estado,
+        "tiempo_total_segundos": duracion if completada else None,
+        "tiempo_respuestas_total": tiempo_total,
+        "respuestas_con_tiempo": con_tiempo,
+        "created_at": fecha_inicio
+    }
+    return sesion, respuestas
+
+
+def sesiones_generadas(db: Session, semilla: int) -> int:
+    """
+    Cuenta las sesiones sintéticas ya generadas con una semilla.
+
+    Las sesiones se numeran en orden y cada lote se confirma entero, así que
+    el total es también el número de la siguiente sesión a generar.
+    """
+    prefijo = _prefijo_usuarios(semilla)
+    # Rango en lugar de LIKE para que SQLite pueda usar el índice de usuario_nombre
+    siguiente = prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+    return db.scalar(
+        select(func.count()).select_from(QuizSession).where(
+            QuizSession.usuario_nombre >= prefijo,
+            QuizSession.usuario_nombre < siguiente
+        )
+    )
+
+
+def generar_sesiones(
+    db: Session,
+    sesiones: int,
+    semilla: int,
+    usuarios: Optional[int] = None,
+    dias: int = 365,
+    tamano_lote: int = 5000,
+    al_progresar: Optional[Callable[[dict], None]] = None
+) -> dict:
+    """
+    Genera sesiones sintéticas con sus respuestas hasta llegar a `sesiones`.
+
+    Cada lote se inserta con dos INSERT de Core (las sesiones con RETURNING
+    de sus IDs y después sus respuestas) y se confirma por separado. Si la
+    generación se interrumpe, volver a lanzarla con los mismos argumentos
+    continúa desde la primera sesión que falta. Los agregados de
+    estadísticas no se actualizan: hay que reconstruirlos al terminar.
+
+    Args:
+        db: Sesión de base de datos
+        sesiones: Número total de sesiones sintéticas deseado para la semilla
+        semilla: Semilla del generador
+        usuarios: Número de usuarios distintos (por defecto una décima parte
+            de las sesiones)
+        dias: Días que abarcan las fechas de las sesiones
+        tamano_lote: Sesiones por lote
+        al_progresar: Función opcional llamada con el resumen de cada lote
+
+    Returns:
+        Dict con las sesiones que ya existían, las generadas y sus respuestas
+
+    Raises:
+        ValueError: Si no hay preguntas activas
+    """
+    usuarios = usuarios or max(1, sesiones // 10)
+    existentes = sesiones_generadas(db, semilla)
+    resumen = {"existentes": existentes, "generadas": 0, "respuestas": 0}
+    if existentes >= sesiones:
+        return resumen
+
+    banco = _Banco(db)
+    if not banco.preguntas:
+        raise ValueError("No hay preguntas activas con las que generar respuestas")
+
+    insertar_sesiones = insert(QuizSession).returning(QuizSession.id, sort_by_parameter_order=True)
+    for inicio in range(existentes, sesiones, tamano_lote):
+        fin = min(inicio + tamano_lote, sesiones)
+        filas_sesiones = []
+        respuestas_por_sesion = []
+        for numero in range(inicio, fin):
+            sesion, respuestas = _sesion(numero, semilla, sesiones, usuarios, dias, banco)
+            filas_sesiones.append(sesion)
+            respuestas_por_sesion.append(respuestas)
+
+        conexion = db.connection()
+        ids = conexion.execute(insertar_sesiones, filas_sesiones).scalars().all()
+        filas_respuestas = []
+        for quiz_session_id, respuestas in zip(ids, respuestas_por_sesion):
+            for respuesta in respuestas:
+                respuesta["quiz_session_id"] = quiz_session_id
+            filas_respuestas.extend(respuestas)
+        if filas_respuestas:
+            conexion.execute(insert(Answer), filas_respuestas)
+        db.commit()
+
+        resumen["generadas"] += fin - inicio
+        resumen["respuestas"] += len(filas_respuestas)
+        if al_progresar is not None:
+            al_progresar({
+                "sesiones": fin,
+                "total": sesiones,
+                "respuestas": len(filas_respuestas)
+            })
+    return resumen
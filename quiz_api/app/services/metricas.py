@@ -0,0 +1,282 @@
+"""
+Métricas de rendimiento por ruta: latencia, SQL y tamaño de respuesta
+"""
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Fracción de peticiones medidas (0 desactiva la medición, 1 mide todas)
+MUESTREO = float(os.getenv("METRICAS_MUESTREO", "0"))
+# Añadir la cabecera Server-Timing a las peticiones medidas
+SERVER_TIMING = os.getenv("METRICAS_SERVER_TIMING", "0") == "1"
+
+# Límites (en segundos) de los buckets del histograma de latencia
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Rutas sin plantilla (404, archivos estáticos) se agrupan bajo un solo nombre
+# para no crear una serie por cada URL
+RUTA_DESCONOCIDA = "<sin ruta>"
+
+
+class MedicionPeticion:
+    """Contadores de una petición medida"""
+    __slots__ = ("consultas", "tiempo_sql", "filas", "_inicios")
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_sql = 0.0
+        self.filas = 0
+        self._inicios: List[float] = []
+
+
+_medicion_actual: ContextVar[Optional[MedicionPeticion]] = ContextVar("medicion_actual", default=None)
+
+
+class _SerieRuta:
+    """Acumulados de una ruta y método"""
+    __slots__ = ("peticiones", "buckets", "suma_latencia", "consultas", "tiempo_sql", "filas", "bytes")
+
+    def __init__(self):
+        self.peticiones: Dict[int, int] = {}
+        self.buckets = [0] * len(BUCKETS_LATENCIA)
+        self.suma_latencia = 0.0
+        self.consultas = 0
+        self.tiempo_sql = 0.0
+        self.filas = 0
+        self.bytes = 0
+
+
+class RegistroMetricas:
+    """Acumula las mediciones de las peticiones por plantilla de ruta"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, str], _SerieRuta] = {}
+
+    def registrar(
+        self,
+        ruta: str,
+        metodo: str,
+        estado: int,
+        latencia: float,
+        medicion: MedicionPeticion,
+        tamano: int
+    ):
+        """
+        Suma una petición medida a los acumulados de su ruta.
+
+        Args:
+            ruta: Plantilla de la ruta (por ejemplo "/questions/{question_id}")
+            metodo: Método HTTP
+            estado: Código de estado de la respuesta
+            latencia: Segundos hasta el final de la respuesta
+            medicion: Contadores de SQL de la petición
+            tamano: Bytes del cuerpo de la respuesta tal como se enviaron
+                (comprimidos si se comprimió)
+        """
+        with self._lock:
+            serie = self._series.get((ruta, metodo))
+            if serie is None:
+                serie = self._series[(ruta, metodo)] = _SerieRuta()
+            serie.peticiones[estado] = serie.peticiones.get(estado, 0) + 1
+            for i, limite in enumerate(BUCKETS_LATENCIA):
+                if latencia <= limite:
+                    serie.buckets[i] += 1
+            serie.suma_latencia += latencia
+            serie.consultas += medicion.consultas
+            serie.tiempo_sql += medicion.tiempo_sql
+            serie.filas += medicion.filas
+            serie.bytes += tamano
+
+    def reiniciar(self):
+        """Descarta todos los acumulados."""
+        with self._lock:
+            self._series.clear()
+
+    def exportar(self) -> str:
+        """
+        Genera los acumulados en el formato de texto de Prometheus.
+
+        Returns:
+            Texto con una línea por serie
+        """
+        with self._lock:
+            series = sorted(
+                (clave, _copiar(serie)) for clave, serie in self._series.items()
+            )
+
+        lineas = [
+            "# HELP quiz_metricas_muestreo Fracción de peticiones medidas",
+            "# TYPE quiz_metricas_muestreo gauge",
+            f"quiz_metricas_muestreo {MUESTREO}",
+            "# HELP quiz_http_requests_total Peticiones medidas",
+            "# TYPE quiz_http_requests_total counter",
+        ]
+        for (ruta, metodo), serie in series:
+            for estado, total in sorted(serie.peticiones.items()):
+                lineas.append(
+                    f'quiz_http_requests_total{{{_etiquetas(ruta, metodo)},status="{estado}"}} {total}'
+                )
+
+        lineas += [
+            "# HELP quiz_http_request_duration_seconds Latencia de las peticiones medidas",
+            "# TYPE quiz_http_request_duration_seconds histogram",
+        ]
+        for (ruta, metodo), serie in series:
+            etiquetas = _etiquetas(ruta, metodo)
+            for limite, total in zip(BUCKETS_LATENCIA, serie.buckets):
+                lineas.append(
+                    f'quiz_http_request_duration_seconds_bucket{{{etiquetas},le="{limite}"}} {total}'
+                )
+            peticiones = sum(serie.peticiones.values())
+            lineas += [
+                f'quiz_http_request_duration_seconds_bucket{{{etiquetas},le="+Inf"}} {peticiones}',
+                f"quiz_http_request_duration_seconds_sum{{{etiquetas}}} {serie.suma_latencia:.6f}",
+                f"quiz_http_request_duration_seconds_count{{{etiquetas}}} {peticiones}",
+            ]
+
+        contadores = (
+            ("quiz_sql_statements_total", "Sentencias SQL ejecutadas", "consultas", "{}"),
+            ("quiz_sql_duration_seconds_total", "Tiempo total en SQL", "tiempo_sql", "{:.6f}"),
+            (
+                "quiz_sql_rows_total",
+                "Filas informadas por el driver (cursor.rowcount; SQLite solo lo da en escrituras)",
+                "filas",
+                "{}"
+            ),
+            (
+                "quiz_http_response_wire_bytes_total",
+                "Bytes del cuerpo de las respuestas tal como salen por la red, ya comprimidos",
+                "bytes",
+                "{}"
+            ),
+        )
+        for nombre, ayuda, atributo, formato in contadores:
+            lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} counter"]
+            for (ruta, metodo), serie in series:
+                valor = formato.format(getattr(serie, atributo))
+                lineas.append(f"{nombre}{{{_etiquetas(ruta, metodo)}}} {valor}")
+        return "\n".join(lineas) + "\n"
+
+
+def _copiar(serie: _SerieRuta) -> _SerieRuta:
+    copia = _SerieRuta()
+    copia.peticiones = dict(serie.peticiones)
+    copia.buckets = list(serie.buckets)
+    for atributo in ("suma_latencia", "consultas", "tiempo_sql", "filas", "bytes"):
+        setattr(copia, atributo, getattr(serie, atributo))
+    return copia
+
+
+def _etiquetas(ruta: str, metodo: str) -> str:
+    ruta = ruta.replace("\\", "\\\\").replace('"', '\\"')
+    return f'route="{ruta}",method="{metodo}"'
+
+
+metricas = RegistroMetricas()
+
+
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    medicion = _medicion_actual.get()
+    if medicion is not None:
+        medicion._inicios.append(time.perf_counter())
+
+
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    medicion = _medicion_actual.get()
+    if medicion is None or not medicion._inicios:
+        return
+    medicion.tiempo_sql += time.perf_counter() - medicion._inicios.pop()
+    medicion.consultas += 1
+    # rowcount es -1 cuando el driver no lo conoce (en SQLite, los SELECT)
+    if cursor.rowcount > 0:
+        medicion.filas += cursor.rowcount
+
+
+def _error_al_ejecutar(contexto_error):
+    medicion = _medicion_actual.get()
+    if medicion is not None and medicion._inicios:
+        medicion._inicios.pop()
+
+
+def instrumentar_motor(motor: Engine):
+    """
+    Registra los eventos que cuentan sentencias, tiempo y filas de SQL.
+
+    Las filas salen de `cursor.rowcount`, así que son las que informa el
+    driver: las afectadas por las escrituras y, en los drivers que lo
+    calculan (PostgreSQL), las devueltas por las consultas.
+
+    Fuera de una petición medida los eventos solo consultan una ContextVar.
+
+    Args:
+        motor: Motor síncrono (para el asíncrono, su `sync_engine`)
+    """
+    event.listen(motor, "before_cursor_execute", _antes_de_ejecutar)
+    event.listen(motor, "after_cursor_execute", _despues_de_ejecutar)
+    event.listen(motor, "handle_error", _error_al_ejecutar)
+
+
+class MetricasMiddleware:
+    """
+    Middleware ASGI que mide una muestra de las peticiones HTTP.
+
+    Las peticiones no muestreadas pasan directamente a la aplicación. En las
+    muestreadas se mide la latencia hasta el final de la respuesta, el SQL
+    ejecutado y los bytes enviados, y opcionalmente se añade la cabecera
+    Server-Timing con el tiempo de SQL y el de la aplicación.
+
+    Va por fuera de CompresionMiddleware para que la latencia incluya la
+    compresión, así que los bytes son los que salen por la red, comprimidos.
+    """
+
+    def __init__(self, app, muestreo: float = MUESTREO, server_timing: bool = SERVER_TIMING):
+        self.app = app
+        self.muestreo = muestreo
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.muestreo <= 0 or (
+            self.muestreo < 1 and random.random() >= self.muestreo
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        medicion = MedicionPeticion()
+        token = _medicion_actual.set(medicion)
+        inicio = time.perf_counter()
+        estado = 500
+        tamano = 0
+
+        async def enviar(mensaje):
+            nonlocal estado, tamano
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+                if self.server_timing:
+                    aplicacion = (time.perf_counter() - inicio) * 1000
+                    valor = (
+                        f'sql;dur={medicion.tiempo_sql * 1000:.2f};desc="{medicion.consultas} SQL", '
+                        f"app;dur={aplicacion:.2f}"
+                    )
+                    mensaje = {
+                        **mensaje,
+                        "headers": list(mensaje.get("headers", [])) + [(b"server-timing", valor.encode())]
+                    }
+            elif mensaje["type"] == "http.response.body":
+                tamano += len(mensaje.get("body", b""))
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _medicion_actual.reset(token)
+            ruta = getattr(scope.get("route"), "path", None) or RUTA_DESCONOCIDA
+            metricas.registrar(
+                ruta, scope["method"], estado, time.perf_counter() - inicio, medicion, tamano
+            )
@@ -0,0 +1,91 @@
+"""
+Cursores opacos para la paginación por clave (keyset) de los listados
+"""
+import base64
+import binascii
+import json
+from typing import Tuple
+
+
+def _codificar(datos: dict) -> str:
+    crudo = json.dumps(datos, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip("=")
+
+
+def _decodificar(cursor: str) -> dict:
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise ValueError("Cursor inválido")
+    if not isinstance(datos, dict):
+        raise ValueError("Cursor inválido")
+    return datos
+
+
+def _entero(valor) -> int:
+    if not isinstance(valor, int) or isinstance(valor, bool):
+        raise ValueError("Cursor inválido")
+    return valor
+
+
+def codificar_cursor(ultimo_id: int) -> str:
+    """
+    Genera el cursor que apunta justo después de `ultimo_id`.
+
+    Args:
+        ultimo_id: ID de la última fila de la página
+
+    Returns:
+        Cadena opaca apta para URLs
+    """
+    return _codificar({"id": ultimo_id})
+
+
+def decodificar_cursor(cursor: str) -> int:
+    """
+    Obtiene el ID contenido en un cursor generado por `codificar_cursor`.
+
+    Args:
+        cursor: Cursor recibido del cliente
+
+    Returns:
+        ID de la última fila de la página anterior
+
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    return _entero(_decodificar(cursor).get("id"))
+
+
+def codificar_cursor_busqueda(puntuacion: float, ultimo_id: int) -> str:
+    """
+    Genera el cursor de una búsqueda ordenada por (puntuación, id).
+
+    Args:
+        puntuacion: Puntuación de la última fila de la página
+        ultimo_id: ID de la última fila de la página
+
+    Returns:
+        Cadena opaca apta para URLs
+    """
+    return _codificar({"p": puntuacion, "id": ultimo_id})
+
+
+def decodificar_cursor_busqueda(cursor: str) -> Tuple[float, int]:
+    """
+    Obtiene la puntuación y el ID de un cursor generado por `codificar_cursor_busqueda`.
+
+    Args:
+        cursor: Cursor recibido del cliente
+
+    Returns:
+        Tupla (puntuación, ID) de la última fila de la página anterior
+
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    datos = _decodificar(cursor)
+    puntuacion = datos.get("p")
+    if not isinstance(puntuacion, (int, float)) or isinstance(puntuacion, bool):
+        raise ValueError("Cursor inválido")
+    return float(puntuacion), _entero(datos.get("id"))
@@ -0,0 +1,182 @@
+"""
+Caché LRU en memoria de los datos de las preguntas que usa la validación de respuestas
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.question import Question
+from app.services.coherencia import coherencia
+
+
+class RegistroPregunta(NamedTuple):
+    """Lo mínimo de una pregunta para validar respuestas, con las opciones ya decodificadas."""
+    id: int
+    opciones: Tuple[str, ...]
+    respuesta_correcta: int
+    categoria: str
+    dificultad: str
+    is_active: bool
+
+
+def _registro(fila) -> RegistroPregunta:
+    question_id, opciones, respuesta_correcta, categoria, dificultad, is_active = fila
+    return RegistroPregunta(
+        question_id, tuple(opciones), respuesta_correcta, categoria, dificultad, bool(is_active)
+    )
+
+
+_COLUMNAS = (
+    Question.id, Question.opciones, Question.respuesta_correcta,
+    Question.categoria, Question.dificultad, Question.is_active
+)
+
+
+class QuestionCache:
+    """
+    Caché acotada (LRU) de registros compactos de preguntas, indexada por ID.
+
+    Los routers la mantienen al día llamando a `registrar` después de confirmar
+    cada escritura sobre una pregunta; las escrituras de otros procesos se
+    detectan con `coherencia.revalidar`, que vacía la caché.
+
+    Las consultas de los fallos se hacen fuera del cerrojo; un contador de
+    generación evita guardar un registro leído antes de una escritura que ya
+    se reflejó en la caché.
+
+    La versión se consulta como mucho una vez cada CACHE_REVALIDACION_MS
+    (500 ms por defecto), así que los aciertos no tocan la base de datos y
+    los cambios de otros workers tardan hasta ese tiempo en verse. Con 0 se
+    consulta en cada lectura. Las consultas hechas aparecen como
+    `revalidaciones` en `GET /questions/cache/stats`.
+    """
+
+    def __init__(self, capacidad: int):
+        self.capacidad = capacidad
+        self._lock = threading.Lock()
+        self._registros: "OrderedDict[int, RegistroPregunta]" = OrderedDict()
+        self._generacion = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+
+    def _guardar(self, registro: RegistroPregunta):
+        """Inserta un registro expulsando los menos usados. Requiere el cerrojo."""
+        if self.capacidad <= 0:
+            return
+        self._registros[registro.id] = registro
+        self._registros.move_to_end(registro.id)
+        while len(self._registros) > self.capacidad:
+            self._registros.popitem(last=False)
+            self.expulsiones += 1
+
+    def obtener_varios(self, db: Session, ids: Iterable[int]) -> Dict[int, RegistroPregunta]:
+        """
+        Devuelve los registros de las preguntas pedidas, cargando los que falten
+        con una sola consulta.
+
+        Args:
+            db: Sesión de base de datos (para revalidar y cargar los fallos)
+            ids: IDs de las preguntas
+
+        Returns:
+            Dict de ID a registro. Las preguntas que no existen no aparecen.
+        """
+        coherencia.revalidar(db, "preguntas")
+        encontrados = {}
+        faltantes = []
+        with self._lock:
+            for question_id in set(ids):
+                registro = self._registros.get(question_id)
+                if registro is None:
+                    faltantes.append(question_id)
+                else:
+                    self._registros.move_to_end(question_id)
+                    encontrados[question_id] = registro
+            self.aciertos += len(encontrados)
+            self.fallos += len(faltantes)
+            generacion = self._generacion
+
+        if not faltantes:
+            return encontrados
+
+        cargados = [
+            _registro(fila)
+            for fila in db.execute(select(*_COLUMNAS).where(Question.id.in_(faltantes)))
+        ]
+        with self._lock:
+            for registro in cargados:
+                encontrados[registro.id] = registro
+                if self._generacion == generacion:
+                    self._guardar(registro)
+        return encontrados
+
+    def obtener(self, db: Session, question_id: int) -> Optional[RegistroPregunta]:
+        """
+        Devuelve el registro de una pregunta, o None si no existe.
+
+        Args:
+            db: Sesión de base de datos
+            question_id: ID de la pregunta
+        """
+        return self.obtener_varios(db, (question_id,)).get(question_id)
+
+    def registrar(self, pregunta: Question):
+        """
+        Refleja en la caché el estado actual de una pregunta (creada, actualizada
+        o desactivada). Si la pregunta no estaba en caché no se añade.
+
+        Args:
+            pregunta: Pregunta ya confirmada en la base de datos
+        """
+        with self._lock:
+            self._generacion += 1
+            if pregunta.id in self._registros:
+                self._registros[pregunta.id] = _registro(
+                    (pregunta.id, pregunta.opciones, pregunta.respuesta_correcta,
+                     pregunta.categoria, pregunta.dificultad, pregunta.is_active)
+                )
+
+    def descartar(self, question_id: int):
+        """
+        Quita una pregunta de la caché.
+
+        Args:
+            question_id: ID de la pregunta
+        """
+        with self._lock:
+            self._generacion += 1
+            self._registros.pop(question_id, None)
+
+    def invalidar(self):
+        """Vacía la caché por completo."""
+        with self._lock:
+            self._generacion += 1
+            self._registros.clear()
+
+    def estadisticas(self) -> dict:
+        """
+        Contadores de uso de la caché.
+
+        Returns:
+            Dict con capacidad, tamaño, aciertos, fallos, expulsiones y tasa de aciertos
+        """
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "capacidad": self.capacidad,
+                "tamano": len(self._registros),
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "expulsiones": self.expulsiones,
+                "tasa_aciertos": round(self.aciertos / consultas * 100, 2) if consultas else 0.0
+            }
+
+
+# Instancia compartida por toda la aplicación
+question_cache = QuestionCache(int(os.getenv("QUESTION_CACHE_SIZE", "10000")))
+coherencia.suscribir("preguntas", question_cache.invalidar)
@@ -0,0 +1,234 @@
+"""
+Importación en streaming de bancos de preguntas en formato NDJSON o array JSON
+"""
+import io
+import json
+from typing import BinaryIO, Callable, Iterator, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from app.schemas.question import QuestionCreate
+from app.services.coherencia import coherencia
+from app.services.duplicados import UMBRAL_SIMILITUD, InsercionPreguntas
+from app.services.question_sampler import question_sampler
+
+# Bytes leídos en cada lectura del archivo
+TAMANO_BLOQUE = 64 * 1024
+# Tamaño máximo de un elemento del array; evita leer el archivo entero si está mal formado
+MAX_ELEMENTO = 1024 * 1024
+# Errores y duplicados que se devuelven con detalle; el resto solo se cuentan
+MAX_ERRORES_DETALLADOS = 100
+
+
+def _elementos_array(texto: io.TextIOBase, buffer: str) -> Iterator[Tuple[int, object]]:
+    """Decodifica uno a uno los elementos de un array JSON sin cargarlo entero."""
+    decodificador = json.JSONDecoder()
+    # `buffer` empieza justo después del "[". `posicion` avanza sobre el buffer
+    # y solo se recorta al leer un bloque nuevo, para no copiarlo por elemento
+    posicion = 0
+    indice = 0
+    esperando_coma = False
+    while True:
+        while posicion < len(buffer) and buffer[posicion] in " \t\r\n":
+            posicion += 1
+        if posicion == len(buffer):
+            bloque = texto.read(TAMANO_BLOQUE)
+            if not bloque:
+                raise ValueError("Array JSON sin cerrar")
+            buffer, posicion = bloque, 0
+            continue
+
+        caracter = buffer[posicion]
+        if caracter == "]":
+            return
+        if esperando_coma:
+            if caracter != ",":
+                raise ValueError(f"Se esperaba ',' después del elemento {indice - 1}")
+            posicion += 1
+            esperando_coma = False
+            continue
+
+        try:
+            elemento, fin = decodificador.raw_decode(buffer, posicion)
+        except json.JSONDecodeError:
+            # El elemento puede estar partido entre dos bloques: leer más y reintentar
+            bloque = texto.read(TAMANO_BLOQUE)
+            if not bloque or len(buffer) - posicion > MAX_ELEMENTO:
+                raise ValueError(f"JSON mal formado en el elemento {indice}")
+            buffer, posicion = buffer[posicion:] + bloque, 0
+            continue
+
+        yield indice, elemento
+        indice += 1
+        esperando_coma = True
+        posicion = fin
+
+
+def leer_preguntas(archivo: BinaryIO) -> Iterator[Tuple[int, object]]:
+    """
+    Recorre las preguntas de un archivo sin cargarlo entero en memoria.
+
+    El formato se detecta por el primer carácter: "[" es un array JSON y
+    cualquier otra cosa se trata como NDJSON (un objeto por línea, las líneas
+    vacías se ignoran).
+
+    Args:
+        archivo: Archivo binario en UTF-8
+
+    Yields:
+        Tuplas (índice, elemento). En NDJSON una línea que no es JSON válido
+        se entrega como una excepción ValueError en lugar del elemento.
+
+    Raises:
+        ValueError: Si un array JSON está mal formado (no se puede continuar)
+    """
+    texto = io.TextIOWrapper(archivo, encoding="utf-8-sig")
+    inicio = texto.read(TAMANO_BLOQUE)
+    contenido = inicio.lstrip()
+    if contenido.startswith("["):
+        yield from _elementos_array(texto, contenido[1:])
+        return
+
+    # NDJSON: reconstruir el flujo de líneas a partir del bloque ya leído
+    indice = 0
+    pendiente = ""
+    bloque = inicio
+    while bloque:
+        lineas = (pendiente + bloque).split("\n")
+        pendiente = lineas.pop()
+        for linea in lineas:
+            if not linea.strip():
+                continue
+            try:
+                yield indice, json.loads(linea)
+            except json.JSONDecodeError as e:
+                yield indice, ValueError(f"JSON mal formado: {e.msg}")
+            indice += 1
+        bloque = texto.read(TAMANO_BLOQUE)
+    if pendiente.strip():
+        try:
+            yield indice, json.loads(pendiente)
+        except json.JSONDecodeError as e:
+            yield indice, ValueError(f"JSON mal formado: {e.msg}")
+
+
+def _detalle_validacion(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(parte) for parte in detalle['loc'])}: {detalle['msg']}"
+        for detalle in error.errors()
+    )
+
+
+def importar_preguntas(
+    db: Session,
+    archivo: BinaryIO,
+    tamano_lote: int = 1000,
+    al_progresar: Optional[Callable[[dict], None]] = None,
+    duplicados: str = "permitir",
+    umbral: float = UMBRAL_SIMILITUD
+) -> dict:
+    """
+    Importa preguntas desde un archivo NDJSON o array JSON por lotes.
+
+    Cada elemento se valida con QuestionCreate. Los válidos se insertan con un
+    único INSERT ... RETURNING por lote y cada lote se confirma por separado,
+    así que la memoria usada no depende del tamaño del archivo y un error en
+    un elemento no descarta el resto.
+
+    Args:
+        db: Sesión de base de datos
+        archivo: Archivo binario en UTF-8
+        tamano_lote: Preguntas por lote
+        al_progresar: Función opcional llamada con el resumen de cada lote
+        duplicados: Política ante preguntas parecidas a otras del banco o del
+            propio archivo (permitir, rechazar, marcar o fusionar)
+        umbral: Similitud mínima para considerar duplicada una pregunta
+
+    Returns:
+        Dict con el total de insertadas, el total de errores, el detalle de
+        los primeros errores y duplicados, y el resumen de cada lote
+
+    Raises:
+        ValueError: Si el archivo es un array JSON mal formado. Los lotes
+            anteriores al error quedan confirmados y el mensaje indica cuántas
+            preguntas se importaron.
+    """
+    resumen = {
+        "insertadas": 0, "total_errores": 0, "errores": [],
+        "total_duplicados": 0, "duplicados": [], "lotes": []
+    }
+    insercion = InsercionPreguntas(db, duplicados, umbral)
+    procesados_lote = 0
+    errores_lote = 0
+    duplicados_lote = 0
+
+    def confirmar_lote():
+        nonlocal procesados_lote, errores_lote, duplicados_lote
+        ids = [fila.id for fila in insercion.vaciar()]
+        if ids or insercion.modificadas:
+            coherencia.incrementar(db, "preguntas")
+            db.commit()
+            insercion.modificadas = 0
+        lote = {
+            "lote": len(resumen["lotes"]) + 1,
+            "insertadas": len(ids),
+            "errores": errores_lote,
+            "duplicados": duplicados_lote,
+            "primer_id": ids[0] if ids else None,
+            "ultimo_id": ids[-1] if ids else None
+        }
+        resumen["lotes"].append(lote)
+        resumen["insertadas"] += len(ids)
+        if al_progresar:
+            al_progresar(lote)
+        procesados_lote = 0
+        errores_lote = 0
+        duplicados_lote = 0
+
+    try:
+        for indice, elemento in leer_preguntas(archivo):
+            procesados_lote += 1
+            detalle = None
+            if isinstance(elemento, ValueError):
+                detalle = str(elemento)
+            elif not isinstance(elemento, dict):
+                detalle = "Cada pregunta debe ser un objeto JSON"
+            else:
+                try:
+                    datos = QuestionCreate(**elemento).model_dump()
+                except ValidationError as e:
+                    detalle = _detalle_validacion(e)
+                else:
+                    duplicado = insercion.agregar(datos)
+                    if duplicado is not None:
+                        duplicados_lote += 1
+                        resumen["total_duplicados"] += 1
+                        if len(resumen["duplicados"]) < MAX_ERRORES_DETALLADOS:
+                            resumen["duplicados"].append({
+                                "indice": indice,
+                                "duplicado_de": duplicado.question_id,
+                                "similitud": round(duplicado.similitud, 4)
+                            })
+
+            if detalle is not None:
+                errores_lote += 1
+                resumen["total_errores"] += 1
+                if len(resumen["errores"]) < MAX_ERRORES_DETALLADOS:
+                    resumen["errores"].append({"indice": indice, "detalle": detalle})
+
+            if procesados_lote >= tamano_lote:
+                confirmar_lote()
+
+        if procesados_lote:
+            confirmar_lote()
+    except ValueError as e:
+        raise ValueError(
+            f"{e}. Se confirmaron {resumen['insertadas']} preguntas antes del error"
+        ) from e
+    finally:
+        # El índice de muestreo se recarga con las preguntas nuevas en el próximo uso
+        if resumen["insertadas"]:
+            question_sampler.invalidar()
+
+    return resumen
@@ -0,0 +1,172 @@
+"""
+Índice en memoria de preguntas activas para el muestreo aleatorio
+"""
+import random
+import threading
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.question import Question
+from app.services.coherencia import coherencia
+
+
+Clave = Tuple[str, str]
+
+
+class QuestionSampler:
+    """
+    Mantiene los IDs de las preguntas activas agrupados por (categoria, dificultad)
+    en arrays compactos, de forma que elegir `limit` preguntas al azar cueste
+    O(limit) en lugar de recorrer toda la tabla.
+
+    El índice se carga de forma perezosa la primera vez que se usa y se mantiene
+    al día con los métodos `registrar` y `descartar`, que los routers llaman
+    después de confirmar cada escritura. Las escrituras de otros procesos
+    vacían el índice a través de `coherencia`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cargado = False
+        # Cambia con cada registrar/descartar/invalidar: una carga que empezó
+        # antes de un cambio no puede instalar un índice que no lo incluye
+        self._generacion = 0
+        self._grupos: Dict[Clave, array] = {}
+        # Posición de cada ID dentro de su grupo, para borrar en O(1)
+        self._posiciones: Dict[int, Tuple[Clave, int]] = {}
+
+    def _cargar(self, db: Session):
+        """Construye el índice leyendo solo (id, categoria, dificultad) de las preguntas activas."""
+        # La consulta se hace fuera del cerrojo: con el motor asíncrono cede el
+        # control al event loop y otra petición podría intentar tomarlo. Si
+        # mientras tanto se registra o descarta alguna pregunta, la lectura
+        # puede no incluir el cambio y se repite
+        while True:
+            with self._lock:
+                if self._cargado:
+                    return
+                generacion = self._generacion
+
+            filas = db.query(Question.id, Question.categoria, Question.dificultad).filter(
+                Question.is_active == True
+            ).all()
+
+            with self._lock:
+                if self._cargado:
+                    return
+                if self._generacion != generacion:
+                    continue
+                self._grupos = {}
+                self._posiciones = {}
+                for question_id, categoria, dificultad in filas:
+                    self._agregar((categoria, dificultad), question_id)
+                self._cargado = True
+                return
+
+    def _agregar(self, clave: Clave, question_id: int):
+        grupo = self._grupos.get(clave)
+        if grupo is None:
+            grupo = self._grupos[clave] = array("q")
+        self._posiciones[question_id] = (clave, len(grupo))
+        grupo.append(question_id)
+
+    def _quitar(self, question_id: int):
+        ubicacion = self._posiciones.pop(question_id, None)
+        if ubicacion is None:
+            return
+        clave, posicion = ubicacion
+        grupo = self._grupos[clave]
+        # Intercambiar con el último elemento para borrar sin desplazar el array
+        ultimo = grupo.pop()
+        if ultimo != question_id:
+            grupo[posicion] = ultimo
+            self._posiciones[ultimo] = (clave, posicion)
+        if not grupo:
+            del self._grupos[clave]
+
+    def registrar(self, pregunta: Question):
+        """
+        Refleja en el índice el estado actual de una pregunta (creada o actualizada).
+
+        Args:
+            pregunta: Pregunta ya confirmada en la base de datos
+        """
+        with self._lock:
+            self._generacion += 1
+            if not self._cargado:
+                return
+            self._quitar(pregunta.id)
+            if pregunta.is_active:
+                self._agregar((pregunta.categoria, pregunta.dificultad), pregunta.id)
+
+    def descartar(self, question_id: int):
+        """
+        Quita una pregunta del índice (por ejemplo, tras un soft delete).
+
+        Args:
+            question_id: ID de la pregunta
+        """
+        with self._lock:
+            self._generacion += 1
+            if self._cargado:
+                self._quitar(question_id)
+
+    def invalidar(self):
+        """Fuerza la recarga completa del índice en el próximo uso."""
+        with self._lock:
+            self._generacion += 1
+            self._cargado = False
+            self._grupos = {}
+            self._posiciones = {}
+
+    def muestrear(
+        self,
+        db: Session,
+        limit: int,
+        categoria: Optional[str] = None,
+        dificultad: Optional[str] = None
+    ) -> Tuple[List[int], int]:
+        """
+        Elige IDs de preguntas activas al azar, sin repetición.
+
+        Args:
+            db: Sesión de base de datos (para revalidar y, si hace falta, cargar el índice)
+            limit: Número de IDs a elegir
+            categoria: Filtrar por categoría (opcional)
+            dificultad: Filtrar por dificultad (opcional)
+
+        Returns:
+            Tupla (ids elegidos, total de preguntas disponibles). Si no hay
+            suficientes preguntas la lista de ids está vacía.
+        """
+        coherencia.revalidar(db, "preguntas")
+        if not self._cargado:
+            self._cargar(db)
+
+        with self._lock:
+            grupos = [
+                grupo for (cat, dif), grupo in self._grupos.items()
+                if (categoria is None or cat == categoria)
+                and (dificultad is None or dif == dificultad)
+            ]
+            disponibles = sum(len(grupo) for grupo in grupos)
+            if disponibles < limit:
+                return [], disponibles
+
+            # Tratar los grupos como un único array concatenado: random.sample
+            # sobre un range elige `limit` posiciones sin materializarlo
+            elegidos = []
+            for posicion in random.sample(range(disponibles), limit):
+                for grupo in grupos:
+                    if posicion < len(grupo):
+                        elegidos.append(grupo[posicion])
+                        break
+                    posicion -= len(grupo)
+            return elegidos, disponibles
+
+
+# Instancia compartida por toda la aplicación
+question_sampler = QuestionSampler()
+coherencia.suscribir("preguntas", question_sampler.invalidar)
@@ -1,12 +1,17 @@
 """
 Servicio de lógica de negocio para quiz
 """
+from sqlalchemy import case, delete, func, insert, or_, select, update
 from sqlalchemy.orm import Session
 from app.models.question import Question
 from app.models.quiz_session import QuizSession
 from app.models.answer import Answer
+from app.models.estadistica import EstadisticaCategoria, EstadisticaGlobal
+from app.services.coherencia import coherencia
+from app.services.question_cache import question_cache
+from app.services.question_sampler import question_sampler
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
 
 class QuizService:
@@ -31,7 +36,7 @@ class QuizService:
         Raises:
             ValueError: Si la pregunta no existe o la respuesta está fuera de rango
         """
-        pregunta = db.query(Question).filter(Question.id == question_id).first()
+        pregunta = question_cache.obtener(db, question_id)
         if not pregunta:
             raise ValueError(f"La pregunta con ID {question_id} no existe")
 
@@ -43,6 +48,58 @@ class QuizService:
 
         return respuesta_seleccionada == pregunta.respuesta_correcta
 
+    @staticmethod
+    def obtener_preguntas_aleatorias(
+        db: Session,
+        limit: int,
+        categoria: Optional[str] = None,
+        dificultad: Optional[str] = None,
+        entidades: Optional[list] = None
+    ) -> list:
+        """
+        Elige preguntas activas al azar con el índice en memoria y las carga
+        con una sola consulta.
+        
+        Args:
+            db: Sesión de base de datos
+            limit: Número de preguntas
+            categoria: Filtrar por categoría (opcional)
+            dificultad: Filtrar por dificultad (opcional)
+            entidades: Qué consultar de cada pregunta (por defecto la entidad
+                Question; también pueden ser columnas)
+            
+        Returns:
+            list: Preguntas en el orden aleatorio elegido
+            
+        Raises:
+            ValueError: Si no hay suficientes preguntas disponibles
+        """
+        if dificultad:
+            dificultad = dificultad.lower()
+        
+        # Dos intentos: si el índice en memoria quedó desfasado respecto a la base
+        # de datos (p. ej. cambios hechos por otro proceso) se recarga y se repite
+        for _ in range(2):
+            ids, disponibles = question_sampler.muestrear(db, limit, categoria, dificultad)
+            if not ids:
+                raise ValueError(f"Solo hay {disponibles} preguntas disponibles, se requieren {limit}")
+            
+            preguntas = db.query(*(entidades or [Question])).filter(
+                Question.id.in_(ids),
+                Question.is_active == True
+            ).all()
+            if len(preguntas) == limit:
+                break
+            question_sampler.invalidar()
+        else:
+            # Ni recargando el índice hay `limit` preguntas activas: se desactivan
+            # más rápido de lo que se muestrean
+            raise ValueError(f"Solo hay {len(preguntas)} preguntas disponibles, se requieren {limit}")
+        
+        # Respetar el orden aleatorio elegido por el índice
+        por_id = {pregunta.id: pregunta for pregunta in preguntas}
+        return [por_id[question_id] for question_id in ids]
+
     @staticmethod
     def verificar_respuesta_duplicada(db: Session, quiz_session_id: int, question_id: int) -> bool:
         """
@@ -63,44 +120,220 @@ class QuizService:
         return respuesta_existente is not None
 
     @staticmethod
-    def calcular_puntuacion_sesion(db: Session, quiz_session_id: int) -> Dict[str, Any]:
+    def acumular_en_sesion(
+        db: Session,
+        quiz_session_id: int,
+        respondidas: int = 0,
+        correctas: int = 0,
+        tiempo: int = 0,
+        con_tiempo: int = 0
+    ):
         """
-        Calcula la puntuación y estadísticas de una sesión de quiz.
+        Suma incrementos a los contadores de una sesión sin confirmar la transacción.
+        
+        Se llama en la misma transacción que inserta o modifica respuestas, de
+        modo que los contadores nunca se desincronizan de la tabla `answers`.
         
         Args:
             db: Sesión de base de datos
             quiz_session_id: ID de la sesión
+            respondidas: Incremento de preguntas respondidas
+            correctas: Incremento de respuestas correctas
+            tiempo: Incremento de la suma de tiempos de respuesta
+            con_tiempo: Incremento de respuestas con tiempo registrado
             
         Returns:
-            Dict con puntuación, correctas, respondidas, etc.
-            
-        Raises:
-            ValueError: Si la sesión no existe
+            Fila con el `estado` y las `preguntas_asignadas` de la sesión, o
+            None si la sesión no existe
         """
-        sesion = db.query(QuizSession).filter(QuizSession.id == quiz_session_id).first()
-        if not sesion:
-            raise ValueError(f"La sesión con ID {quiz_session_id} no existe")
+        coherencia.incrementar(db, "estadisticas")
+        return db.execute(
+            update(QuizSession)
+            .where(QuizSession.id == quiz_session_id)
+            .values(
+                preguntas_respondidas=QuizSession.preguntas_respondidas + respondidas,
+                preguntas_correctas=QuizSession.preguntas_correctas + correctas,
+                puntuacion_total=QuizSession.puntuacion_total + correctas * 10,
+                tiempo_respuestas_total=QuizSession.tiempo_respuestas_total + tiempo,
+                respuestas_con_tiempo=QuizSession.respuestas_con_tiempo + con_tiempo
+            )
+            .returning(QuizSession.estado, QuizSession.preguntas_asignadas)
+            .execution_options(synchronize_session=False)
+        ).first()
+
+    @staticmethod
+    def acumular_estadisticas(
+        db: Session,
+        por_categoria: Dict[str, Tuple[int, int]],
+        sesion_completada: bool = False
+    ):
+        """
+        Suma incrementos a los agregados de estadísticas sin confirmar la transacción.
+        
+        Se llama después de escribir las respuestas y los contadores de la
+        sesión: si falta la fila global, se reconstruye desde las tablas en la
+        misma transacción (ya con esas escrituras) en lugar de perder el
+        incremento.
+        
+        Args:
+            db: Sesión de base de datos
+            por_categoria: Incrementos (respuestas, correctas) por categoría
+            sesion_completada: Si las respuestas pertenecen a una sesión ya completada
+        """
+        total = 0
+        correctas = 0
+        for categoria, (respuestas_categoria, correctas_categoria) in por_categoria.items():
+            if not respuestas_categoria and not correctas_categoria:
+                continue
+            total += respuestas_categoria
+            correctas += correctas_categoria
+            QuizService._acumular_en_categoria(db, categoria, respuestas_categoria, correctas_categoria)
+        
+        if not total and not correctas:
+            return
+        
+        coherencia.incrementar(db, "estadisticas")
+        valores = {
+            "total_respuestas": EstadisticaGlobal.total_respuestas + total,
+            "respuestas_correctas": EstadisticaGlobal.respuestas_correctas + correctas
+        }
+        if sesion_completada:
+            valores["respondidas_completadas"] = EstadisticaGlobal.respondidas_completadas + total
+            valores["correctas_completadas"] = EstadisticaGlobal.correctas_completadas + correctas
+        actualizada = db.execute(
+            update(EstadisticaGlobal)
+            .where(EstadisticaGlobal.id == 1)
+            .values(**valores)
+            .execution_options(synchronize_session=False)
+        )
+        if actualizada.rowcount == 0:
+            QuizService._reconstruir_global(db)
+
+    @staticmethod
+    def descontar_sesion(db: Session, sesion: QuizSession):
+        """
+        Resta de los agregados las respuestas de una sesión que se va a eliminar,
+        sin confirmar la transacción.
+        
+        Args:
+            db: Sesión de base de datos
+            sesion: Sesión de quiz a eliminar
+        """
+        por_categoria = {
+            categoria: (-total, -correctas)
+            for categoria, total, correctas in db.execute(
+                select(
+                    Question.categoria,
+                    func.count(),
+                    func.sum(case((Answer.es_correcta == True, 1), else_=0))
+                )
+                .join(Question, Question.id == Answer.question_id)
+                .where(Answer.quiz_session_id == sesion.id)
+                .group_by(Question.categoria)
+            )
+        }
+        completada = sesion.estado == "completado"
+        coherencia.incrementar(db, "estadisticas")
+        QuizService.acumular_estadisticas(db, por_categoria, sesion_completada=completada)
+        
+        if completada:
+            db.execute(
+                update(EstadisticaGlobal)
+                .where(EstadisticaGlobal.id == 1)
+                .values(sesiones_completadas=EstadisticaGlobal.sesiones_completadas - 1)
+                .execution_options(synchronize_session=False)
+            )
 
-        respuestas = db.query(Answer).filter(Answer.quiz_session_id == quiz_session_id).all()
+    @staticmethod
+    def mover_respuestas_de_categoria(db: Session, question_id: int, anterior: str, nueva: str):
+        """
+        Traslada en los agregados las respuestas de una pregunta que cambia de
+        categoría, sin confirmar la transacción.
         
-        total_respondidas = len(respuestas)
-        total_correctas = sum(1 for r in respuestas if r.es_correcta)
+        Args:
+            db: Sesión de base de datos
+            question_id: ID de la pregunta
+            anterior: Categoría anterior
+            nueva: Categoría nueva
+        """
+        total, correctas = db.execute(
+            select(
+                func.count(),
+                func.coalesce(func.sum(case((Answer.es_correcta == True, 1), else_=0)), 0)
+            ).where(Answer.question_id == question_id)
+        ).one()
+        if not total:
+            return
         
-        # Calcular puntuación: 10 puntos por respuesta correcta
-        puntuacion = total_correctas * 10
+        # Los totales globales no cambian, solo el reparto entre categorías
+        coherencia.incrementar(db, "estadisticas")
+        QuizService._acumular_en_categoria(db, anterior, -total, -correctas)
+        QuizService._acumular_en_categoria(db, nueva, total, correctas)
+
+    @staticmethod
+    def _acumular_en_categoria(db: Session, categoria: str, total: int, correctas: int):
+        """Suma incrementos a la fila de una categoría, creándola si no existe."""
+        actualizada = db.execute(
+            update(EstadisticaCategoria)
+            .where(EstadisticaCategoria.categoria == categoria)
+            .values(
+                total_respuestas=EstadisticaCategoria.total_respuestas + total,
+                respuestas_correctas=EstadisticaCategoria.respuestas_correctas + correctas
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if actualizada.rowcount == 0:
+            db.execute(insert(EstadisticaCategoria).values(
+                categoria=categoria,
+                total_respuestas=total,
+                respuestas_correctas=correctas
+            ))
+
+    @staticmethod
+    def resumen_sesion(sesion: QuizSession) -> Dict[str, Any]:
+        """
+        Construye las estadísticas de una sesión a partir de sus contadores.
         
-        # Calcular tiempo promedio por respuesta
-        tiempos = [r.tiempo_respuesta_segundos for r in respuestas if r.tiempo_respuesta_segundos]
-        tiempo_promedio = sum(tiempos) / len(tiempos) if tiempos else 0
+        Args:
+            sesion: Sesión de quiz
+            
+        Returns:
+            Dict con puntuación, correctas, respondidas, etc.
+        """
+        total_respondidas = sesion.preguntas_respondidas or 0
+        total_correctas = sesion.preguntas_correctas or 0
+        con_tiempo = sesion.respuestas_con_tiempo or 0
+        tiempo_promedio = (sesion.tiempo_respuestas_total or 0) / con_tiempo if con_tiempo else 0
         
         return {
-            "puntuacion_total": puntuacion,
+            "puntuacion_total": sesion.puntuacion_total or 0,
             "preguntas_respondidas": total_respondidas,
             "preguntas_correctas": total_correctas,
             "porcentaje_aciertos": (total_correctas / total_respondidas * 100) if total_respondidas > 0 else 0,
             "tiempo_promedio_por_pregunta": round(tiempo_promedio, 2)
         }
 
+    @staticmethod
+    def calcular_puntuacion_sesion(db: Session, quiz_session_id: int) -> Dict[str, Any]:
+        """
+        Calcula la puntuación y estadísticas de una sesión de quiz.
+        
+        Args:
+            db: Sesión de base de datos
+            quiz_session_id: ID de la sesión
+            
+        Returns:
+            Dict con puntuación, correctas, respondidas, etc.
+            
+        Raises:
+            ValueError: Si la sesión no existe
+        """
+        sesion = db.query(QuizSession).filter(QuizSession.id == quiz_session_id).first()
+        if not sesion:
+            raise ValueError(f"La sesión con ID {quiz_session_id} no existe")
+
+        return QuizService.resumen_sesion(sesion)
+
     @staticmethod
     def completar_sesion(db: Session, quiz_session_id: int, tiempo_total_segundos: int = None) -> QuizSession:
         """
@@ -118,26 +351,185 @@ class QuizService:
         if not sesion:
             raise ValueError(f"La sesión con ID {quiz_session_id} no existe")
 
-        # Calcular puntuación
-        estadisticas = QuizService.calcular_puntuacion_sesion(db, quiz_session_id)
+        QuizService.marcar_completada(db, sesion, tiempo_total_segundos)
+        
+        db.commit()
+        db.refresh(sesion)
+        
+        return sesion
+
+    @staticmethod
+    def marcar_completada(db: Session, sesion: QuizSession, tiempo_total_segundos: int = None):
+        """
+        Marca una sesión como completada sin confirmar la transacción, para
+        poder combinarlo con otras escrituras.
+        
+        La puntuación ya está al día gracias a los contadores incrementales.
+        
+        Args:
+            db: Sesión de base de datos
+            sesion: Sesión de quiz a completar
+            tiempo_total_segundos: Tiempo total opcional
+        """
+        coherencia.incrementar(db, "estadisticas")
+        if sesion.estado != "completado":
+            # Los contadores se leen en SQL porque pueden haber cambiado en esta
+            # misma transacción sin reflejarse en el objeto `sesion`
+            respondidas = select(QuizSession.preguntas_respondidas).where(
+                QuizSession.id == sesion.id
+            ).scalar_subquery()
+            correctas = select(QuizSession.preguntas_correctas).where(
+                QuizSession.id == sesion.id
+            ).scalar_subquery()
+            actualizada = db.execute(
+                update(EstadisticaGlobal)
+                .where(EstadisticaGlobal.id == 1)
+                .values(
+                    sesiones_completadas=EstadisticaGlobal.sesiones_completadas + 1,
+                    respondidas_completadas=EstadisticaGlobal.respondidas_completadas + respondidas,
+                    correctas_completadas=EstadisticaGlobal.correctas_completadas + correctas
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if actualizada.rowcount == 0:
+                # Sin fila global: reconstruirla contando ya esta sesión como completada
+                sesion.estado = "completado"
+                db.flush()
+                QuizService._reconstruir_global(db)
         
-        # Actualizar sesión
-        sesion.puntuacion_total = estadisticas["puntuacion_total"]
-        sesion.preguntas_respondidas = estadisticas["preguntas_respondidas"]
-        sesion.preguntas_correctas = estadisticas["preguntas_correctas"]
         sesion.estado = "completado"
         sesion.fecha_fin = datetime.utcnow()
         sesion.tiempo_total_segundos = tiempo_total_segundos
+
+    @staticmethod
+    def reconstruir_contadores_sesiones(db: Session) -> int:
+        """
+        Recalcula desde la tabla `answers` los contadores de las sesiones que
+        no coinciden con sus respuestas.
+        
+        Args:
+            db: Sesión de base de datos
+            
+        Returns:
+            int: Número de sesiones corregidas
+        """
+        agregados = select(
+            Answer.quiz_session_id.label("quiz_session_id"),
+            func.count().label("respondidas"),
+            func.sum(case((Answer.es_correcta == True, 1), else_=0)).label("correctas"),
+            func.coalesce(func.sum(Answer.tiempo_respuesta_segundos), 0).label("tiempo"),
+            func.sum(case((Answer.tiempo_respuesta_segundos > 0, 1), else_=0)).label("con_tiempo")
+        ).group_by(Answer.quiz_session_id).subquery()
+        
+        respondidas = func.coalesce(agregados.c.respondidas, 0)
+        correctas = func.coalesce(agregados.c.correctas, 0)
+        tiempo = func.coalesce(agregados.c.tiempo, 0)
+        con_tiempo = func.coalesce(agregados.c.con_tiempo, 0)
+        
+        inconsistentes = db.execute(
+            select(QuizSession.id, respondidas, correctas, tiempo, con_tiempo)
+            .outerjoin(agregados, agregados.c.quiz_session_id == QuizSession.id)
+            .where(or_(
+                QuizSession.preguntas_respondidas != respondidas,
+                QuizSession.preguntas_correctas != correctas,
+                QuizSession.puntuacion_total != correctas * 10,
+                QuizSession.tiempo_respuestas_total != tiempo,
+                QuizSession.respuestas_con_tiempo != con_tiempo
+            ))
+        ).all()
         
+        if inconsistentes:
+            db.execute(
+                update(QuizSession),
+                [
+                    {
+                        "id": session_id,
+                        "preguntas_respondidas": total,
+                        "preguntas_correctas": aciertos,
+                        "puntuacion_total": aciertos * 10,
+                        "tiempo_respuestas_total": segundos,
+                        "respuestas_con_tiempo": con_segundos
+                    }
+                    for session_id, total, aciertos, segundos, con_segundos in inconsistentes
+                ]
+            )
+            coherencia.incrementar(db, "estadisticas")
         db.commit()
-        db.refresh(sesion)
         
-        return sesion
+        return len(inconsistentes)
+
+    @staticmethod
+    def reconstruir_estadisticas(db: Session):
+        """
+        Recalcula por completo los agregados de estadísticas desde las tablas
+        de respuestas y sesiones. Pensado para backfills y reparaciones.
+        
+        Args:
+            db: Sesión de base de datos
+        """
+        correcta = case((Answer.es_correcta == True, 1), else_=0)
+        
+        db.execute(delete(EstadisticaCategoria))
+        db.execute(
+            insert(EstadisticaCategoria).from_select(
+                ["categoria", "total_respuestas", "respuestas_correctas"],
+                select(Question.categoria, func.count(), func.sum(correcta))
+                .join(Answer, Answer.question_id == Question.id)
+                .group_by(Question.categoria)
+            )
+        )
+        
+        QuizService._reconstruir_global(db)
+        coherencia.incrementar(db, "estadisticas")
+        db.commit()
+
+    @staticmethod
+    def _reconstruir_global(db: Session):
+        """
+        Recalcula la fila de EstadisticaGlobal desde las respuestas y las
+        sesiones, sin confirmar la transacción.
+        
+        Args:
+            db: Sesión de base de datos
+        """
+        correcta = case((Answer.es_correcta == True, 1), else_=0)
+        total_respuestas, respuestas_correctas = db.execute(
+            select(func.count(), func.coalesce(func.sum(correcta), 0)).select_from(Answer)
+        ).one()
+        sesiones, respondidas, correctas = db.execute(
+            select(
+                func.count(),
+                func.coalesce(func.sum(QuizSession.preguntas_respondidas), 0),
+                func.coalesce(func.sum(QuizSession.preguntas_correctas), 0)
+            ).where(QuizSession.estado == "completado")
+        ).one()
+        
+        db.execute(delete(EstadisticaGlobal))
+        db.execute(insert(EstadisticaGlobal).values(
+            id=1,
+            total_respuestas=total_respuestas,
+            respuestas_correctas=respuestas_correctas,
+            sesiones_completadas=sesiones,
+            respondidas_completadas=respondidas,
+            correctas_completadas=correctas
+        ))
+
+    @staticmethod
+    def asegurar_estadisticas(db: Session):
+        """
+        Reconstruye los agregados si todavía no existen (base de datos nueva o
+        creada con una versión anterior).
+        
+        Args:
+            db: Sesión de base de datos
+        """
+        if db.get(EstadisticaGlobal, 1) is None:
+            QuizService.reconstruir_estadisticas(db)
 
     @staticmethod
     def obtener_estadisticas_globales(db: Session) -> Dict[str, Any]:
         """
-        Obtiene estadísticas globales del sistema.
+        Obtiene estadísticas globales del sistema a partir de los agregados.
         
         Args:
             db: Sesión de base de datos
@@ -148,45 +540,28 @@ class QuizService:
         # Total de preguntas activas
         total_preguntas_activas = db.query(Question).filter(Question.is_active == True).count()
         
-        # Total de sesiones completadas
-        sesiones_completadas = db.query(QuizSession).filter(
-            QuizSession.estado == "completado"
-        ).all()
-        total_sesiones_completadas = len(sesiones_completadas)
+        global_ = db.get(EstadisticaGlobal, 1) or EstadisticaGlobal(
+            sesiones_completadas=0, respondidas_completadas=0, correctas_completadas=0
+        )
         
         # Promedio de aciertos general
-        total_respuestas_correctas = 0
-        total_respuestas = 0
-        for sesion in sesiones_completadas:
-            total_respuestas_correctas += sesion.preguntas_correctas
-            total_respuestas += sesion.preguntas_respondidas
-        
+        total_respuestas = global_.respondidas_completadas
+        total_respuestas_correctas = global_.correctas_completadas
         promedio_aciertos = (total_respuestas_correctas / total_respuestas * 100) if total_respuestas > 0 else 0
         
         # Categorías más difíciles (mayor tasa de error)
-        respuestas_por_categoria = db.query(
-            Question.categoria,
-            Answer.es_correcta
-        ).join(
-            Answer, Answer.question_id == Question.id
-        ).all()
-        
-        categorias_dificultad = {}
-        for categoria, es_correcta in respuestas_por_categoria:
-            if categoria not in categorias_dificultad:
-                categorias_dificultad[categoria] = {"correctas": 0, "total": 0}
-            categorias_dificultad[categoria]["total"] += 1
-            if es_correcta:
-                categorias_dificultad[categoria]["correctas"] += 1
+        categorias = db.query(EstadisticaCategoria).filter(
+            EstadisticaCategoria.total_respuestas > 0
+        ).order_by(EstadisticaCategoria.categoria).all()
         
         categorias_ordenadas = sorted(
             [
                 {
-                    "categoria": cat,
-                    "tasa_aciertos": (stats["correctas"] / stats["total"] * 100) if stats["total"] > 0 else 0,
-                    "tasa_error": (100 - (stats["correctas"] / stats["total"] * 100)) if stats["total"] > 0 else 0
+                    "categoria": stats.categoria,
+                    "tasa_aciertos": stats.respuestas_correctas / stats.total_respuestas * 100,
+                    "tasa_error": 100 - (stats.respuestas_correctas / stats.total_respuestas * 100)
                 }
-                for cat, stats in categorias_dificultad.items()
+                for stats in categorias
             ],
             key=lambda x: x["tasa_error"],
             reverse=True
@@ -194,92 +569,127 @@ class QuizService:
         
         return {
             "total_preguntas_activas": total_preguntas_activas,
-            "total_sesiones_completadas": total_sesiones_completadas,
+            "total_sesiones_completadas": global_.sesiones_completadas,
             "promedio_aciertos_general": round(promedio_aciertos, 2),
             "categorias_ordenadas_por_dificultad": categorias_ordenadas[:5]  # Top 5
         }
 
     @staticmethod
-    def obtener_preguntas_difíciles(db: Session, limit: int = 10) -> List[Dict[str, Any]]:
+    def obtener_preguntas_difíciles(
+        db: Session,
+        limit: int = 10,
+        min_respondidas: int = 1,
+        categoria: Optional[str] = None,
+        dificultad: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
         """
         Obtiene las preguntas con mayor tasa de error.
         
+        La agregación, el orden y el límite se resuelven en la base de datos
+        en una única consulta unida a `questions`.
+        
         Args:
             db: Sesión de base de datos
             limit: Límite de resultados
+            min_respondidas: Mínimo de respuestas para incluir una pregunta
+            categoria: Filtrar por categoría (opcional)
+            dificultad: Filtrar por dificultad (opcional)
             
         Returns:
             Lista de preguntas ordenadas por tasa de error
         """
-        respuestas = db.query(
-            Answer.question_id,
-            Answer.es_correcta
-        ).all()
+        total = func.count(Answer.id)
+        correctas = func.sum(case((Answer.es_correcta == True, 1), else_=0))
+        
+        consulta = select(
+            Question.id,
+            Question.pregunta,
+            Question.categoria,
+            Question.dificultad,
+            total.label("respondidas"),
+            correctas.label("correctas")
+        ).join(Answer, Answer.question_id == Question.id)
         
-        estadisticas_preguntas = {}
-        for question_id, es_correcta in respuestas:
-            if question_id not in estadisticas_preguntas:
-                estadisticas_preguntas[question_id] = {"correctas": 0, "total": 0}
-            estadisticas_preguntas[question_id]["total"] += 1
-            if es_correcta:
-                estadisticas_preguntas[question_id]["correctas"] += 1
+        if categoria:
+            consulta = consulta.where(Question.categoria == categoria)
+        if dificultad:
+            consulta = consulta.where(Question.dificultad == dificultad.lower())
+        
+        consulta = (
+            consulta.group_by(Question.id)
+            .having(total >= min_respondidas)
+            .order_by(((total - correctas) * 1.0 / total).desc(), Question.id)
+            .limit(limit)
+        )
         
-        # Obtener información de las preguntas
         resultado = []
-        for question_id, stats in estadisticas_preguntas.items():
-            pregunta = db.query(Question).filter(Question.id == question_id).first()
-            if pregunta:
-                tasa_error = 100 - (stats["correctas"] / stats["total"] * 100)
-                resultado.append({
-                    "id": question_id,
-                    "pregunta": pregunta.pregunta,
-                    "categoria": pregunta.categoria,
-                    "dificultad": pregunta.dificultad,
-                    "respondidas": stats["total"],
-                    "correctas": stats["correctas"],
-                    "incorrectas": stats["total"] - stats["correctas"],
-                    "tasa_aciertos": round(stats["correctas"] / stats["total"] * 100, 2),
-                    "tasa_error": round(tasa_error, 2)
-                })
-        
-        # Ordenar por tasa de error descendente
-        resultado.sort(key=lambda x: x["tasa_error"], reverse=True)
-        
-        return resultado[:limit]
+        for fila in db.execute(consulta):
+            tasa_aciertos = fila.correctas / fila.respondidas * 100
+            resultado.append({
+                "id": fila.id,
+                "pregunta": fila.pregunta,
+                "categoria": fila.categoria,
+                "dificultad": fila.dificultad,
+                "respondidas": fila.respondidas,
+                "correctas": fila.correctas,
+                "incorrectas": fila.respondidas - fila.correctas,
+                "tasa_aciertos": round(tasa_aciertos, 2),
+                "tasa_error": round(100 - tasa_aciertos, 2)
+            })
+        
+        return resultado
 
     @staticmethod
-    def obtener_rendimiento_por_categoria(db: Session) -> List[Dict[str, Any]]:
+    def obtener_rendimiento_por_categoria(db: Session, por_dificultad: bool = False) -> List[Dict[str, Any]]:
         """
         Obtiene el rendimiento promedio por categoría.
         
+        Usa una consulta agrupada sobre las respuestas y otra sobre las
+        preguntas activas, sin importar cuántas categorías haya.
+        
         Args:
             db: Sesión de base de datos
+            por_dificultad: Desglosar además cada categoría por dificultad
             
         Returns:
             Lista de categorías con su rendimiento
         """
-        categorias = db.query(Question.categoria).distinct().all()
+        grupo = [Question.categoria]
+        if por_dificultad:
+            grupo.append(Question.dificultad)
+        
+        total = func.count(Answer.id)
+        correctas = func.sum(case((Answer.es_correcta == True, 1), else_=0))
+        respuestas = db.execute(
+            select(*grupo, total, correctas)
+            .join(Answer, Answer.question_id == Question.id)
+            .group_by(*grupo)
+            .order_by(*grupo)
+        ).all()
+        
+        preguntas_activas = {
+            tuple(fila[:-1]): fila[-1]
+            for fila in db.execute(
+                select(*grupo, func.count(Question.id))
+                .where(Question.is_active == True)
+                .group_by(*grupo)
+            )
+        }
         
         resultado = []
-        for (categoria,) in categorias:
-            respuestas = db.query(Answer).join(
-                Question, Answer.question_id == Question.id
-            ).filter(Question.categoria == categoria).all()
-            
-            if respuestas:
-                total = len(respuestas)
-                correctas = sum(1 for r in respuestas if r.es_correcta)
-                
-                resultado.append({
-                    "categoria": categoria,
-                    "total_preguntas": db.query(Question).filter(
-                        Question.categoria == categoria,
-                        Question.is_active == True
-                    ).count(),
-                    "total_respondidas": total,
-                    "aciertos": correctas,
-                    "errores": total - correctas,
-                    "porcentaje_aciertos": round(correctas / total * 100, 2)
-                })
+        for fila in respuestas:
+            clave = tuple(fila[:len(grupo)])
+            total_respondidas, aciertos = fila[len(grupo):]
+            elemento = {"categoria": clave[0]}
+            if por_dificultad:
+                elemento["dificultad"] = clave[1]
+            elemento.update({
+                "total_preguntas": preguntas_activas.get(clave, 0),
+                "total_respondidas": total_respondidas,
+                "aciertos": aciertos,
+                "errores": total_respondidas - aciertos,
+                "porcentaje_aciertos": round(aciertos / total_respondidas * 100, 2)
+            })
+            resultado.append(elemento)
         
         return sorted(resultado, key=lambda x: x["porcentaje_aciertos"], reverse=True)
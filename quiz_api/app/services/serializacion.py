@@ -0,0 +1,83 @@
+"""
+Serialización JSON rápida de los listados, sin pasar por los modelos Pydantic
+"""
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Type
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Construir los listados desde las filas de la consulta y codificarlos
+# directamente, sin validar cada objeto con el response_model
+RESPUESTAS_RAPIDAS = os.getenv("RESPUESTAS_RAPIDAS", "0") == "1"
+
+
+def _por_defecto(valor: Any) -> Any:
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+def codificar(contenido: Any) -> bytes:
+    """
+    Codifica en JSON con el mismo formato que FastAPI: UTF-8 sin escapar,
+    sin espacios y fechas en ISO 8601.
+
+    Usa orjson si está instalado y, si no, el módulo json de la biblioteca
+    estándar.
+
+    Args:
+        contenido: Listas, diccionarios y valores simples (incluidas fechas)
+
+    Returns:
+        Cuerpo de la respuesta
+    """
+    if orjson is not None:
+        return orjson.dumps(contenido)
+    return json.dumps(
+        contenido, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_por_defecto
+    ).encode("utf-8")
+
+
+def columnas(esquema: Type[BaseModel], modelo) -> List[Any]:
+    """
+    Columnas del modelo que forman el esquema, en el orden de sus campos.
+
+    Consultar estas columnas en lugar de la entidad evita construir objetos
+    ORM, y con `filas_a_dicts` cada fila sale con las claves en el mismo
+    orden que las escribiría Pydantic.
+
+    Args:
+        esquema: Modelo Pydantic de la respuesta
+        modelo: Modelo SQLAlchemy con una columna por cada campo del esquema
+    """
+    return [getattr(modelo, campo) for campo in esquema.model_fields]
+
+
+def filas_a_dicts(filas: Iterable[Sequence[Any]], campos: Sequence[str]) -> List[Dict[str, Any]]:
+    """Convierte filas de la consulta en diccionarios con las claves `campos`."""
+    return [dict(zip(campos, fila)) for fila in filas]
+
+
+def respuesta_json(contenido: Any, response: Optional[Response] = None) -> Response:
+    """
+    Respuesta JSON ya codificada que FastAPI envía sin validar ni volver a serializar.
+
+    Args:
+        contenido: Datos de la respuesta
+        response: Respuesta inyectada en el endpoint; sus cabeceras (p. ej.
+            X-Next-Cursor o ETag) se copian, porque FastAPI no las añade
+            cuando el endpoint devuelve una respuesta propia
+
+    Returns:
+        Response con media type application/json
+    """
+    cabeceras = dict(response.headers) if response is not None else None
+    return Response(codificar(contenido), media_type="application/json", headers=cabeceras)
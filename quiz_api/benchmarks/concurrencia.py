@@ -0,0 +1,138 @@
+"""
+Compara el throughput de los endpoints calientes con el motor síncrono y con
+el asíncrono (DATABASE_ASYNC=1) a distintos niveles de concurrencia.
+
+Para cada modo se levanta uvicorn en un subproceso sobre una base de datos
+temporal con la seed aplicada, y se lanzan N clientes concurrentes que repiten
+el flujo de un quiz: iniciar sesión, pedir preguntas aleatorias, registrar
+respuestas, completar y consultar las estadísticas.
+
+Uso:
+    python benchmarks/concurrencia.py
+    python benchmarks/concurrencia.py --clientes 1 50 500 --duracion 10
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def arrancar_servidor(asincrono: bool, directorio: str, variables: dict = None):
+    """Crea una base de datos con la seed y arranca uvicorn sobre ella."""
+    entorno = dict(os.environ)
+    entorno.update(variables or {})
+    entorno["DATABASE_URL"] = f"sqlite:///{os.path.join(directorio, 'bench.db')}"
+    entorno["DATABASE_ASYNC"] = "1" if asincrono else "0"
+    subprocess.run(
+        [sys.executable, "init_db.py"], cwd=RAIZ, env=entorno, check=True,
+        stdout=subprocess.DEVNULL
+    )
+    puerto = _puerto_libre()
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--port", str(puerto), "--log-level", "warning"],
+        cwd=RAIZ, env=entorno
+    )
+    base = f"http://127.0.0.1:{puerto}"
+    for _ in range(100):
+        try:
+            if httpx.get(f"{base}/health").status_code == 200:
+                return proceso, base
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    proceso.terminate()
+    raise RuntimeError("El servidor no arrancó a tiempo")
+
+
+async def _quiz(cliente: httpx.AsyncClient) -> int:
+    """Ejecuta un quiz completo y devuelve cuántas peticiones hizo."""
+    sesion = (await cliente.post("/quiz-sessions/", json={})).json()
+    preguntas = (await cliente.get("/questions/random", params={"limit": 5})).json()
+    for pregunta in preguntas:
+        await cliente.post("/answers/", json={
+            "quiz_session_id": sesion["id"],
+            "question_id": pregunta["id"],
+            "respuesta_seleccionada": 0,
+            "tiempo_respuesta_segundos": 3
+        })
+    await cliente.put(f"/quiz-sessions/{sesion['id']}/complete", json={})
+    await cliente.get(f"/statistics/session/{sesion['id']}")
+    await cliente.get("/statistics/global")
+    return len(preguntas) + 5
+
+
+async def _medir(base: str, clientes: int, duracion: float) -> dict:
+    """Lanza `clientes` bucles concurrentes durante `duracion` segundos."""
+    limites = httpx.Limits(max_connections=clientes, max_keepalive_connections=clientes)
+    peticiones = 0
+    errores = 0
+    async with httpx.AsyncClient(base_url=base, limits=limites, timeout=60) as cliente:
+        fin = time.perf_counter() + duracion
+
+        async def trabajador():
+            nonlocal peticiones, errores
+            while time.perf_counter() < fin:
+                try:
+                    # Esperar antes de sumar: `peticiones += await ...` leería
+                    # el contador antes de ceder el control y perdería sumas
+                    hechas = await _quiz(cliente)
+                    peticiones += hechas
+                except (httpx.HTTPError, KeyError, TypeError):
+                    errores += 1
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabajador() for _ in range(clientes)))
+        transcurrido = time.perf_counter() - inicio
+    return {
+        "clientes": clientes,
+        "peticiones": peticiones,
+        "errores": errores,
+        "req_s": round(peticiones / transcurrido, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clientes", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--duracion", type=float, default=10.0, help="Segundos por medición")
+    args = parser.parse_args()
+
+    resultados = {}
+    for asincrono in (False, True):
+        modo = "async" if asincrono else "sync"
+        with tempfile.TemporaryDirectory() as directorio:
+            proceso, base = arrancar_servidor(asincrono, directorio)
+            try:
+                resultados[modo] = [
+                    asyncio.run(_medir(base, clientes, args.duracion))
+                    for clientes in args.clientes
+                ]
+            finally:
+                proceso.terminate()
+                proceso.wait()
+
+    print(f"{'clientes':>9} {'sync req/s':>12} {'async req/s':>12} {'errores':>9}")
+    for sync, asincrono in zip(resultados["sync"], resultados["async"]):
+        print(
+            f"{sync['clientes']:>9} {sync['req_s']:>12} {asincrono['req_s']:>12} "
+            f"{sync['errores'] + asincrono['errores']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
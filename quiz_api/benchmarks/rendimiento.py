@@ -0,0 +1,332 @@
+"""
+Suite de rendimiento reproducible del flujo completo de un quiz.
+
+Cada cliente repite el flujo de un quiz (iniciar sesión, pedir preguntas
+aleatorias, registrar respuestas, completar y consultar las estadísticas)
+contra la aplicación real, en el mismo proceso (`--modo proceso`, con
+httpx.ASGITransport) o sobre uvicorn en un subproceso (`--modo uvicorn`).
+Antes de medir se importa un banco sintético de preguntas generado con una
+semilla fija y se hace un calentamiento que no cuenta.
+
+Por endpoint se informa del throughput, la latencia p50/p95/p99 y las
+sentencias SQL por petición (leídas de GET /metrics con METRICAS_MUESTREO=1).
+Con `--salida` los resultados se guardan en JSON; con `--base` se comparan con
+una ejecución anterior y el proceso termina con código 1 si algún endpoint
+empeora más de `--umbral`.
+
+Uso:
+    python benchmarks/rendimiento.py --salida base.json
+    python benchmarks/rendimiento.py --base base.json --umbral 0.2
+    python benchmarks/rendimiento.py --modo uvicorn --async --clientes 50
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import httpx
+
+from concurrencia import RAIZ, arrancar_servidor
+
+CATEGORIAS = ["Ciencia", "Historia", "Geografía", "Arte", "Deportes", "Tecnología", "Literatura", "Música"]
+DIFICULTADES = ["fácil", "medio", "difícil"]
+PALABRAS = (
+    "agua fuego tierra aire planeta río montaña ciudad reino guerra tratado autor novela pintor "
+    "cuadro ecuación átomo célula energía motor red protocolo algoritmo sinfonía ópera equipo "
+    "récord medalla océano desierto volcán imperio siglo teorema órbita molécula museo"
+).split()
+
+# Sentencias SQL por petición que se toleran de más frente a la base
+TOLERANCIA_CONSULTAS = 0.05
+
+_SERIE = re.compile(r'^(\w+)\{route="((?:[^"\\]|\\.)*)",method="(\w+)"(?:,status="\d+")?\} (\S+)$')
+
+
+def banco_sintetico(preguntas: int, semilla: int) -> bytes:
+    """Genera un banco NDJSON determinista para una semilla dada."""
+    aleatorio = random.Random(semilla)
+    lineas = []
+    for i in range(preguntas):
+        palabras = " ".join(aleatorio.choices(PALABRAS, k=8))
+        opciones = [" ".join(aleatorio.choices(PALABRAS, k=3)) for _ in range(4)]
+        lineas.append(json.dumps({
+            "pregunta": f"Pregunta {i}: {palabras}?",
+            "opciones": opciones,
+            "respuesta_correcta": aleatorio.randrange(4),
+            "explicacion": " ".join(aleatorio.choices(PALABRAS, k=12)),
+            "categoria": aleatorio.choice(CATEGORIAS),
+            "dificultad": aleatorio.choice(DIFICULTADES)
+        }, ensure_ascii=False))
+    return ("\n".join(lineas) + "\n").encode()
+
+
+class Mediciones:
+    """Latencias y errores por endpoint medidos desde el cliente."""
+
+    def __init__(self):
+        self.latencias = defaultdict(list)
+        self.errores = defaultdict(int)
+        self.activo = False
+
+    async def peticion(self, cliente: httpx.AsyncClient, endpoint: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Envía una petición y anota su latencia bajo la plantilla `endpoint`.
+
+        Args:
+            cliente: Cliente HTTP
+            endpoint: Método y plantilla de ruta, por ejemplo "GET /questions/random"
+            url: URL concreta de la petición
+        """
+        metodo = endpoint.split(" ", 1)[0]
+        inicio = time.perf_counter()
+        respuesta = await cliente.request(metodo, url, **kwargs)
+        if self.activo:
+            self.latencias[endpoint].append(time.perf_counter() - inicio)
+            if respuesta.status_code >= 400:
+                self.errores[endpoint] += 1
+        return respuesta
+
+
+async def _quiz(cliente: httpx.AsyncClient, mediciones: Mediciones, aleatorio: random.Random):
+    """Ejecuta un quiz completo."""
+    sesion = (await mediciones.peticion(cliente, "POST /quiz-sessions/", "/quiz-sessions/", json={})).json()
+    preguntas = (await mediciones.peticion(
+        cliente, "GET /questions/random", "/questions/random", params={"limit": 10}
+    )).json()
+    for pregunta in preguntas:
+        await mediciones.peticion(cliente, "POST /answers/", "/answers/", json={
+            "quiz_session_id": sesion["id"],
+            "question_id": pregunta["id"],
+            "respuesta_seleccionada": aleatorio.randrange(len(pregunta["opciones"])),
+            "tiempo_respuesta_segundos": aleatorio.randint(2, 30)
+        })
+    await mediciones.peticion(
+        cliente, "PUT /quiz-sessions/{session_id}/complete", f"/quiz-sessions/{sesion['id']}/complete", json={}
+    )
+    await mediciones.peticion(
+        cliente, "GET /statistics/session/{session_id}", f"/statistics/session/{sesion['id']}"
+    )
+    await mediciones.peticion(cliente, "GET /statistics/global", "/statistics/global")
+
+
+async def _contadores_sql(cliente: httpx.AsyncClient) -> dict:
+    """Lee de GET /metrics las peticiones y sentencias SQL por endpoint."""
+    texto = (await cliente.get("/metrics")).text
+    contadores = defaultdict(lambda: {"peticiones": 0, "consultas": 0})
+    for linea in texto.splitlines():
+        coincidencia = _SERIE.match(linea)
+        if not coincidencia:
+            continue
+        nombre, ruta, metodo, valor = coincidencia.groups()
+        if nombre == "quiz_http_requests_total":
+            contadores[f"{metodo} {ruta}"]["peticiones"] += int(valor)
+        elif nombre == "quiz_sql_statements_total":
+            contadores[f"{metodo} {ruta}"]["consultas"] += int(valor)
+    return contadores
+
+
+def percentil(valores: list, p: float) -> float:
+    """Percentil por rango más cercano de una lista ordenada."""
+    if not valores:
+        return 0.0
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
+
+
+async def _ejecutar(transporte: dict, args) -> dict:
+    """Prepara el banco, calienta y mide el flujo con `args.clientes` clientes."""
+    limites = httpx.Limits(max_connections=args.clientes, max_keepalive_connections=args.clientes)
+    async with httpx.AsyncClient(limits=limites, timeout=120, **transporte) as cliente:
+        if args.preguntas:
+            respuesta = await cliente.post(
+                "/questions/import", content=banco_sintetico(args.preguntas, args.semilla)
+            )
+            respuesta.raise_for_status()
+
+        mediciones = Mediciones()
+
+        async def trabajador(numero: int, duracion: float):
+            aleatorio = random.Random(args.semilla * 1000 + numero)
+            fin = time.perf_counter() + duracion
+            while time.perf_counter() < fin:
+                await _quiz(cliente, mediciones, aleatorio)
+
+        await asyncio.gather(*(trabajador(i, args.calentamiento) for i in range(args.clientes)))
+
+        antes = await _contadores_sql(cliente)
+        mediciones.activo = True
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabajador(i, args.duracion) for i in range(args.clientes)))
+        transcurrido = time.perf_counter() - inicio
+        mediciones.activo = False
+        despues = await _contadores_sql(cliente)
+
+    endpoints = {}
+    for endpoint, latencias in sorted(mediciones.latencias.items()):
+        latencias.sort()
+        peticiones = despues[endpoint]["peticiones"] - antes[endpoint]["peticiones"]
+        consultas = despues[endpoint]["consultas"] - antes[endpoint]["consultas"]
+        endpoints[endpoint] = {
+            "peticiones": len(latencias),
+            "errores": mediciones.errores[endpoint],
+            "req_s": round(len(latencias) / transcurrido, 2),
+            "p50_ms": round(percentil(latencias, 50) * 1000, 3),
+            "p95_ms": round(percentil(latencias, 95) * 1000, 3),
+            "p99_ms": round(percentil(latencias, 99) * 1000, 3),
+            "consultas_por_peticion": round(consultas / peticiones, 3) if peticiones else None
+        }
+    total = sum(datos["peticiones"] for datos in endpoints.values())
+    return {
+        "duracion_s": round(transcurrido, 3),
+        "peticiones": total,
+        "errores": sum(datos["errores"] for datos in endpoints.values()),
+        "req_s": round(total / transcurrido, 2),
+        "endpoints": endpoints
+    }
+
+
+def _medir_en_proceso(variables: dict, args) -> dict:
+    """Importa la aplicación con la configuración del benchmark y la mide sin red."""
+    os.environ.update(variables)
+    sys.path.insert(0, RAIZ)
+    from app.main import app
+    from init_db import seed_db_if_empty
+
+    seed_db_if_empty()
+    transporte = {"transport": httpx.ASGITransport(app=app), "base_url": "http://bench"}
+    return asyncio.run(_ejecutar(transporte, args))
+
+
+def _medir_en_uvicorn(variables: dict, directorio: str, args) -> dict:
+    proceso, base = arrancar_servidor(args.asincrono, directorio, variables)
+    try:
+        return asyncio.run(_ejecutar({"base_url": base}, args))
+    finally:
+        proceso.terminate()
+        proceso.wait()
+
+
+def comparar(actual: dict, base: dict, umbral: float) -> list:
+    """
+    Compara una ejecución con otra anterior.
+
+    Args:
+        actual: Resultados de esta ejecución
+        base: Resultados de la ejecución de referencia
+        umbral: Empeoramiento relativo tolerado (0.2 = 20 %)
+
+    Returns:
+        Lista de regresiones en texto (vacía si no hay ninguna)
+    """
+    regresiones = []
+    for endpoint, anterior in base["resultados"]["endpoints"].items():
+        datos = actual["resultados"]["endpoints"].get(endpoint)
+        if datos is None:
+            regresiones.append(f"{endpoint}: no se ha medido")
+            continue
+        if datos["req_s"] < anterior["req_s"] * (1 - umbral):
+            regresiones.append(f"{endpoint}: req/s {anterior['req_s']} -> {datos['req_s']}")
+        # p99 se informa pero no se compara: en ejecuciones cortas es demasiado ruidoso
+        if datos["p95_ms"] > anterior["p95_ms"] * (1 + umbral):
+            regresiones.append(f"{endpoint}: p95_ms {anterior['p95_ms']} -> {datos['p95_ms']}")
+        if (
+            datos["consultas_por_peticion"] is not None
+            and anterior["consultas_por_peticion"] is not None
+            and datos["consultas_por_peticion"] > anterior["consultas_por_peticion"] + TOLERANCIA_CONSULTAS
+        ):
+            regresiones.append(
+                f"{endpoint}: SQL por petición {anterior['consultas_por_peticion']} "
+                f"-> {datos['consultas_por_peticion']}"
+            )
+        if datos["errores"] > anterior["errores"]:
+            regresiones.append(f"{endpoint}: errores {anterior['errores']} -> {datos['errores']}")
+    return regresiones
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modo", choices=["proceso", "uvicorn"], default="proceso")
+    parser.add_argument("--async", dest="asincrono", action="store_true", help="Usar DATABASE_ASYNC=1")
+    parser.add_argument("--clientes", type=int, default=10, help="Clientes concurrentes")
+    parser.add_argument("--duracion", type=float, default=10.0, help="Segundos de medición")
+    parser.add_argument("--calentamiento", type=float, default=2.0, help="Segundos de calentamiento")
+    parser.add_argument("--preguntas", type=int, default=1000, help="Preguntas sintéticas a importar")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--salida", help="Guardar los resultados en este archivo JSON")
+    parser.add_argument("--base", help="Resultados JSON de referencia con los que comparar")
+    parser.add_argument("--umbral", type=float, default=0.2, help="Empeoramiento relativo tolerado")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        variables = {
+            "DATABASE_URL": f"sqlite:///{os.path.join(directorio, 'bench.db')}",
+            "DATABASE_ASYNC": "1" if args.asincrono else "0",
+            "METRICAS_MUESTREO": "1",
+        }
+        if args.modo == "proceso":
+            resultados = _medir_en_proceso(variables, args)
+        else:
+            resultados = _medir_en_uvicorn(variables, directorio, args)
+
+    ejecucion = {
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "entorno": {"python": platform.python_version(), "plataforma": platform.platform()},
+        "configuracion": {
+            "modo": args.modo,
+            "async": args.asincrono,
+            "clientes": args.clientes,
+            "duracion": args.duracion,
+            "calentamiento": args.calentamiento,
+            "preguntas": args.preguntas,
+            "semilla": args.semilla
+        },
+        "resultados": resultados
+    }
+
+    print(f"{'endpoint':<42} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'SQL/pet':>8} {'errores':>8}")
+    for endpoint, datos in resultados["endpoints"].items():
+        print(
+            f"{endpoint:<42} {datos['req_s']:>9} {datos['p50_ms']:>9} {datos['p95_ms']:>9} "
+            f"{datos['p99_ms']:>9} {datos['consultas_por_peticion']!s:>8} {datos['errores']:>8}"
+        )
+    print(f"{'total':<42} {resultados['req_s']:>9}")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump(ejecucion, archivo, ensure_ascii=False, indent=2)
+
+    if args.base:
+        with open(args.base, encoding="utf-8") as archivo:
+            base = json.load(archivo)
+        if base.get("configuracion") != ejecucion["configuracion"]:
+            print(f"\nAviso: la configuración de {args.base} es distinta de la de esta ejecución")
+        regresiones = comparar(ejecucion, base, args.umbral)
+        if regresiones:
+            print(f"\nRegresiones frente a {args.base} (umbral {args.umbral:.0%}):")
+            for regresion in regresiones:
+                print(f"  {regresion}")
+            sys.exit(1)
+        print(f"\nSin regresiones frente a {args.base} (umbral {args.umbral:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Mide el coste por fila de serializar los listados con los modelos Pydantic
+(el camino por defecto) y con la serialización rápida (RESPUESTAS_RAPIDAS=1).
+
+Sobre una base de datos temporal con preguntas y sesiones sintéticas se
+repite, para páginas de preguntas y para las respuestas de una sesión:
+
+- pydantic: consulta de la entidad ORM, validación con el response_model y
+  codificación con Pydantic, como hace FastAPI.
+- rapida: consulta de las columnas, diccionarios y codificación con orjson
+  (o json si orjson no está instalado).
+
+Se informa del tiempo por fila de la serialización sola y de consulta más
+serialización, y se comprueba que ambos caminos producen los mismos bytes.
+
+Uso:
+    python benchmarks/serializacion.py
+    python benchmarks/serializacion.py --filas 100 --repeticiones 500
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _medir(funcion: Callable[[], object], repeticiones: int) -> float:
+    """Mejor tiempo de `funcion` en segundos entre `repeticiones` ejecuciones."""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coste por fila de la serialización de listados")
+    parser.add_argument("--filas", type=int, default=100, help="Filas por página")
+    parser.add_argument("--repeticiones", type=int, default=200, help="Repeticiones por medición")
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="quiz_serializacion_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directorio, 'bench.db')}"
+    sys.path.insert(0, RAIZ)
+    try:
+        _comparar(args)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+def _comparar(args):
+    from pydantic import TypeAdapter
+    from sqlalchemy import func
+
+    from app.database import SessionLocal, init_db
+    from app.models.answer import Answer
+    from app.models.question import Question
+    from app.routers.answers import _consulta_detalle, _detalle_desde_fila
+    from app.schemas.answer import AnswerDetailResponse
+    from app.schemas.question import QuestionResponse
+    from app.services import serializacion
+    from app.services.generador_datos import completar_banco, generar_sesiones
+
+    init_db()
+    with SessionLocal() as db:
+        completar_banco(db, max(args.filas, 1000), semilla=1)
+        generar_sesiones(db, 50, semilla=1)
+        # La sesión con más respuestas, para que la página sea lo más larga posible
+        sesion = db.query(Answer.quiz_session_id).group_by(Answer.quiz_session_id).order_by(
+            func.count().desc()
+        ).first()[0]
+
+    preguntas = TypeAdapter(List[QuestionResponse])
+    detalles = TypeAdapter(List[AnswerDetailResponse])
+    columnas = serializacion.columnas(QuestionResponse, Question)
+    campos = tuple(QuestionResponse.model_fields)
+
+    def entidades():
+        with SessionLocal() as db:
+            return db.query(Question).order_by(Question.id).limit(args.filas).all()
+
+    def filas_preguntas():
+        with SessionLocal() as db:
+            return db.query(*columnas).order_by(Question.id).limit(args.filas).all()
+
+    def filas_detalle():
+        with SessionLocal() as db:
+            return [_detalle_desde_fila(fila) for fila in db.execute(
+                _consulta_detalle().where(Answer.quiz_session_id == sesion).order_by(Answer.id)
+            )]
+
+    casos = {
+        "preguntas": (
+            entidades,
+            lambda filas: preguntas.dump_json(preguntas.validate_python(filas)),
+            filas_preguntas,
+            lambda filas: serializacion.codificar(serializacion.filas_a_dicts(filas, campos)),
+        ),
+        "respuestas de sesión": (
+            filas_detalle,
+            lambda filas: detalles.dump_json(detalles.validate_python(filas)),
+            filas_detalle,
+            serializacion.codificar,
+        ),
+    }
+
+    codificador = "orjson" if serializacion.orjson is not None else "json"
+    print(f"Codificador rápido: {codificador}; mejor de {args.repeticiones} repeticiones\n")
+    print(f"{'listado':<22}{'filas':>6}{'camino':>9}{'serializar µs/fila':>20}{'total µs/fila':>16}")
+    for nombre, (consulta_lenta, serializar_lenta, consulta_rapida, serializar_rapida) in casos.items():
+        datos_lenta, datos_rapida = consulta_lenta(), consulta_rapida()
+        if serializar_lenta(datos_lenta) != serializar_rapida(datos_rapida):
+            raise SystemExit(f"{nombre}: los dos caminos no producen los mismos bytes")
+        filas = len(datos_lenta)
+        for camino, consulta, serializar, datos in (
+            ("pydantic", consulta_lenta, serializar_lenta, datos_lenta),
+            ("rapida", consulta_rapida, serializar_rapida, datos_rapida),
+        ):
+            solo = _medir(lambda: serializar(datos), args.repeticiones)
+            total = _medir(lambda: serializar(consulta()), args.repeticiones)
+            print(
+                f"{nombre:<22}{filas:>6}{camino:>9}"
+                f"{solo / filas * 1e6:>20.2f}{total / filas * 1e6:>16.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
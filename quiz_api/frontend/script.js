@@ -89,9 +89,19 @@ document.querySelectorAll('.tab-btn').forEach(btn => {
 });
 
 // LOAD QUESTIONS
+// El servidor filtra y busca; la búsqueda usa el índice de texto completo
 async function loadQuestions() {
+    const search = document.getElementById('search').value.trim();
+    const params = new URLSearchParams({ limit: 100 });
+    const categoryFilter = document.getElementById('category-filter').value;
+    const difficultyFilter = document.getElementById('difficulty-filter').value;
+    if (search) params.set('q', search);
+    if (categoryFilter) params.set('categoria', categoryFilter);
+    if (difficultyFilter) params.set('dificultad', difficultyFilter);
+    const endpoint = search ? 'questions/search' : 'questions/';
+    
     try {
-        const response = await fetch(`${API_URL}/questions/?skip=0&limit=100`);
+        const response = await fetch(`${API_URL}/${endpoint}?${params}`);
         const data = await response.json();
         
         displayQuestions(data.questions || data);
@@ -106,18 +116,7 @@ function displayQuestions(questions) {
     const container = document.getElementById('questions-list');
     container.innerHTML = '';
     
-    const search = document.getElementById('search').value.toLowerCase();
-    const categoryFilter = document.getElementById('category-filter').value;
-    const difficultyFilter = document.getElementById('difficulty-filter').value;
-    
-    const filtered = questions.filter(q => {
-        const matchesSearch = q.pregunta.toLowerCase().includes(search);
-        const matchesCategory = !categoryFilter || q.categoria === categoryFilter;
-        const matchesDifficulty = !difficultyFilter || q.dificultad === difficultyFilter;
-        return matchesSearch && matchesCategory && matchesDifficulty;
-    });
-    
-    filtered.forEach(question => {
+    questions.forEach(question => {
         const card = document.createElement('div');
         card.className = 'question-card';
         card.innerHTML = `
@@ -147,23 +146,14 @@ function displayQuestions(questions) {
 }
 
 // FILTER LISTENERS
+let searchTimeout = null;
 document.getElementById('search').addEventListener('input', () => {
-    const response = fetch(`${API_URL}/questions/?skip=0&limit=100`)
-        .then(r => r.json())
-        .then(data => displayQuestions(data.questions || data));
+    clearTimeout(searchTimeout);
+    searchTimeout = setTimeout(loadQuestions, 250);
 });
 
-document.getElementById('category-filter').addEventListener('change', () => {
-    const response = fetch(`${API_URL}/questions/?skip=0&limit=100`)
-        .then(r => r.json())
-        .then(data => displayQuestions(data.questions || data));
-});
-
-document.getElementById('difficulty-filter').addEventListener('change', () => {
-    const response = fetch(`${API_URL}/questions/?skip=0&limit=100`)
-        .then(r => r.json())
-        .then(data => displayQuestions(data.questions || data));
-});
+document.getElementById('category-filter').addEventListener('change', loadQuestions);
+document.getElementById('difficulty-filter').addEventListener('change', loadQuestions);
 
 // CREAR PREGUNTA
 document.getElementById('create-form').addEventListener('submit', async (e) => {
@@ -208,25 +198,20 @@ document.getElementById('create-form').addEventListener('submit', async (e) => {
 // QUIZ
 async function startQuiz(count) {
     try {
-        // Crear sesión
-        const sessionResponse = await fetch(`${API_URL}/quiz-sessions/`, {
+        // Crear la sesión y recibir sus preguntas aleatorias en una sola petición
+        const startResponse = await fetch(`${API_URL}/quiz-sessions/start`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ usuario_nombre: currentUser })
+            body: JSON.stringify({ usuario_nombre: currentUser, limit: count })
         });
-        
-        currentQuizSession = await sessionResponse.json();
-        
-        // Cargar preguntas aleatorias desde el backend
-        // Usamos el endpoint /questions/random para obtener preguntas en orden aleatorio
-        const questionsResponse = await fetch(`${API_URL}/questions/random?limit=${count}`);
-        if (!questionsResponse.ok) {
-            const err = await questionsResponse.json().catch(() => ({}));
+        if (!startResponse.ok) {
+            const err = await startResponse.json().catch(() => ({}));
             throw new Error(err.detail || 'No se pudieron obtener preguntas aleatorias');
         }
-        const questions = await questionsResponse.json();
+        const { sesion, preguntas } = await startResponse.json();
         
-        quizQuestions = questions;
+        currentQuizSession = sesion;
+        quizQuestions = preguntas;
         quizCurrentIndex = 0;
         quizAnswers = [];
         
@@ -335,31 +320,28 @@ async function finishQuiz() {
         }, 0);
         const score = totalQuestions > 0 ? Math.round((correctAnswers / totalQuestions) * 100) : 0;
         
-        // Registrar respuestas primero
-        for (const answer of quizAnswers) {
-            // Enviar sólo los campos esperados por el schema del backend
-            await fetch(`${API_URL}/answers/`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    quiz_session_id: currentQuizSession.id,
+        // Registrar todas las respuestas y completar la sesión en una sola petición
+        const batchResp = await fetch(`${API_URL}/answers/batch`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                quiz_session_id: currentQuizSession.id,
+                respuestas: quizAnswers.map(answer => ({
                     question_id: answer.question_id,
                     respuesta_seleccionada: answer.respuesta_seleccionada,
                     tiempo_respuesta_segundos: answer.tiempo_respuesta_segundos || 0
-                })
-            });
-        }
-
-        // Completar sesión (backend recalcula puntuación basada en respuestas)
-        const completeResp = await fetch(`${API_URL}/quiz-sessions/${currentQuizSession.id}/complete`, {
-            method: 'PUT',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ tiempo_total_segundos: 0 })
+                })),
+                completar: true,
+                tiempo_total_segundos: 0
+            })
         });
 
-        if (completeResp.ok) {
-            const sessionData = await completeResp.json();
-            currentQuizSession = sessionData;
+        if (batchResp.ok) {
+            const batchData = await batchResp.json();
+            if (batchData.errores.length > 0) {
+                console.warn('Respuestas no registradas:', batchData.errores);
+            }
+            currentQuizSession = batchData.sesion;
             // Refrescar estadísticas en vivo
             loadStatistics();
         }
@@ -1,9 +1,17 @@
 """
 Script para inicializar la base de datos con datos de prueba.
 Ejecutar con: python init_db.py
+
+Subcomandos de mantenimiento:
+    python init_db.py reconstruir-contadores
+    python init_db.py reconstruir-estadisticas
+    python init_db.py importar banco.ndjson [--lote 1000] [--duplicados rechazar]
+    python init_db.py generar --sesiones 1000000 [--preguntas 5000] [--semilla 1]
 """
 import sys
-import json
+import time
+import random
+import argparse
 from pathlib import Path
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
@@ -15,39 +23,54 @@ from app.database import SessionLocal, init_db
 from app.models.question import Question
 from app.models.quiz_session import QuizSession
 from app.models.answer import Answer
+from app.services.duplicados import POLITICAS_DUPLICADOS, indexar_preguntas_sin_firma
+from app.services.generador_datos import completar_banco, generar_sesiones
+from app.services.question_importer import importar_preguntas
+from app.services.quiz_service import QuizService
+
 
+def seed_db_from_file(db: Session, filepath: str | Path, duplicados: str = "permitir"):
+    """
+    Carga preguntas desde un archivo JSON o NDJSON y las inserta en la base de datos.
 
-def seed_db_from_file(db: Session, filepath: str | Path):
-    """Carga preguntas desde un archivo JSON y las inserta en la base de datos."""
+    `duplicados` es la política ante preguntas repetidas dentro del archivo
+    (permitir, rechazar, marcar o fusionar). Solo se usa con la base de datos
+    vacía, así que devuelve todas las preguntas.
+    """
     filepath = Path(filepath)
     if not filepath.exists():
         raise FileNotFoundError(f"Archivo de seed no encontrado: {filepath}")
 
-    with filepath.open(encoding="utf-8") as f:
-        data = json.load(f)
-
-    preguntas_creadas = []
-    for pregunta_data in data:
-        pregunta = Question(**pregunta_data)
-        db.add(pregunta)
-        preguntas_creadas.append(pregunta)
-
-    db.commit()
-    for pregunta in preguntas_creadas:
-        db.refresh(pregunta)
+    with filepath.open("rb") as f:
+        resumen = importar_preguntas(db, f, duplicados=duplicados)
 
-    print(f"{len(preguntas_creadas)} preguntas cargadas desde {filepath.name}")
-    return preguntas_creadas
+    for error in resumen["errores"]:
+        print(f"Pregunta {error['indice']} omitida: {error['detalle']}")
+    for duplicado in resumen["duplicados"]:
+        print(f"Pregunta {duplicado['indice']} duplicada de la pregunta {duplicado['duplicado_de']}")
+    print(f"{resumen['insertadas']} preguntas cargadas desde {filepath.name}")
+    return db.query(Question).order_by(Question.id).all()
 
 
 def seed_db_if_empty(seed_filename: str = "seed_questions.json"):
     """Crea tablas (si no existen) y carga datos desde seed si la tabla de preguntas está vacía."""
-    init_db()
+    columnas_agregadas = init_db()
     db = SessionLocal()
     try:
+        # Una base de datos anterior a los contadores incrementales los tiene a cero
+        if any(columna.startswith("quiz_sessions.") for columna in columnas_agregadas):
+            corregidas = QuizService.reconstruir_contadores_sesiones(db)
+            print(f"Contadores reconstruidos en {corregidas} sesiones")
+
+        # Preguntas anteriores a la detección de duplicados, sin huella ni bandas
+        indexadas = indexar_preguntas_sin_firma(db)
+        if indexadas:
+            print(f"{indexadas} preguntas indexadas para la detección de duplicados")
+
         preguntas_existentes = db.query(Question).count()
         if preguntas_existentes > 0:
             print(f"La base de datos ya contiene {preguntas_existentes} preguntas. Omitiendo seed.")
+            QuizService.asegurar_estadisticas(db)
             return
 
         seed_path = Path(__file__).parent / seed_filename
@@ -55,6 +78,9 @@ def seed_db_if_empty(seed_filename: str = "seed_questions.json"):
 
         # Opcional: crear sesiones y respuestas de ejemplo si no existen
         crear_sesiones_y_respuestas(db, preguntas)
+
+        # El seed inserta directamente, así que los agregados se calculan al final
+        QuizService.reconstruir_estadisticas(db)
     finally:
         db.close()
 
@@ -224,13 +250,12 @@ def crear_sesiones_y_respuestas(db: Session, preguntas: list):
         db.flush()  # Obtener el ID sin hacer commit
         
         # Crear respuestas aleatorias para esta sesión
-        import random
-        
         # Seleccionar 8 preguntas aleatorias
         preguntas_seleccionadas = random.sample(preguntas, min(8, len(preguntas)))
         
         respuestas_correctas = 0
         tiempo_total = 0
+        respuestas_con_tiempo = 0
         
         for i, pregunta in enumerate(preguntas_seleccionadas):
             # Generar una respuesta correcta o incorrecta aleatoriamente
@@ -248,6 +273,7 @@ def crear_sesiones_y_respuestas(db: Session, preguntas: list):
             
             tiempo_respuesta = random.randint(5, 60)
             tiempo_total += tiempo_respuesta
+            respuestas_con_tiempo += 1
             
             respuesta = Answer(
                 quiz_session_id=sesion.id,
@@ -263,6 +289,8 @@ def crear_sesiones_y_respuestas(db: Session, preguntas: list):
         sesion.preguntas_correctas = respuestas_correctas
         sesion.puntuacion_total = respuestas_correctas * 10
         sesion.tiempo_total_segundos = tiempo_total
+        sesion.tiempo_respuestas_total = tiempo_total
+        sesion.respuestas_con_tiempo = respuestas_con_tiempo
         
         sesiones_creadas.append(sesion)
     
@@ -272,8 +300,157 @@ def crear_sesiones_y_respuestas(db: Session, preguntas: list):
     return sesiones_creadas
 
 
+def reconstruir_contadores():
+    """Comprueba los contadores de todas las sesiones contra la tabla de respuestas y los corrige."""
+    init_db()
+    db = SessionLocal()
+    try:
+        corregidas = QuizService.reconstruir_contadores_sesiones(db)
+        print(f"{corregidas} sesiones con contadores inconsistentes corregidas")
+        # Los agregados globales dependen de los contadores de las sesiones
+        QuizService.reconstruir_estadisticas(db)
+    finally:
+        db.close()
+
+
+def reconstruir_estadisticas():
+    """Recalcula los agregados de estadísticas desde las tablas de respuestas y sesiones."""
+    init_db()
+    db = SessionLocal()
+    try:
+        QuizService.reconstruir_estadisticas(db)
+        print("Agregados de estadísticas reconstruidos")
+    finally:
+        db.close()
+
+
+def importar(archivo: str, tamano_lote: int, duplicados: str = "permitir"):
+    """Importa un banco de preguntas NDJSON o array JSON mostrando el progreso de cada lote."""
+    init_db()
+    db = SessionLocal()
+
+    def mostrar_lote(lote: dict):
+        rango = f" (IDs {lote['primer_id']}-{lote['ultimo_id']})" if lote["insertadas"] else ""
+        print(
+            f"Lote {lote['lote']}: {lote['insertadas']} insertadas, {lote['errores']} errores, "
+            f"{lote['duplicados']} duplicadas{rango}"
+        )
+
+    try:
+        with open(archivo, "rb") as f:
+            resumen = importar_preguntas(
+                db, f, tamano_lote, al_progresar=mostrar_lote, duplicados=duplicados
+            )
+        for error in resumen["errores"]:
+            print(f"Elemento {error['indice']}: {error['detalle']}")
+        for duplicado in resumen["duplicados"]:
+            print(
+                f"Elemento {duplicado['indice']}: duplicado de la pregunta {duplicado['duplicado_de']} "
+                f"(similitud {duplicado['similitud']})"
+            )
+        print(
+            f"{resumen['insertadas']} preguntas importadas, {resumen['total_errores']} con errores, "
+            f"{resumen['total_duplicados']} duplicadas"
+        )
+    except ValueError as e:
+        print(f"Error al importar: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+def generar(
+    sesiones: int,
+    preguntas: int,
+    semilla: int,
+    usuarios: int,
+    dias: int,
+    tamano_lote: int
+):
+    """Genera un volumen de datos sintéticos de tamaño de producción, reanudable."""
+    init_db()
+    db = SessionLocal()
+    inicio = time.perf_counter()
+
+    def mostrar_progreso(lote: dict):
+        transcurrido = time.perf_counter() - inicio
+        print(
+            f"{lote['sesiones']}/{lote['total']} sesiones "
+            f"(+{lote['respuestas']} respuestas, {transcurrido:.0f} s)"
+        )
+
+    try:
+        añadidas = completar_banco(db, preguntas, semilla, tamano_lote)
+        if añadidas:
+            print(f"{añadidas} preguntas sintéticas añadidas")
+        resumen = generar_sesiones(
+            db, sesiones, semilla, usuarios=usuarios, dias=dias,
+            tamano_lote=tamano_lote, al_progresar=mostrar_progreso
+        )
+        if resumen["existentes"]:
+            print(f"{resumen['existentes']} sesiones ya generadas con la semilla {semilla}")
+        print(f"{resumen['generadas']} sesiones y {resumen['respuestas']} respuestas generadas")
+        if resumen["generadas"]:
+            QuizService.reconstruir_estadisticas(db)
+            print("Agregados de estadísticas reconstruidos")
+    except ValueError as e:
+        print(f"Error al generar: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
 def main():
     """Función principal para inicializar la base de datos"""
+    parser = argparse.ArgumentParser(description="Inicialización y mantenimiento de la base de datos")
+    subcomandos = parser.add_subparsers(dest="comando")
+    subcomandos.add_parser(
+        "reconstruir-contadores",
+        help="Recalcula los contadores de las sesiones desde la tabla de respuestas"
+    )
+    subcomandos.add_parser(
+        "reconstruir-estadisticas",
+        help="Recalcula los agregados de estadísticas por categoría y globales"
+    )
+    importar_parser = subcomandos.add_parser(
+        "importar",
+        help="Importa preguntas desde un archivo NDJSON o array JSON por lotes"
+    )
+    importar_parser.add_argument("archivo", help="Ruta del archivo a importar")
+    importar_parser.add_argument("--lote", type=int, default=1000, help="Preguntas por lote")
+    importar_parser.add_argument(
+        "--duplicados", choices=POLITICAS_DUPLICADOS, default="permitir",
+        help="Política ante preguntas parecidas a otras del banco o del archivo"
+    )
+    generar_parser = subcomandos.add_parser(
+        "generar",
+        help="Genera preguntas, sesiones y respuestas sintéticas a gran escala (reanudable)"
+    )
+    generar_parser.add_argument("--sesiones", type=int, required=True, help="Total de sesiones sintéticas")
+    generar_parser.add_argument(
+        "--preguntas", type=int, default=0,
+        help="Completar el banco con preguntas sintéticas hasta este número de activas"
+    )
+    generar_parser.add_argument("--semilla", type=int, default=1, help="Semilla del generador")
+    generar_parser.add_argument(
+        "--usuarios", type=int, default=None, help="Usuarios distintos (por defecto sesiones / 10)"
+    )
+    generar_parser.add_argument("--dias", type=int, default=365, help="Días que abarcan las sesiones")
+    generar_parser.add_argument("--lote", type=int, default=5000, help="Sesiones por lote")
+    args = parser.parse_args()
+
+    if args.comando == "reconstruir-contadores":
+        reconstruir_contadores()
+        return
+    if args.comando == "reconstruir-estadisticas":
+        reconstruir_estadisticas()
+        return
+    if args.comando == "importar":
+        importar(args.archivo, args.lote, args.duplicados)
+        return
+    if args.comando == "generar":
+        generar(args.sesiones, args.preguntas, args.semilla, args.usuarios, args.dias, args.lote)
+        return
 
     print("Inicializando base de datos...")
 
@@ -0,0 +1,73 @@
+"""
+Configuración común de las pruebas: una base de datos SQLite temporal
+
+Las variables de entorno se fijan antes de importar `app`, porque los motores
+y la configuración se leen al importar los módulos.
+"""
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+DIRECTORIO = tempfile.mkdtemp(prefix="quiz_api_tests_")
+RUTA_BD = os.path.join(DIRECTORIO, "quiz.db")
+BUSY_TIMEOUT = 7000
+
+os.environ["DATABASE_URL"] = f"sqlite:///{RUTA_BD}"
+os.environ["SQLITE_BUSY_TIMEOUT"] = str(BUSY_TIMEOUT)
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.database import async_engine, engine
+from app.main import app
+
+
+@pytest.fixture(scope="session")
+def cliente():
+    """Cliente HTTP de la aplicación, con la base de datos creada y la seed aplicada."""
+    with TestClient(app) as cliente:
+        yield cliente
+
+
+def pytest_sessionfinish(session, exitstatus):
+    """Borra la base de datos temporal aunque ninguna prueba haya usado el cliente."""
+    engine.dispose()
+    shutil.rmtree(DIRECTORIO, ignore_errors=True)
+
+
+class ContadorSentencias:
+    """Cuenta las sentencias SQL ejecutadas por los motores de la aplicación."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sentencias = []
+
+    def _al_ejecutar(self, conexion, cursor, sentencia, parametros, contexto, varias):
+        with self._lock:
+            self.sentencias.append(sentencia)
+
+    @property
+    def total(self) -> int:
+        return len(self.sentencias)
+
+    @contextmanager
+    def medir(self):
+        """Cuenta solo las sentencias ejecutadas dentro del bloque `with`."""
+        self.sentencias = []
+        motores = [engine] if async_engine is None else [engine, async_engine.sync_engine]
+        for motor in motores:
+            event.listen(motor, "before_cursor_execute", self._al_ejecutar)
+        try:
+            yield self
+        finally:
+            for motor in motores:
+                event.remove(motor, "before_cursor_execute", self._al_ejecutar)
+
+
+@pytest.fixture
+def contador():
+    """Contador de sentencias SQL; usar con `with contador.medir(): ...`."""
+    return ContadorSentencias()
@@ -0,0 +1,131 @@
+"""
+Pruebas del número de sentencias SQL de los endpoints de respuestas
+"""
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.services.coherencia import coherencia
+from app.services.quiz_service import QuizService
+
+
+def _nueva_sesion(cliente) -> int:
+    respuesta = cliente.post("/quiz-sessions/", json={"usuario_nombre": "Pruebas"})
+    assert respuesta.status_code == 201
+    return respuesta.json()["id"]
+
+
+def _responder(cliente, sesion: int, question_id: int):
+    respuesta = cliente.post("/answers/", json={
+        "quiz_session_id": sesion,
+        "question_id": question_id,
+        "respuesta_seleccionada": 0,
+        "tiempo_respuesta_segundos": 12
+    })
+    assert respuesta.status_code == 201, respuesta.text
+    return respuesta.json()
+
+
+def test_registrar_respuesta_sentencias_con_cache_caliente(cliente, contador, monkeypatch):
+    # Con el intervalo por defecto la caché caliente no consulta la versión;
+    # se alarga para que la prueba no dependa de lo que tarde
+    assert coherencia.intervalo > 0
+    monkeypatch.setattr(coherencia, "intervalo", 60)
+    # La primera respuesta deja la pregunta en la caché y revalida
+    _responder(cliente, _nueva_sesion(cliente), 3)
+    sesion = _nueva_sesion(cliente)
+
+    with contador.medir():
+        _responder(cliente, sesion, 3)
+
+    # 1. UPDATE de la versión de "estadisticas"
+    # 2. UPDATE ... RETURNING de los contadores de la sesión
+    # 3. INSERT de la respuesta
+    # 4. UPDATE del agregado de la categoría
+    # 5. UPDATE del agregado global
+    assert contador.total == 5, contador.sentencias
+    assert not any("FROM cache_versiones" in sentencia for sentencia in contador.sentencias)
+
+
+def _sesion_con_respuestas(cliente, ids_preguntas) -> int:
+    sesion = _nueva_sesion(cliente)
+    respuesta = cliente.post("/answers/batch", json={
+        "quiz_session_id": sesion,
+        "respuestas": [
+            {"question_id": question_id, "respuesta_seleccionada": 1, "tiempo_respuesta_segundos": 5}
+            for question_id in ids_preguntas
+        ]
+    })
+    assert respuesta.status_code == 201, respuesta.text
+    assert len(respuesta.json()["registradas"]) == len(ids_preguntas)
+    return sesion
+
+
+def test_detalle_respuestas_sentencias_independientes_del_tamano(cliente, contador):
+    creadas = cliente.post("/questions/bulk", json={"preguntas": [
+        {
+            "pregunta": f"¿Cuántas sentencias lanza el detalle número {indice}?",
+            "opciones": ["Una", "Dos", "Una por respuesta"],
+            "respuesta_correcta": 0,
+            "categoria": "Rendimiento",
+            "dificultad": "medio"
+        }
+        for indice in range(50)
+    ]})
+    assert creadas.status_code == 201, creadas.text
+    ids_preguntas = [pregunta["id"] for pregunta in creadas.json()]
+
+    totales = {}
+    for cantidad in (1, 50):
+        sesion = _sesion_con_respuestas(cliente, ids_preguntas[:cantidad])
+
+        with contador.medir():
+            respuesta = cliente.get(f"/answers/session/{sesion}")
+        assert respuesta.status_code == 200
+        assert len(respuesta.json()) == cantidad
+        por_sesion = contador.total
+
+        answer_id = respuesta.json()[-1]["id"]
+        with contador.medir():
+            respuesta = cliente.get(f"/answers/{answer_id}")
+        assert respuesta.status_code == 200
+        assert respuesta.json()["pregunta_texto"].endswith(f"número {cantidad - 1}?")
+
+        totales[cantidad] = (por_sesion, contador.total)
+
+    # Una sola consulta con el join de preguntas, sin N+1
+    assert totales[1] == totales[50] == (1, 1), totales
+
+
+def test_lote_vacio_completa_la_sesion(cliente):
+    sesion = _nueva_sesion(cliente)
+
+    respuesta = cliente.post("/answers/batch", json={
+        "quiz_session_id": sesion, "respuestas": [], "completar": True
+    })
+    assert respuesta.status_code == 201, respuesta.text
+    assert respuesta.json()["registradas"] == []
+    assert respuesta.json()["sesion"]["estado"] == "completado"
+
+    # Sin completar, un lote vacío no tiene sentido
+    respuesta = cliente.post("/answers/batch", json={"quiz_session_id": _nueva_sesion(cliente), "respuestas": []})
+    assert respuesta.status_code == 422
+
+
+def test_solo_la_respuesta_repetida_se_informa_como_tal(cliente, monkeypatch):
+    sesion = _nueva_sesion(cliente)
+    _responder(cliente, sesion, 5)
+
+    repetida = cliente.post("/answers/", json={
+        "quiz_session_id": sesion, "question_id": 5, "respuesta_seleccionada": 1
+    })
+    assert repetida.status_code == 400
+    assert repetida.json()["detail"] == "Ya has respondido esta pregunta en esta sesión"
+
+    # Cualquier otra violación de integridad no se disfraza de respuesta repetida
+    def fallar(*args, **kwargs):
+        raise IntegrityError("UPDATE", {}, Exception("NOT NULL constraint failed: estadisticas_global.total_respuestas"))
+
+    monkeypatch.setattr(QuizService, "acumular_estadisticas", fallar)
+    with pytest.raises(IntegrityError):
+        cliente.post("/answers/", json={"quiz_session_id": sesion, "question_id": 6, "respuesta_seleccionada": 0})
+    assert all(respuesta["question_id"] != 6 for respuesta in cliente.get(f"/answers/session/{sesion}").json())
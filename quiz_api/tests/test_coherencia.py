@@ -0,0 +1,77 @@
+"""
+Pruebas de la coherencia de las cachés en memoria entre procesos
+"""
+import multiprocessing
+import time
+
+from fastapi.testclient import TestClient
+
+from app.database import SessionLocal
+from app.main import app
+from app.services.coherencia import coherencia
+from app.services.question_cache import question_cache
+from app.services.question_sampler import question_sampler
+
+CATEGORIA_NUEVA = "Otro proceso"
+
+
+def _escribir_en_otro_proceso(question_id: int, session_id: int) -> int:
+    """
+    Se ejecuta en un proceso aparte, con sus propios motor y cachés sobre el
+    mismo archivo SQLite, y escribe a través de la API.
+
+    Returns:
+        ID de la pregunta creada
+    """
+    cliente = TestClient(app)
+    respuesta = cliente.put(f"/questions/{question_id}", json={"respuesta_correcta": 2})
+    assert respuesta.status_code == 200, respuesta.text
+    respuesta = cliente.post("/questions/", json={
+        "pregunta": "¿Se ve desde el otro proceso?",
+        "opciones": ["Sí", "No", "A veces"],
+        "respuesta_correcta": 0,
+        "categoria": CATEGORIA_NUEVA,
+        "dificultad": "fácil"
+    })
+    assert respuesta.status_code == 201, respuesta.text
+    creada = respuesta.json()["id"]
+    respuesta = cliente.post("/answers/", json={
+        "quiz_session_id": session_id,
+        "question_id": question_id,
+        "respuesta_seleccionada": 2
+    })
+    assert respuesta.status_code == 201, respuesta.text
+    return creada
+
+
+def test_escrituras_de_otro_proceso_invalidan_las_caches(cliente):
+    pregunta = cliente.post("/questions/", json={
+        "pregunta": "¿Qué proceso escribió esta pregunta?",
+        "opciones": ["Este", "Ninguno", "El otro"],
+        "respuesta_correcta": 0,
+        "categoria": "Coherencia",
+        "dificultad": "medio"
+    }).json()
+    sesion = cliente.post("/quiz-sessions/", json={"usuario_nombre": "Coherencia"}).json()
+
+    # Calentar las tres cachés de este proceso
+    with SessionLocal() as db:
+        assert question_cache.obtener(db, pregunta["id"]).respuesta_correcta == 0
+        assert question_sampler.muestrear(db, 1, categoria=CATEGORIA_NUEVA) == ([], 0)
+    estadisticas = cliente.get(f"/statistics/session/{sesion['id']}")
+    assert estadisticas.json()["preguntas_respondidas"] == 0
+    assert cliente.get(f"/statistics/session/{sesion['id']}").json()["preguntas_respondidas"] == 0
+
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        creada = pool.apply(_escribir_en_otro_proceso, (pregunta["id"], sesion["id"]))
+    # Los cambios de otros procesos se ven en la primera lectura tras el
+    # intervalo de revalidación
+    time.sleep(coherencia.intervalo)
+
+    with SessionLocal() as db:
+        assert question_cache.obtener(db, pregunta["id"]).respuesta_correcta == 2
+        assert question_sampler.muestrear(db, 1, categoria=CATEGORIA_NUEVA) == ([creada], 1)
+    estadisticas = cliente.get(f"/statistics/session/{sesion['id']}")
+    assert estadisticas.status_code == 200
+    assert estadisticas.json()["preguntas_respondidas"] == 1
+    assert estadisticas.json()["preguntas_correctas"] == 1
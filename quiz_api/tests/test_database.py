@@ -0,0 +1,77 @@
+"""
+Pruebas de la configuración de SQLite con escrituras y lecturas concurrentes
+"""
+import threading
+
+from sqlalchemy import text
+
+from app.database import engine
+from tests.conftest import BUSY_TIMEOUT
+
+ESCRITORES = 8
+LECTORES = 4
+RESPUESTAS_POR_ESCRITOR = 15
+
+
+def test_health_informa_de_los_pragmas(cliente):
+    respuesta = cliente.get("/health")
+    assert respuesta.status_code == 200
+    pragmas = respuesta.json()["database"]["pragmas"]
+    assert pragmas["journal_mode"] == "wal"
+    assert pragmas["busy_timeout"] == BUSY_TIMEOUT
+
+
+def test_escrituras_y_lecturas_concurrentes_sin_bloqueos(cliente):
+    sesiones = []
+    for indice in range(ESCRITORES):
+        respuesta = cliente.post("/quiz-sessions/", json={"usuario_nombre": f"Concurrente {indice}"})
+        assert respuesta.status_code == 201
+        sesiones.append(respuesta.json()["id"])
+
+    errores = []
+    terminado = threading.Event()
+    inicio = threading.Barrier(ESCRITORES + LECTORES)
+
+    def escribir(sesion):
+        try:
+            inicio.wait()
+            for question_id in range(1, RESPUESTAS_POR_ESCRITOR + 1):
+                respuesta = cliente.post("/answers/", json={
+                    "quiz_session_id": sesion,
+                    "question_id": question_id,
+                    "respuesta_seleccionada": 0
+                })
+                if respuesta.status_code != 201:
+                    errores.append(respuesta.text)
+        except Exception as error:
+            errores.append(repr(error))
+
+    def leer(indice):
+        try:
+            inicio.wait()
+            while not terminado.is_set():
+                if indice % 2:
+                    respuesta = cliente.get(f"/answers/session/{sesiones[indice]}")
+                    if respuesta.status_code != 200:
+                        errores.append(respuesta.text)
+                else:
+                    with engine.connect() as conexion:
+                        conexion.execute(text("SELECT count(*) FROM answers")).scalar()
+        except Exception as error:
+            errores.append(repr(error))
+
+    escritores = [threading.Thread(target=escribir, args=(sesion,)) for sesion in sesiones]
+    lectores = [threading.Thread(target=leer, args=(indice,)) for indice in range(LECTORES)]
+    for hilo in escritores + lectores:
+        hilo.start()
+    for hilo in escritores:
+        hilo.join()
+    terminado.set()
+    for hilo in lectores:
+        hilo.join()
+
+    assert not [error for error in errores if "database is locked" in error]
+    assert not errores
+    for sesion in sesiones:
+        respuestas = cliente.get(f"/answers/session/{sesion}").json()
+        assert len(respuestas) == RESPUESTAS_POR_ESCRITOR
@@ -0,0 +1,48 @@
+"""
+Pruebas de las métricas por ruta: filas de SQL y bytes enviados
+"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.services import metricas as modulo
+from app.services.compresion import CompresionMiddleware
+from app.services.metricas import MedicionPeticion, MetricasMiddleware, RegistroMetricas, instrumentar_motor
+
+
+def test_filas_segun_rowcount():
+    motor = create_engine("sqlite://")
+    instrumentar_motor(motor)
+    medicion = MedicionPeticion()
+    token = modulo._medicion_actual.set(medicion)
+    try:
+        with motor.begin() as conexion:
+            conexion.execute(text("CREATE TABLE t (x INTEGER)"))
+            conexion.execute(text("INSERT INTO t VALUES (1), (2), (3)"))
+            conexion.execute(text("UPDATE t SET x = x + 1 WHERE x > 1"))
+            conexion.execute(text("SELECT x FROM t")).all()
+    finally:
+        modulo._medicion_actual.reset(token)
+    assert medicion.consultas == 4
+    # 3 insertadas + 2 actualizadas; SQLite no informa de las del SELECT
+    assert medicion.filas == 5
+
+
+def test_bytes_medidos_tras_la_compresion(monkeypatch):
+    registro = RegistroMetricas()
+    monkeypatch.setattr(modulo, "metricas", registro)
+    aplicacion = FastAPI()
+
+    @aplicacion.get("/grande")
+    def grande():
+        return {"texto": "a" * 10000}
+
+    cliente = TestClient(MetricasMiddleware(CompresionMiddleware(aplicacion), muestreo=1))
+    respuesta = cliente.get("/grande", headers={"Accept-Encoding": "gzip"})
+    assert respuesta.headers["content-encoding"] == "gzip"
+
+    exportado = registro.exportar()
+    linea = next(linea for linea in exportado.splitlines() if linea.startswith("quiz_http_response_wire_bytes_total{"))
+    enviados = int(linea.rsplit(" ", 1)[1])
+    assert enviados == int(respuesta.headers["content-length"])
+    assert enviados < len(respuesta.content)
@@ -0,0 +1,129 @@
+"""
+Pruebas de la selección de preguntas aleatorias con el índice en memoria
+"""
+import itertools
+
+import pytest
+from sqlalchemy import delete, update
+
+from app.database import SessionLocal
+from app.models.estadistica import EstadisticaGlobal
+from app.models.question import Question
+from app.services.question_sampler import question_sampler
+from app.services.quiz_service import QuizService
+
+_CATEGORIAS = (f"Muestreo {numero}" for numero in itertools.count())
+
+
+@pytest.fixture
+def categoria():
+    """Una categoría nueva por prueba, para que cada una vea solo sus preguntas."""
+    return next(_CATEGORIAS)
+
+
+@pytest.fixture
+def preguntas(cliente, categoria):
+    creadas = cliente.post("/questions/bulk", json={"preguntas": [
+        {
+            "pregunta": f"¿Sigue activa la pregunta de muestreo {indice}?",
+            "opciones": ["Sí", "No", "Depende"],
+            "respuesta_correcta": 0,
+            "categoria": categoria,
+            "dificultad": "medio"
+        }
+        for indice in range(3)
+    ]})
+    assert creadas.status_code == 201, creadas.text
+    return [pregunta["id"] for pregunta in creadas.json()]
+
+
+def _desactivar_sin_avisar(question_id: int):
+    """Desactiva una pregunta sin pasar por la API, como lo haría otro proceso antes de revalidar."""
+    with SessionLocal() as db:
+        db.execute(update(Question).where(Question.id == question_id).values(is_active=False))
+        db.commit()
+
+
+def test_pregunta_desactivada_entre_muestreo_y_carga(preguntas, categoria):
+    with SessionLocal() as db:
+        # Índice cargado con las tres preguntas
+        assert question_sampler.muestrear(db, 3, categoria=categoria)[1] == 3
+        _desactivar_sin_avisar(preguntas[0])
+
+        # El índice desfasado se recarga y se repite el muestreo
+        elegidas = QuizService.obtener_preguntas_aleatorias(db, 2, categoria=categoria)
+        assert sorted(pregunta.id for pregunta in elegidas) == preguntas[1:]
+
+        with pytest.raises(ValueError, match="Solo hay 2 preguntas disponibles, se requieren 3"):
+            QuizService.obtener_preguntas_aleatorias(db, 3, categoria=categoria)
+
+
+def test_nunca_devuelve_menos_preguntas_de_las_pedidas(preguntas, categoria, monkeypatch):
+    _desactivar_sin_avisar(preguntas[0])
+    # Un índice que sigue ofreciendo la pregunta desactivada aunque se recargue
+    monkeypatch.setattr(question_sampler, "muestrear", lambda db, limit, categoria, dificultad: (preguntas[:limit], 3))
+
+    with SessionLocal() as db:
+        with pytest.raises(ValueError, match="se requieren 3"):
+            QuizService.obtener_preguntas_aleatorias(db, 3, categoria=categoria)
+
+
+def test_endpoint_responde_400_si_faltan_preguntas(cliente, preguntas, categoria, monkeypatch):
+    _desactivar_sin_avisar(preguntas[0])
+    monkeypatch.setattr(question_sampler, "muestrear", lambda db, limit, categoria, dificultad: (preguntas[:limit], 3))
+
+    respuesta = cliente.get(f"/questions/random?limit=3&categoria={categoria}")
+    assert respuesta.status_code == 400
+
+
+def _fila_global() -> dict:
+    with SessionLocal() as db:
+        fila = db.get(EstadisticaGlobal, 1)
+        assert fila is not None
+        return {
+            columna: getattr(fila, columna)
+            for columna in (
+                "total_respuestas", "respuestas_correctas", "sesiones_completadas",
+                "respondidas_completadas", "correctas_completadas"
+            )
+        }
+
+
+def _borrar_fila_global():
+    with SessionLocal() as db:
+        db.execute(delete(EstadisticaGlobal))
+        db.commit()
+
+
+def _fila_reconstruida() -> dict:
+    with SessionLocal() as db:
+        QuizService.reconstruir_estadisticas(db)
+    return _fila_global()
+
+
+def test_agregado_global_sin_fila_no_pierde_incrementos(cliente):
+    sesion = cliente.post("/quiz-sessions/", json={"usuario_nombre": "Sin agregado"}).json()["id"]
+
+    _borrar_fila_global()
+    respuesta = cliente.post("/answers/", json={"quiz_session_id": sesion, "question_id": 7, "respuesta_seleccionada": 0})
+    assert respuesta.status_code == 201, respuesta.text
+    tras_responder = _fila_global()
+    assert tras_responder == _fila_reconstruida()
+
+    _borrar_fila_global()
+    respuesta = cliente.post("/answers/batch", json={
+        "quiz_session_id": sesion,
+        "respuestas": [{"question_id": 8, "respuesta_seleccionada": 1}],
+        "completar": True
+    })
+    assert respuesta.status_code == 201, respuesta.text
+    tras_completar = _fila_global()
+    assert tras_completar == _fila_reconstruida()
+    assert tras_completar["total_respuestas"] == tras_responder["total_respuestas"] + 1
+    assert tras_completar["sesiones_completadas"] == tras_responder["sesiones_completadas"] + 1
+
+    otra = cliente.post("/quiz-sessions/", json={"usuario_nombre": "Sin agregado"}).json()["id"]
+    cliente.post("/answers/", json={"quiz_session_id": otra, "question_id": 7, "respuesta_seleccionada": 0})
+    _borrar_fila_global()
+    assert cliente.put(f"/quiz-sessions/{otra}/complete", json={}).status_code == 200
+    assert _fila_global() == _fila_reconstruida()
@@ -0,0 +1,101 @@
+"""
+Pruebas de que la serialización rápida (RESPUESTAS_RAPIDAS) produce los
+mismos bytes y cabeceras que los modelos Pydantic
+"""
+import random
+import re
+
+import pytest
+
+from app.services import serializacion
+
+CATEGORIA = "Serialización"
+SEMILLA = 23
+
+
+@pytest.fixture(scope="module")
+def datos(cliente):
+    """Preguntas con unicode, nulos y duplicadas, y una sesión que las responde."""
+    preguntas = [
+        {
+            "pregunta": "¿Qué símbolo es «π» y cuánto vale? 🥧",
+            "opciones": ["3,14…", "Ω \"omega\"", "√2 \\ raíz", "日本語"],
+            "respuesta_correcta": 0,
+            "explicacion": "Línea 1\nLínea 2\tcon tabulador y \u2028separador de línea",
+            "categoria": CATEGORIA,
+            "dificultad": "difícil"
+        },
+        {
+            "pregunta": "¿Pregunta sin explicación ni tiempo?",
+            "opciones": ["Sí", "No", "Ñandú"],
+            "respuesta_correcta": 2,
+            "categoria": CATEGORIA,
+            "dificultad": "fácil"
+        },
+    ]
+    creadas = cliente.post("/questions/bulk", json={"preguntas": preguntas})
+    assert creadas.status_code == 201, creadas.text
+    # Casi la misma pregunta: se inserta marcada con `duplicado_de`
+    duplicada = cliente.post("/questions/bulk?duplicados=marcar", json={"preguntas": [
+        {**preguntas[0], "pregunta": "¿Qué símbolo es «π» y cuánto vale? 🥧!"}
+    ]})
+    assert duplicada.status_code == 201, duplicada.text
+    assert duplicada.json()[0]["duplicado_de"] == creadas.json()[0]["id"]
+
+    ids = [pregunta["id"] for pregunta in creadas.json() + duplicada.json()]
+    sesion = cliente.post("/quiz-sessions/", json={"usuario_nombre": "José «Serialización»"}).json()["id"]
+    respuesta = cliente.post("/answers/batch", json={
+        "quiz_session_id": sesion,
+        "respuestas": [
+            {"question_id": ids[0], "respuesta_seleccionada": 3, "tiempo_respuesta_segundos": 9},
+            {"question_id": ids[1], "respuesta_seleccionada": 2},
+            {"question_id": ids[2], "respuesta_seleccionada": 0, "tiempo_respuesta_segundos": 0},
+        ]
+    })
+    assert respuesta.status_code == 201, respuesta.text
+    return sesion
+
+
+def _peticiones(cliente, sesion):
+    rutas = [
+        f"/questions/?categoria={CATEGORIA}",
+        "/questions/?limit=7",
+        f"/answers/session/{sesion}",
+    ]
+    resultados = {}
+    for ruta in rutas:
+        respuesta = cliente.get(ruta)
+        assert respuesta.status_code == 200, respuesta.text
+        resultados[ruta] = (respuesta.content, dict(respuesta.headers))
+    for limit, categoria in ((5, None), (3, CATEGORIA)):
+        random.seed(SEMILLA)
+        ruta = f"/questions/random?limit={limit}" + (f"&categoria={categoria}" if categoria else "")
+        respuesta = cliente.get(ruta)
+        assert respuesta.status_code == 200, respuesta.text
+        resultados[ruta] = (respuesta.content, dict(respuesta.headers))
+    return resultados
+
+
+@pytest.mark.parametrize("con_orjson", [True, False], ids=["orjson", "json"])
+def test_respuestas_rapidas_identicas_byte_a_byte(cliente, datos, monkeypatch, con_orjson):
+    lentas = _peticiones(cliente, datos)
+
+    monkeypatch.setattr("app.routers.questions.RESPUESTAS_RAPIDAS", True)
+    monkeypatch.setattr("app.routers.answers.RESPUESTAS_RAPIDAS", True)
+    if not con_orjson:
+        monkeypatch.setattr(serializacion, "orjson", None)
+    codificadas = []
+    codificar = serializacion.codificar
+    monkeypatch.setattr(serializacion, "codificar", lambda contenido: codificadas.append(1) or codificar(contenido))
+    rapidas = _peticiones(cliente, datos)
+
+    # Todas las respuestas salieron por el camino rápido
+    assert len(codificadas) == len(lentas)
+
+    assert "🥧".encode("utf-8") in lentas[f"/questions/?categoria={CATEGORIA}"][0]
+    assert b'"explicacion":null' in lentas[f"/questions/?categoria={CATEGORIA}"][0]
+    assert re.search(rb'"duplicado_de":\d+', lentas[f"/questions/?categoria={CATEGORIA}"][0])
+    assert b'"tiempo_respuesta_segundos":null' in lentas[f"/answers/session/{datos}"][0]
+    for ruta, (cuerpo, cabeceras) in lentas.items():
+        assert rapidas[ruta][0] == cuerpo, ruta
+        assert rapidas[ruta][1] == cabeceras, ruta
@@ -0,0 +1,88 @@
+"""
+Pruebas de los ETags y la caché de los endpoints de estadísticas
+"""
+import asyncio
+import time
+
+from app.services.cache_estadisticas import CacheEstadisticas
+
+
+def test_etag_de_estadisticas_por_ruta_y_parametros(cliente):
+    sesiones = [
+        cliente.post("/quiz-sessions/", json={"usuario_nombre": f"ETag {indice}"}).json()["id"]
+        for indice in range(2)
+    ]
+    etags = {
+        ruta: cliente.get(ruta).headers["etag"]
+        for ruta in (
+            "/statistics/global",
+            "/statistics/categories",
+            "/statistics/categories?por_dificultad=true",
+            "/statistics/questions/difficult?limit=5",
+            "/statistics/questions/difficult?limit=6",
+            f"/statistics/session/{sesiones[0]}",
+            f"/statistics/session/{sesiones[1]}",
+        )
+    }
+    assert len(set(etags.values())) == len(etags), etags
+
+    for ruta, etag in etags.items():
+        assert cliente.get(ruta, headers={"If-None-Match": etag}).status_code == 304, ruta
+    global_ = etags["/statistics/global"]
+    assert cliente.get("/statistics/categories", headers={"If-None-Match": global_}).status_code == 200
+    sesion = etags[f"/statistics/session/{sesiones[0]}"]
+    assert cliente.get(f"/statistics/session/{sesiones[1]}", headers={"If-None-Match": sesion}).status_code == 200
+
+
+def test_sesion_inexistente_responde_404_con_etag_coincidente(cliente):
+    sesion = cliente.post("/quiz-sessions/", json={"usuario_nombre": "ETag"}).json()["id"]
+    etag = cliente.get(f"/statistics/session/{sesion}").headers["etag"]
+    global_ = cliente.get("/statistics/global").headers["etag"]
+
+    for cabecera in (etag, global_, "*"):
+        respuesta = cliente.get("/statistics/session/99999", headers={"If-None-Match": cabecera})
+        assert respuesta.status_code == 404, cabecera
+
+
+def _completar_quiz(cliente) -> int:
+    sesion = cliente.post("/quiz-sessions/", json={"usuario_nombre": "Recién terminado"}).json()["id"]
+    respuesta = cliente.post("/answers/batch", json={
+        "quiz_session_id": sesion,
+        "respuestas": [{"question_id": 4, "respuesta_seleccionada": 0}],
+        "completar": True
+    })
+    assert respuesta.status_code == 201, respuesta.text
+    return sesion
+
+
+def test_estadisticas_globales_reflejan_la_escritura_inmediatamente(cliente):
+    antes = cliente.get("/statistics/global").json()
+    # La segunda lectura sale de la caché
+    assert cliente.get("/statistics/global").json() == antes
+
+    _completar_quiz(cliente)
+
+    despues = cliente.get("/statistics/global").json()
+    assert despues["total_sesiones_completadas"] == antes["total_sesiones_completadas"] + 1
+
+
+def test_respuesta_obsoleta_solo_al_caducar_el_ttl():
+    cache = CacheEstadisticas({"global": 0.05}, margen_obsoleto=60, capacidad=10)
+    calculos = []
+
+    async def calcular():
+        calculos.append(1)
+        return len(calculos)
+
+    async def escenario():
+        assert await cache.obtener("global", (), calcular) == (1, None)
+        time.sleep(0.06)
+        # Caducada por TTL: se sirve la anterior y se recalcula en segundo plano
+        assert await cache.obtener("global", (), calcular) == (1, None)
+        await asyncio.sleep(0.01)
+        assert await cache.obtener("global", (), calcular) == (2, None)
+        # Tras una escritura no se sirve la anterior
+        cache.invalidar()
+        assert await cache.obtener("global", (), calcular) == (3, None)
+
+    asyncio.run(escenario())